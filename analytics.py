@@ -0,0 +1,378 @@
+"""Running watch statistics per user and per guild.
+
+Aggregates are updated from AnimeWatchList change notifications, so the
+stats commands never load watchlists. They are saved as JSON files, one per
+shard of users so a save only rewrites the shards that changed, and can be
+recomputed offline from storage:
+
+    python analytics.py rebuild --data-dir data [--db data/anime.db] [--out data/analytics]
+"""
+import argparse
+import json
+import os
+from collections import Counter
+from datetime import date
+
+from main import Anime, Status
+from persistence import USER_SHARDS, atomic_write_json, user_shard
+from picker import genre_keys
+
+
+def _bump(counter, key, amount):
+    value = counter[key] + amount
+    if value > 0:
+        counter[key] = value
+    else:
+        del counter[key]
+
+
+class Totals:
+    """Additive counters over a set of watchlist entries."""
+
+    __slots__ = ('entries', 'status', 'favorites', 'episodes', 'completion_days', 'timed_completions',
+                 'start_days', 'genres', 'titles')
+
+    def __init__(self):
+        self.entries = 0
+        self.status = [0, 0, 0]  # by Status value
+        self.favorites = 0
+        self.episodes = 0
+        self.completion_days = 0  # summed days from start to completion
+        self.timed_completions = 0  # completed entries with both dates
+        self.start_days = Counter()  # start date ordinal -> entries
+        self.genres = Counter()
+        self.titles = Counter()
+
+    def apply(self, anime, sign=1):
+        self.entries += sign
+        self.status[anime.status_enum] += sign
+        self.favorites += sign if anime.favorite else 0
+        self.episodes += sign * anime.episodes_watched
+        start, completed = anime.start_ordinal, anime.completed_ordinal
+        if start:
+            _bump(self.start_days, start, sign)
+        if anime.status_enum == Status.COMPLETED and start and completed >= start:
+            self.completion_days += sign * (completed - start)
+            self.timed_completions += sign
+        for genre in genre_keys(anime.genre):
+            _bump(self.genres, genre, sign)
+        self._count_title(anime.title.strip(), sign)
+
+    def merge(self, other, sign=1):
+        self.entries += sign * other.entries
+        self.status = [mine + sign * theirs for mine, theirs in zip(self.status, other.status)]
+        self.favorites += sign * other.favorites
+        self.episodes += sign * other.episodes
+        self.completion_days += sign * other.completion_days
+        self.timed_completions += sign * other.timed_completions
+        for field in ('start_days', 'genres'):
+            mine = getattr(self, field)
+            for key, count in getattr(other, field).items():
+                _bump(mine, key, sign * count)
+        for title, count in other.titles.items():
+            self._count_title(title, sign * count)
+
+    def _count_title(self, title, amount):
+        _bump(self.titles, title, amount)
+
+    def summary(self, today=None):
+        today = (today or date.today()).toordinal()
+        first_start = min(self.start_days) if self.start_days else None
+        days = today - first_start + 1 if first_start else None
+        return {
+            'entries': self.entries,
+            'to_watch': self.status[0],
+            'watching': self.status[1],
+            'completed': self.status[2],
+            'favorites': self.favorites,
+            'episodes': self.episodes,
+            'completion_rate': self.status[2] / self.entries if self.entries else 0.0,
+            'episodes_per_day': self.episodes / days if days else 0.0,
+            'avg_days_to_complete': (self.completion_days / self.timed_completions
+                                     if self.timed_completions else None),
+            'top_genres': self.genres.most_common(5),
+        }
+
+    def to_dict(self):
+        return {
+            'entries': self.entries, 'status': self.status, 'favorites': self.favorites,
+            'episodes': self.episodes, 'completion_days': self.completion_days,
+            'timed_completions': self.timed_completions,
+            'start_days': {str(day): count for day, count in self.start_days.items()},
+            'genres': dict(self.genres), 'titles': dict(self.titles),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        totals = cls()
+        for field in ('entries', 'status', 'favorites', 'episodes', 'completion_days', 'timed_completions'):
+            setattr(totals, field, data[field])
+        totals.start_days = Counter({int(day): count for day, count in data['start_days'].items()})
+        totals.genres = Counter(data['genres'])
+        totals.titles = Counter(data['titles'])
+        return totals
+
+
+class GuildTotals(Totals):
+    """Totals over the watchlists of a guild's members, with case-insensitive title ranking."""
+
+    __slots__ = ('members', 'title_counts', 'title_names', '_top')
+
+    def __init__(self):
+        super().__init__()
+        self.members = set()
+        self.title_counts = Counter()  # lowercased title -> entries across members
+        self.title_names = {}  # lowercased title -> a display spelling
+        self._top = None  # cached top titles, cleared on change
+
+    def _count_title(self, title, amount):
+        key = title.lower()
+        _bump(self.title_counts, key, amount)
+        if key not in self.title_counts:
+            self.title_names.pop(key, None)
+        elif amount > 0:
+            self.title_names[key] = title
+        self._top = None
+
+    def top_titles(self, limit=10):
+        if self._top is None or len(self._top) < limit:
+            self._top = [(self.title_names[key], count) for key, count in self.title_counts.most_common(limit)]
+        return self._top[:limit]
+
+
+class UserObserver:
+    """AnimeWatchList observer feeding one user's changes into Analytics."""
+
+    __slots__ = ('analytics', 'user_id')
+
+    def __init__(self, analytics, user_id):
+        self.analytics = analytics
+        self.user_id = user_id
+
+    def added(self, anime):
+        self.analytics.apply(self.user_id, anime, 1)
+
+    def removed(self, anime):
+        self.analytics.apply(self.user_id, anime, -1)
+
+    def reloaded(self, anime_list):
+        self.analytics.replace_user(self.user_id, anime_list)
+
+
+class Analytics:
+    """User and guild totals for at most max_users users.
+
+    Once more users are known, the least recently active one is forgotten:
+    its totals and memberships are dropped and it no longer counts towards
+    its guilds until its watchlist is loaded again. Changes to a user that
+    isn't counted are ignored, since every load recounts the whole list.
+    """
+
+    def __init__(self, path=os.path.join('data', 'analytics'), max_users=None):
+        self.path = path  # directory of shard files
+        self.max_users = max_users
+        self.users = {}  # user_id -> Totals
+        self.guilds = {}  # guild_id -> GuildTotals
+        self.user_guilds = {}  # user_id -> set of guild ids
+        self._recent = {}  # user_id -> activity sequence number, least recently active first
+        self._sequence = 0
+        self._shards = [set() for _ in range(USER_SHARDS)]  # shard -> tracked user ids
+        self._dirty = set()  # shards changed since they were last saved
+
+    @property
+    def dirty(self):
+        return bool(self._dirty)
+
+    def _changed(self, user_id):
+        self._dirty.add(user_shard(user_id))
+
+    def observer(self, user_id):
+        return UserObserver(self, user_id)
+
+    def _touch(self, user_id):
+        # Recency alone doesn't dirty a shard; it is saved along with the next real change
+        if self._recent.pop(user_id, None) is None:
+            self._shards[user_shard(user_id)].add(user_id)
+        self._sequence += 1
+        self._recent[user_id] = self._sequence
+        if self.max_users and len(self._recent) > self.max_users:
+            self.forget(next(iter(self._recent)))
+
+    def apply(self, user_id, anime, sign):
+        totals = self.users.get(user_id)
+        if totals is None:
+            return  # forgotten; counted again from the whole list on its next load
+        self._touch(user_id)
+        totals.apply(anime, sign)
+        for guild_id in self.user_guilds.get(user_id, ()):
+            self.guilds[guild_id].apply(anime, sign)
+        self._changed(user_id)
+
+    def replace_user(self, user_id, anime_list):
+        """Recount a user from a freshly loaded list; also corrects any drift."""
+        fresh = Totals()
+        for anime in anime_list:
+            fresh.apply(anime)
+        old = self.users.get(user_id)
+        for guild_id in self.user_guilds.get(user_id, ()):
+            guild = self.guilds[guild_id]
+            if old is not None:
+                guild.merge(old, -1)
+            guild.merge(fresh)
+        self.users[user_id] = fresh
+        self._touch(user_id)
+        self._changed(user_id)
+
+    def forget(self, user_id):
+        """Drop a user's totals and guild memberships."""
+        self._recent.pop(user_id, None)
+        self._shards[user_shard(user_id)].discard(user_id)
+        totals = self.users.pop(user_id, None)
+        for guild_id in self.user_guilds.pop(user_id, ()):
+            guild = self.guilds[guild_id]
+            guild.members.discard(user_id)
+            if totals is not None:
+                guild.merge(totals, -1)
+            if not guild.members:
+                del self.guilds[guild_id]
+        self._changed(user_id)
+
+    def join(self, guild_id, user_id):
+        """Count a user towards a guild; cheap when already counted."""
+        self._touch(user_id)
+        guilds = self.user_guilds.setdefault(user_id, set())
+        if guild_id in guilds:
+            return
+        guilds.add(guild_id)
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = GuildTotals()
+        guild.members.add(user_id)
+        if user_id in self.users:
+            guild.merge(self.users[user_id])
+        self._changed(user_id)
+
+    def leave(self, guild_id, user_id):
+        guilds = self.user_guilds.get(user_id)
+        if not guilds or guild_id not in guilds:
+            return
+        guilds.discard(guild_id)
+        guild = self.guilds[guild_id]
+        guild.members.discard(user_id)
+        if user_id in self.users:
+            guild.merge(self.users[user_id], -1)
+        if not guild.members:
+            del self.guilds[guild_id]
+        self._changed(user_id)
+
+    def user_summary(self, user_id):
+        totals = self.users.get(user_id)
+        return totals.summary() if totals else None
+
+    def guild_summary(self, guild_id, top=10):
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            return None
+        summary = guild.summary()
+        summary['members'] = len(guild.members)
+        summary['top_titles'] = guild.top_titles(top)
+        return summary
+
+    def take_dirty(self):
+        """Return the shards changed since the last save and mark them clean."""
+        shards, self._dirty = self._dirty, set()
+        return sorted(shards)
+
+    def mark_dirty(self, shards):
+        self._dirty.update(shards)
+
+    def shard_dict(self, shard):
+        """Snapshot of one shard's users, their guilds and recency; cheap enough for the event loop."""
+        users = {}
+        for user_id in self._shards[shard]:
+            totals = self.users.get(user_id)
+            users[str(user_id)] = {
+                'totals': totals.to_dict() if totals is not None else None,
+                'guilds': sorted(self.user_guilds.get(user_id, ())),
+                'seen': self._recent[user_id],
+            }
+        return {'users': users}
+
+    def write_shard(self, shard, data):
+        """Write a shard_dict() snapshot; safe to call from a thread."""
+        atomic_write_json(os.path.join(self.path, f'{shard:02d}.json'), data, indent=None)
+
+    def save(self, everything=False):
+        """Write the changed shards (every shard with everything=True) synchronously."""
+        shards = range(USER_SHARDS) if everything else self.take_dirty()
+        for i, shard in enumerate(shards):
+            try:
+                self.write_shard(shard, self.shard_dict(shard))
+            except BaseException:
+                self.mark_dirty(shards[i:])
+                raise
+
+    def load(self):
+        records = {}
+        for shard in range(USER_SHARDS):
+            try:
+                with open(os.path.join(self.path, f'{shard:02d}.json'), 'r') as f:
+                    records.update(json.load(f).get('users', {}))
+            except (OSError, ValueError, AttributeError):
+                continue
+        self.users, self.guilds, self.user_guilds, self._recent = {}, {}, {}, {}
+        self._shards = [set() for _ in range(USER_SHARDS)]
+        # Guild totals are sums over their members, recomputed rather than stored;
+        # replaying users in activity order restores the recency list
+        max_users, self.max_users = self.max_users, None
+        for user_id, record in sorted(records.items(), key=lambda item: item[1].get('seen', 0)):
+            user_id = int(user_id)
+            if record.get('totals') is not None:
+                self.users[user_id] = Totals.from_dict(record['totals'])
+            for guild_id in record.get('guilds', ()):
+                self.join(guild_id, user_id)
+            self._touch(user_id)
+        self.max_users = max_users
+        self._dirty = set()
+        # Users beyond a lowered limit are dropped from their shards on the next save
+        while self.max_users and len(self._recent) > self.max_users:
+            self.forget(next(iter(self._recent)))
+        return self
+
+
+def rebuild(storage, analytics):
+    """Recount every stored watchlist into analytics, keeping guild memberships."""
+    users = 0
+    for user_id in storage.user_ids():
+        records = storage.load(storage.key_for_user(user_id))
+        analytics.replace_user(user_id, [Anime(**record) for record in records])
+        users += 1
+    return users
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch statistics tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild_cmd = sub.add_parser('rebuild', help="Recompute data/analytics/ from every stored watchlist")
+    rebuild_cmd.add_argument('--data-dir', default='data', help="JSON watchlist directory")
+    rebuild_cmd.add_argument('--db', help="read from this SQLite database instead of JSON files")
+    rebuild_cmd.add_argument('--out', default=os.path.join('data', 'analytics'), help="statistics directory")
+    args = parser.parse_args(argv)
+
+    from storage import JsonStorage, SqliteStorage
+
+    storage = SqliteStorage(args.db) if args.db else JsonStorage(args.data_dir)
+    try:
+        analytics = Analytics(args.out).load()
+        # Start from zero so users without a watchlist anymore drop out; only
+        # user totals and memberships are saved, guild totals follow on load
+        analytics.users = {}
+        users = rebuild(storage, analytics)
+        analytics.save(everything=True)
+    finally:
+        storage.close()
+    print(f"Rebuilt statistics for {users} users into {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Timings for watchlist operations and bot command handlers.
+
+Builds synthetic watchlists and users in a scratch directory, times the
+AnimeWatchList operations and, when discord.py is installed, the cached
+watchlist lookup and the command coroutines of bot.py driven through fake
+Interaction/Context objects (no network). Results are written as JSON and
+can be compared against an earlier run to flag regressions.
+
+    python -m benchmarks.bench --sizes 10,1000,10000 --users 1000
+    python -m benchmarks.bench --output new.json --baseline old.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from benchmarks.memory import GENRES, PREFERENCES, STATUSES
+from cache import WatchlistCache
+from main import Anime, AnimeWatchList
+from storage import JsonStorage, SqliteStorage
+
+WORDS = ['shingeki', 'kyojin', 'no', 'hagane', 'renkinjutsushi', 'kimetsu', 'yaiba', 'sousou',
+         'frieren', 'boku', 'hero', 'academia', 'steins', 'gate', 'cowboy', 'bebop', 'mob',
+         'psycho', 'jujutsu', 'kaisen', 'spy', 'family', 'chainsaw', 'man', 'vinland', 'saga',
+         'mushishi', 'monster', 'haikyuu', 'gintama', 'clannad', 'toradora', 'oshi', 'ko']
+
+
+def make_records(count, rng):
+    records = []
+    for i in range(count):
+        status = rng.choice(STATUSES)
+        total = rng.randint(1, 100)
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        records.append({
+            'title': f"{title} {i}",
+            'status': status,
+            'preference': rng.choice(PREFERENCES),
+            'genre': rng.choice(GENRES),
+            'episodes_watched': total if status == 'Completed' else rng.randint(0, total),
+            'total_episodes': total,
+            'start_date': None if status == 'To Watch' else '2024-01-15',
+            'completed_date': '2024-03-02' if status == 'Completed' else None,
+            'source_link': None,
+            'favorite': rng.random() < 0.1,
+        })
+    return records
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'ops': len(samples),
+        'mean_us': round(statistics.fmean(samples) * 1e6, 2),
+        'p50_us': round(samples[len(samples) // 2] * 1e6, 2),
+        'p95_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6, 2),
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+async def timed_async(factory, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await factory()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def open_storage(kind, workdir):
+    if kind == 'sqlite':
+        return SqliteStorage(os.path.join(workdir, 'data', 'anime.db'))
+    return JsonStorage(os.path.join(workdir, 'data'))
+
+
+def bench_watchlist(results, storage, size, repeat, rng):
+    watch_list = AnimeWatchList(storage.key_for_user(f'bench_{size}'), storage=storage)
+    watch_list.add_many(Anime(**record) for record in make_records(size, rng))
+    titles = [anime.title for anime in watch_list.anime_list]
+    # Whole-word fragments and single-typo variants, as users type them
+    keywords = [rng.choice(title.split()) for title in rng.sample(titles, min(50, len(titles)))]
+    keywords += [word[:-2] + word[-1] for word in keywords if len(word) > 3]
+
+    extra = iter(Anime(**record) for record in make_records(repeat, rng))
+    results[f'add_anime[n={size}]'] = timed(lambda: watch_list.add_anime(next(extra)), repeat)
+    with watch_list.batch():
+        for _ in range(repeat):
+            watch_list.delete_anime(len(watch_list.anime_list) - 1)
+    results[f'search_anime[n={size}]'] = timed(lambda: watch_list.search_anime(rng.choice(keywords), limit=10), repeat)
+    results[f'pick_random_anime[n={size}]'] = timed(watch_list.pick_random_anime, repeat)
+    results[f'save_data[n={size}]'] = timed(watch_list.save_data, repeat)
+    results[f'load_data[n={size}]'] = timed(watch_list.load_data, repeat)
+
+
+def import_bot(storage_kind, workdir):
+    """Import bot.py with its storage pointed at the scratch directory, or None without discord.py."""
+    try:
+        import discord  # noqa: F401
+    except ImportError:
+        return None
+    os.environ.update({'STORAGE_BACKEND': storage_kind, 'WRITE_BEHIND_INTERVAL': '0',
+                       'WATCHLIST_CACHE_SIZE': '0', 'WATCHLIST_CACHE_TTL': '0',
+                       'SQLITE_PATH': os.path.join(workdir, 'data', 'anime.db')})
+    cwd = os.getcwd()
+    os.chdir(workdir)  # bot.py keeps data/ and logs/ relative to the working directory
+    try:
+        import bot
+    finally:
+        os.chdir(cwd)
+    bot.storage = open_storage(storage_kind, workdir)
+    return bot
+
+
+def bench_user_lookup(results, bot, users, entries, rng):
+    jobs = [(bot.storage.key_for_user(user_id), make_records(entries, rng)) for user_id in range(users)]
+    for start in range(0, len(jobs), 500):
+        bot.storage.save_many(jobs[start:start + 500])
+    bot.user_watchlists = WatchlistCache(maxsize=0)
+    for label in ('cold', 'warm'):
+        samples = []
+        for user_id in range(users):
+            start = time.perf_counter()
+            bot.get_user_watchlist(user_id)
+            samples.append(time.perf_counter() - start)
+        results[f'get_user_watchlist_{label}[users={users},n={entries}]'] = summarize(samples)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f'bench{user_id}'
+        self.discriminator = '0'
+        self.display_name = self.name
+        self.mention = f'<@{user_id}>'
+
+
+class FakeResponse:
+    def __init__(self):
+        self.sent = []
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.sent.append(content)
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, response):
+        self.response = response
+
+    async def send(self, content=None, **kwargs):
+        self.response.sent.append(content)
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the command callbacks."""
+
+    def __init__(self, user):
+        self.user = user
+        self.guild = None
+        self.response = FakeResponse()
+        self.followup = FakeFollowup(self.response)
+
+
+class FakeContext:
+    """Just enough of commands.Context for the prefix command callbacks."""
+
+    def __init__(self, user):
+        self.author = user
+        self.guild = None
+        self.sent = []
+        self.message = SimpleNamespace(attachments=[], author=user)
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+async def bench_commands(results, bot, entries, repeat, rng):
+    user = FakeUser(10**9)
+    bot.storage.save(bot.storage.key_for_user(user.id), make_records(entries, rng))
+    bot.user_watchlists = WatchlistCache(maxsize=0)
+    bot.pipeline.limiter = None  # the benchmark calls far faster than any user may
+    keyword = bot.get_user_watchlist(user.id).anime_list[0].title.split()[0]
+
+    slash = lambda command, *args, **kwargs: lambda: command.callback(FakeInteraction(user), *args, **kwargs)
+    prefix = lambda command, *args, **kwargs: lambda: command.callback(FakeContext(user), *args, **kwargs)
+    cases = {
+        'add_anime': slash(bot.add_anime, 'Bench Title', 'To Watch', 'Medium', 12),
+        'list_anime': slash(bot.list_anime),
+        'update_progress': slash(bot.update_progress, '0', 3),
+        'search_anime': slash(bot.search_anime, keyword),
+        'random_anime': slash(bot.random_anime),
+        'bulk_update': slash(bot.bulk_update, '0:1 1:2 2:3'),
+        '!progress': prefix(bot.progress, '0', '4'),
+        '!search': prefix(bot.search_cmd, keyword=keyword),
+        '!list': prefix(bot.list_cmd),
+    }
+    for name, factory in cases.items():
+        results[f'command {name}[n={entries}]'] = await timed_async(factory, repeat)
+
+
+def compare(results, baseline, threshold):
+    """Names of benchmarks whose median got slower than the baseline by more than threshold."""
+    regressions = []
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before and stats['p50_us'] > before['p50_us'] * (1 + threshold):
+            regressions.append((name, before['p50_us'], stats['p50_us']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,100,1000,10000', help='comma separated watchlist sizes')
+    parser.add_argument('--users', type=int, default=1000, help='users for the cold/warm lookup benchmark')
+    parser.add_argument('--user-entries', type=int, default=20, help='entries per synthetic user')
+    parser.add_argument('--repeat', type=int, default=50, help='timed calls per operation')
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='json')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed median slowdown against the baseline (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    results = {}
+    skipped = []
+    with tempfile.TemporaryDirectory(prefix='anime_bench_') as workdir:
+        storage = open_storage(args.storage, workdir)
+        for size in (int(size) for size in args.sizes.split(',')):
+            bench_watchlist(results, storage, size, args.repeat, rng)
+        storage.close()
+
+        bot = import_bot(args.storage, workdir)
+        if bot is None:
+            skipped.append('get_user_watchlist and command handlers (discord.py not installed)')
+        else:
+            bench_user_lookup(results, bot, args.users, args.user_entries, rng)
+            asyncio.run(bench_commands(results, bot, min(1000, max(int(s) for s in args.sizes.split(','))),
+                                       args.repeat, rng))
+            bot.storage.close()
+
+    for name, stats in results.items():
+        print(f"{name:<55} p50 {stats['p50_us']:>11.1f} us   p95 {stats['p95_us']:>11.1f} us")
+    for reason in skipped:
+        print(f"skipped: {reason}")
+
+    report = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'args': vars(args),
+            'skipped': skipped,
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p50 {before:.1f} us -> {after:.1f} us ({after / before - 1:+.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
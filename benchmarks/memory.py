@@ -0,0 +1,84 @@
+"""Per-entry memory of cached Anime records.
+
+Compares the slot-based Anime against the previous dict-based layout by
+decoding the same JSON payload into each and measuring what stays alive.
+
+    python -m benchmarks.memory --count 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+from main import Anime
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Fantasy', 'Romance', 'Sci-Fi', 'Slice of Life', 'Unknown']
+STATUSES = ['To Watch', 'Watching', 'Completed']
+PREFERENCES = ['High', 'Medium', 'Low']
+
+
+class LegacyAnime:
+    # The dict-based record Anime used before it switched to slots and enums
+    def __init__(self, title, status, preference, genre='Unknown', episodes_watched=0, total_episodes=1, start_date=None, completed_date=None, source_link=None, favorite=False):
+        self.title = title
+        self.status = status
+        self.preference = preference
+        self.genre = genre
+        self.episodes_watched = episodes_watched
+        self.total_episodes = total_episodes
+        self.start_date = start_date
+        self.completed_date = completed_date
+        self.source_link = source_link
+        self.favorite = favorite
+
+
+def make_payload(count, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        status = rng.choice(STATUSES)
+        total = rng.randint(1, 100)
+        records.append({
+            'title': f"Anime {i}",
+            'status': status,
+            'preference': rng.choice(PREFERENCES),
+            'genre': rng.choice(GENRES),
+            'episodes_watched': total if status == 'Completed' else rng.randint(0, total),
+            'total_episodes': total,
+            'start_date': None if status == 'To Watch' else '2024-01-15',
+            'completed_date': '2024-03-02' if status == 'Completed' else None,
+            'source_link': None,
+            'favorite': rng.random() < 0.1,
+        })
+    return json.dumps(records)
+
+
+def measure(cls, payload):
+    gc.collect()
+    tracemalloc.start()
+    # Decoding inside the measurement counts the per-entry strings each layout keeps alive
+    entries = [cls(**item) for item in json.loads(payload)]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entries
+    return current
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args(argv)
+
+    payload = make_payload(args.count)
+    legacy = measure(LegacyAnime, payload)
+    compact = measure(Anime, payload)
+    print(f"entries:        {args.count:,}")
+    print(f"dict-based:     {legacy / 2**20:8.1f} MiB  ({legacy / args.count:6.1f} B/entry)")
+    print(f"slot-based:     {compact / 2**20:8.1f} MiB  ({compact / args.count:6.1f} B/entry)")
+    print(f"saved:          {(legacy - compact) / 2**20:8.1f} MiB  ({(1 - compact / legacy) * 100:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
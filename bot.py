@@ -1,213 +1,1008 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
+import asyncio
+import io
+import logging
+import tempfile
+import time
 import os
-import random
+import re
 from datetime import datetime
-from main import Anime, AnimeWatchList
-from logger import AnimeLogger
+from main import (MAX_CHOICE_LENGTH, Anime, AnimeWatchList, ObserverGroup, Status, parse_changes,
+                  validate_anime_fields)
+from logger import AnimeLogger, log_file_for
+from logquery import LogFilter, chunk_lines, query_log
+from persistence import WriteBehindSaver
+from cache import WatchlistCache
+from search import search_watchlists
+from views import PageCache, WatchlistPager
+from transfer import format_for, read_import, write_export
+from storage import JsonStorage, SqliteStorage
+from metrics import LoopLagMonitor, Metrics, MetricsServer
+from treesync import TreeSyncState, sync_tree
+from cluster import ClusterLink
+from analytics import Analytics
+from recommend import Recommender
+from reminders import ReminderScheduler, parse_day, parse_time
+from pipeline import CommandPipeline, CommandRejected, PrefixReply, SlashReply
+from snapshot import Snapshot, write_snapshot
 from dotenv import load_dotenv
 
+load_dotenv()
+
+log = logging.getLogger('AnimeBot')
+
+# SHARD_COUNT > 0 runs an AutoShardedBot (optionally limited to SHARD_IDS). launcher.py
+# starts several worker processes this way and sets WORKER_INDEX/WORKER_COUNT, which
+# partition watchlist ownership by user ID hash
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '0'))
+SHARD_IDS = [int(i) for i in os.getenv('SHARD_IDS', '').split(',') if i.strip()] or None
+WORKER_INDEX = int(os.getenv('WORKER_INDEX', '0'))
+WORKER_COUNT = int(os.getenv('WORKER_COUNT', '1'))
+
+class AnimeCommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction):
+        if metrics.enabled:
+            interaction.extras['started'] = time.perf_counter()
+        if interaction.guild_id:
+            analytics.join(interaction.guild_id, interaction.user.id)
+        return True
+
+    async def on_error(self, interaction, error):
+        _record_command(interaction.extras.get('started'), interaction.command, 'slash', 'error')
+        await super().on_error(interaction, error)
+
+class AnimeBot(commands.AutoShardedBot if SHARD_COUNT else commands.Bot):
+    async def setup_hook(self):
+        if saver:
+            saver.start()
+        logger.start(self)
+        if cluster:
+            await cluster.start(self)
+        self.analytics_task = asyncio.create_task(_autosave_analytics())
+        recommender.start()
+        reminders.start(_deliver_reminders)
+        if warm_start:
+            self.prewarm_task = asyncio.create_task(_prewarm())
+        if metrics.enabled:
+            loop_lag.start()
+            if metrics_server:
+                await metrics_server.start()
+
+    async def close(self):
+        # Stop everything that changes watchlists first: forwarded events, and reminder
+        # deliveries, which stop() waits for
+        if cluster:
+            await cluster.stop()
+        await reminders.stop()
+        if getattr(self, 'prewarm_task', None):
+            self.prewarm_task.cancel()
+        # Then flush pending watchlist saves and queued logs before the connection goes away
+        if saver:
+            await saver.stop()
+        # The recommender thread reads storage, so it stops before storage closes
+        await asyncio.get_running_loop().run_in_executor(None, recommender.stop)
+        entries = _snapshot_entries()
+        if entries:
+            await _write_snapshot(entries)
+        storage.close()
+        if getattr(self, 'analytics_task', None):
+            self.analytics_task.cancel()
+        if analytics.dirty:
+            analytics.save()
+        await loop_lag.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        await logger.stop()
+        await super().close()
+
 # Create bot instance
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix='!', intents=intents, help_command=None)
+shard_options = {'shard_count': SHARD_COUNT, 'shard_ids': SHARD_IDS} if SHARD_COUNT else {}
+# The activity is sent with every gateway identify, so reconnects need no extra presence update
+bot = AnimeBot(command_prefix='!', intents=intents, help_command=None, tree_cls=AnimeCommandTree,
+               activity=discord.Activity(type=discord.ActivityType.playing, name="Made by INFIE_03"),
+               **shard_options)
+
+# Commands that need the receiving worker's guild cache (permissions, member lists) or no
+# watchlist at all; every other command runs on the worker owning the invoking user
+LOCAL_COMMANDS = {'sync', 'view_logs', 'stats', 'search_server', 'stats_server', 'help', 'sync_commands', 'forcesync'}
+cluster = ClusterLink(
+    WORKER_INDEX, WORKER_COUNT, os.environ.get('CLUSTER_SECRET', ''),
+    base_port=int(os.getenv('CLUSTER_PORT_BASE', '47000')),
+    prefix='!', local_commands=LOCAL_COMMANDS,
+) if WORKER_COUNT > 1 else None
 
-# Dictionary to store watchlists for different users
-user_watchlists = {}
+# Hash of the last synced command tree; on_ready only syncs when the commands changed
+tree_sync_state = TreeSyncState(os.path.join('data', 'command_tree.json'))
 
 # Initialize logger with your log channel ID
 LOG_CHANNEL_ID = None  # Replace with your log channel ID
 logger = AnimeLogger(LOG_CHANNEL_ID)
 
-load_dotenv()
+# Command latency, storage I/O, cache and event-loop metrics; METRICS_PORT > 0 also
+# serves them in Prometheus text format on http://127.0.0.1:<port>/metrics
+metrics = Metrics(enabled=os.getenv('METRICS_ENABLED', '1') != '0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+metrics_server = MetricsServer(metrics, METRICS_PORT) if metrics.enabled and METRICS_PORT > 0 else None
+loop_lag = LoopLagMonitor(metrics)
+
+# Seconds between coalesced watchlist saves; 0 keeps the synchronous save on every change
+WRITE_BEHIND_INTERVAL = float(os.getenv('WRITE_BEHIND_INTERVAL', '0'))
+saver = WriteBehindSaver(WRITE_BEHIND_INTERVAL) if WRITE_BEHIND_INTERVAL > 0 else None
+
+# 'json' keeps one data/anime_list_<id>.json per user, 'sqlite' uses a single database file
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+if STORAGE_BACKEND == 'sqlite':
+    storage = SqliteStorage(os.getenv('SQLITE_PATH', os.path.join('data', 'anime.db')),
+                            on_io=metrics.record_io if metrics.enabled else None)
+else:
+    storage = JsonStorage('data', on_io=metrics.record_io if metrics.enabled else None)
+
+# Running watch statistics behind /stats_me and /stats_server; each worker of a
+# multi-process deployment keeps its own file for the users it owns. Only the
+# MAX_TRACKED_USERS most recently active users are counted
+MAX_TRACKED_USERS = int(os.getenv('MAX_TRACKED_USERS', '100000'))
+analytics = Analytics(os.path.join('data', f'analytics-{WORKER_INDEX}' if WORKER_COUNT > 1 else 'analytics'),
+                      max_users=MAX_TRACKED_USERS or None).load()
+ANALYTICS_SAVE_INTERVAL = 60
+
+async def _autosave_analytics():
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(ANALYTICS_SAVE_INTERVAL)
+        # Only changed shards are saved, each snapshotted on the loop and written in a thread,
+        # so the loop never serializes more than a shard's worth of users at once
+        shards = analytics.take_dirty()
+        for i, shard in enumerate(shards):
+            try:
+                await loop.run_in_executor(None, analytics.write_shard, shard, analytics.shard_dict(shard))
+            except Exception as e:
+                analytics.mark_dirty(shards[i:])
+                await logger.log_action(bot, bot.user, "Save Analytics Failed", error=str(e))
+                break
+
+# Title neighbours for /recommend, maintained by a background thread from watchlist changes.
+# Workers of a multi-process deployment only see their own users' changes, so they rescan
+# storage every few hours to pick up everyone else's
+recommender = Recommender(
+    os.path.join('data', f'recommend-{WORKER_INDEX}' if WORKER_COUNT > 1 else 'recommend'),
+    storage=storage,
+    rescan_interval=6 * 3600 if WORKER_COUNT > 1 else None,
+    max_users=MAX_TRACKED_USERS or None,
+)
+
+# Weekly episode reminders, one schedule file per worker like analytics
+reminders = ReminderScheduler(
+    os.path.join('data', f'reminders-{WORKER_INDEX}.json' if WORKER_COUNT > 1 else 'reminders.json')).load()
+
+# Most recently used watchlists written on shutdown and loaded back on startup, so users
+# don't all hit cold loads after a deploy; entries are checked against storage before use
+SNAPSHOT_SIZE = int(os.getenv('SNAPSHOT_SIZE', '1000'))
+SNAPSHOT_PATH = os.path.join('data', f'snapshot-{WORKER_INDEX}.bin' if WORKER_COUNT > 1 else 'snapshot.bin')
+warm_start = Snapshot.open(SNAPSHOT_PATH, storage.stamp) if SNAPSHOT_SIZE > 0 else None
+
+def _observer_for(user_id):
+    return ObserverGroup(analytics.observer(user_id), recommender.observer(user_id))
+
+def _on_watchlist_evicted(user_id, watch_list):
+    # Unsaved changes stay queued in the saver; write them out now rather than at the next tick
+    if saver and saver.is_dirty(watch_list):
+        saver.flush_soon()
+
+# Cache of loaded watchlists, bounded by WATCHLIST_CACHE_SIZE (0 = unbounded) and
+# optionally expiring lists idle for WATCHLIST_CACHE_TTL seconds
+user_watchlists = WatchlistCache(
+    maxsize=int(os.getenv('WATCHLIST_CACHE_SIZE', '1000')),
+    ttl=float(os.getenv('WATCHLIST_CACHE_TTL', '0')) or None,
+    on_evict=_on_watchlist_evicted,
+)
+
+def _collect_gauges():
+    cache_stats = user_watchlists.stats()
+    return {
+        'watchlist_cache_size': cache_stats['size'],
+        'watchlist_cache_hits_total': cache_stats['hits'],
+        'watchlist_cache_misses_total': cache_stats['misses'],
+        'watchlist_cache_evictions_total': cache_stats['evictions'],
+        'watchlist_cache_hit_rate': cache_stats['hit_rate'],
+        'event_loop_lag_last_seconds': loop_lag.last_lag,
+        'pending_saves': saver.pending if saver else 0,
+        'reminders_scheduled': len(reminders),
+        'reminders_delivered_total': reminders.delivered,
+        'commands_active': pipeline.active,
+        'commands_waiting': pipeline.waiting,
+    }
+
+metrics.add_collector(_collect_gauges)
 
 # Update the WATERMARK constant at the top of the file
 WATERMARK = "🎌 Made by INFIE_03 🎌"
 
+# Maximum number of hits shown by the search commands
+SEARCH_LIMIT = 10
+
+# Rendered /list_anime pages, reused until the watchlist changes
+page_cache = PageCache()
+
+# Every user command runs through one pipeline: per-user rate limit (COMMAND_RATE_PER_MINUTE,
+# bursts of COMMAND_BURST), the user's lock for commands that change a watchlist, and at most
+# MAX_CONCURRENT_COMMANDS at once with up to MAX_QUEUED_COMMANDS waiting before shedding
+pipeline = CommandPipeline(
+    rate=float(os.getenv('COMMAND_RATE_PER_MINUTE', '20')) / 60,
+    burst=int(os.getenv('COMMAND_BURST', '5')),
+    max_concurrent=int(os.getenv('MAX_CONCURRENT_COMMANDS', '32')),
+    max_waiting=int(os.getenv('MAX_QUEUED_COMMANDS', '100')),
+)
+
 @bot.event
 async def on_ready():
+    # Fires again after every reconnect; the sync is skipped unless the commands changed
     print(f'{bot.user} has connected to Discord!')
+    if cluster and cluster.worker_index != 0:
+        return  # the command tree is global; worker 0 syncs it
     try:
-        # Set status
-        await bot.change_presence(
-            activity=discord.Activity(
-                type=discord.ActivityType.playing,
-                name="Made by INFIE_03"
-            )
-        )
-        
-        # Force sync all commands
-        await bot.tree.sync()
-        print("Commands synced!")
-        await logger.log_action(bot, bot.user, "Bot Started", "Commands synced")
+        synced, count, elapsed = await sync_tree(bot.tree, tree_sync_state, bot.application_id)
+        if synced:
+            print("Commands synced!")
+            details = f"Synced {count} commands in {elapsed:.2f}s"
+        else:
+            details = f"{count} commands unchanged, sync skipped"
+        await logger.log_action(bot, bot.user, "Bot Started", details)
     except Exception as e:
         await logger.log_action(bot, bot.user, "Bot Start Failed", error=str(e))
 
+def _record_command(started, command, kind, outcome):
+    if started is None or command is None:
+        return
+    name = command.qualified_name
+    metrics.observe('command_seconds', time.perf_counter() - started, command=name, kind=kind)
+    metrics.inc('commands_total', command=name, kind=kind, outcome=outcome)
+
+@bot.event
+async def on_app_command_completion(interaction, command):
+    outcome = 'error' if interaction.extras.get('command_failed') else 'ok'
+    _record_command(interaction.extras.get('started'), command, 'slash', outcome)
+
+@bot.before_invoke
+async def _before_prefix_command(ctx):
+    if metrics.enabled:
+        ctx.metrics_started = time.perf_counter()
+    if ctx.guild:
+        analytics.join(ctx.guild.id, ctx.author.id)
+
+@bot.event
+async def on_member_remove(member):
+    analytics.leave(member.guild.id, member.id)
+
+@bot.after_invoke
+async def _after_prefix_command(ctx):
+    outcome = 'error' if ctx.command_failed else 'ok'
+    _record_command(getattr(ctx, 'metrics_started', None), ctx.command, 'prefix', outcome)
+
+def _load_watchlist(user_id, observe=True):
+    key = storage.key_for_user(user_id)
+    # A recently evicted list may still hold changes the saver hasn't written yet
+    watch_list = saver.get_pending(key) if saver else None
+    if watch_list is None:
+        # Analytics lives on the event loop; off-loop loads attach the observer afterwards
+        observer = _observer_for(user_id) if observe else None
+        # _prewarm may clear warm_start from the loop while this runs in a thread
+        snapshot = warm_start
+        records = snapshot.take(user_id, key) if snapshot else None
+        watch_list = AnimeWatchList(key, writer=saver, storage=storage, observer=observer, records=records)
+    return watch_list
+
 def get_user_watchlist(user_id):
-    if user_id not in user_watchlists:
-        # Create a data directory if it doesn't exist
-        data_dir = 'data'
-        os.makedirs(data_dir, exist_ok=True)
-        # Store user watchlists in the data directory
-        file_path = os.path.join(data_dir, f'anime_list_{user_id}.json')
-        user_watchlists[user_id] = AnimeWatchList(file_path)
-    return user_watchlists[user_id]
+    watch_list = user_watchlists.get(user_id)
+    if watch_list is None:
+        watch_list = _load_watchlist(user_id)
+        user_watchlists[user_id] = watch_list
+    return watch_list
 
-@bot.tree.command(name="add_anime", description="Add a new anime to your watchlist")
-async def add_anime(interaction: discord.Interaction, 
-                   title: str, 
-                   status: str, 
-                   preference: str, 
-                   total_episodes: int, 
-                   genre: str = "Unknown", 
-                   source_link: str = None):
+_prefetching = {}  # user_id -> running prefetch task
+
+async def _prefetch_watchlist(user_id):
+    # Load in a worker thread, but only touch the cache from the event loop
     try:
-        # Validate inputs
-        if not title:
-            await interaction.response.send_message("Title cannot be empty!")
-            await logger.log_action(bot, interaction.user, "Add Anime Failed", "Empty title")
-            return
+        loop = asyncio.get_running_loop()
+        watch_list = await loop.run_in_executor(None, _load_watchlist, user_id, False)
+        if user_watchlists.peek(user_id) is None:
+            if watch_list.observer is None:
+                watch_list.observer = _observer_for(user_id)
+                watch_list.observer.reloaded(watch_list.anime_list)
+            user_watchlists[user_id] = watch_list
+    finally:
+        _prefetching.pop(user_id, None)
 
-        valid_statuses = ['Completed', 'To Watch', 'Watching']
-        status = status.capitalize()
-        if status not in valid_statuses:
-            await interaction.response.send_message(f"Invalid status! Must be one of: {', '.join(valid_statuses)}")
-            return
+def _load_snapshot_batch(snapshot, user_ids):
+    # Runs in a worker thread; the stamp is re-checked on the loop before the list is used
+    loaded = []
+    for user_id in user_ids:
+        key = storage.key_for_user(user_id)
+        stamp = storage.stamp(key)
+        records = snapshot.take(user_id, key)
+        if records is not None:
+            loaded.append((user_id, stamp, AnimeWatchList(key, writer=saver, storage=storage, records=records)))
+    return loaded
 
-        valid_preferences = ['High', 'Medium', 'Low']
-        preference = preference.capitalize()
-        if preference not in valid_preferences:
-            await interaction.response.send_message(f"Invalid preference! Must be one of: {', '.join(valid_preferences)}")
-            return
+async def _prewarm(batch_size=100):
+    """Fill the watchlist cache from the warm-start snapshot, most recently active users first."""
+    global warm_start
+    snapshot = warm_start
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    warmed = 0
+    try:
+        user_ids = snapshot.user_ids()[:user_watchlists.maxsize or None]
+        for i in range(0, len(user_ids), batch_size):
+            batch = [user_id for user_id in user_ids[i:i + batch_size]
+                     if user_watchlists.peek(user_id) is None and user_id not in _prefetching]
+            for user_id, stamp, watch_list in await loop.run_in_executor(None, _load_snapshot_batch, snapshot, batch):
+                # Skip users whose list was loaded, or changed and saved, while this batch was decoded
+                if user_watchlists.peek(user_id) is not None or storage.stamp(watch_list.data_file) != stamp \
+                        or (saver and saver.get_pending(watch_list.data_file)):
+                    continue
+                watch_list.observer = _observer_for(user_id)
+                watch_list.observer.reloaded(watch_list.anime_list)
+                user_watchlists[user_id] = watch_list
+                warmed += 1
+    finally:
+        warm_start = None
+        stale = snapshot.stale
+        snapshot.close()
+    await logger.log_action(bot, bot.user, "Warm Start",
+                            f"{warmed} watchlists loaded from the snapshot in {time.perf_counter() - started:.2f}s"
+                            + (f", {stale} stale" if stale else ""))
 
-        if total_episodes <= 0:
-            await interaction.response.send_message("Total episodes must be positive!")
-            return
+def _snapshot_entries():
+    """(user_id, key, records) of the most recently used watchlists, taken on the loop at shutdown."""
+    if SNAPSHOT_SIZE <= 0:
+        return []
+    entries = []
+    for user_id in user_watchlists.keys_by_recency():
+        watch_list = user_watchlists.peek(user_id)
+        # A list whose last save failed differs from storage; it must not outlive this process
+        if watch_list is None or (saver and saver.is_dirty(watch_list)) or not watch_list.anime_list:
+            continue
+        entries.append((user_id, watch_list.data_file, watch_list.to_records()))
+        if len(entries) >= SNAPSHOT_SIZE:
+            break
+    return entries
 
-        # Add anime to user's watchlist
-        watch_list = get_user_watchlist(interaction.user.id)
-        anime = Anime(title, status, preference, genre, 0, total_episodes, source_link=source_link)
-        watch_list.add_anime(anime)
-        
-        await interaction.response.send_message(f"Added {title} to your list!")
-        await logger.log_action(bot, interaction.user, "Add Anime", f"Title: {title}, Status: {status}, Episodes: {total_episodes}")
+async def _write_snapshot(entries):
+    try:
+        loop = asyncio.get_running_loop()
+        users, size = await loop.run_in_executor(None, write_snapshot, SNAPSHOT_PATH, entries, storage.stamp)
+        log.info(f"Wrote a warm-start snapshot of {users} watchlists ({size / 1024:.0f} KiB)")
     except Exception as e:
-        await interaction.response.send_message(f"An error occurred: {str(e)}")
-        await logger.log_action(bot, interaction.user, "Add Anime Failed", error=str(e))
+        log.error(f"Writing the warm-start snapshot failed: {e}")
 
-@bot.tree.command(name="list_anime", description="List all anime in your watchlist")
-async def list_anime(interaction: discord.Interaction):
-    try:
-        watch_list = get_user_watchlist(interaction.user.id)
-        if not watch_list.anime_list:
-            await interaction.response.send_message("Your watchlist is empty!")
-            await logger.log_action(bot, interaction.user, "List Anime", "Empty watchlist")
-            return
+async def anime_title_autocomplete(interaction: discord.Interaction, current: str):
+    # Discord gives autocomplete a hard deadline, so answer from memory only;
+    # a cold list is loaded in the background and serves the next keystroke
+    watch_list = user_watchlists.peek(interaction.user.id)
+    if watch_list is None:
+        if interaction.user.id not in _prefetching:
+            _prefetching[interaction.user.id] = asyncio.create_task(_prefetch_watchlist(interaction.user.id))
+        return []
+    # Titles over the value limit are cut; find_index resolves them by unique prefix
+    return [app_commands.Choice(name=anime.title[:MAX_CHOICE_LENGTH], value=anime.title[:MAX_CHOICE_LENGTH])
+            for anime in watch_list.title_index.complete(current, limit=25)]
 
-        embed = discord.Embed(title="Your Anime Watchlist", color=discord.Color.blue())
-        
-        for i, anime in enumerate(watch_list.anime_list):
-            progress = f"[{anime.episodes_watched}/{anime.total_episodes}]" if anime.status == 'Watching' else ""
-            favorite = "⭐ " if anime.favorite else ""
-            embed.add_field(
-                name=f"{i}. {favorite}{anime.title}",
-                value=f"Status: {anime.status}\nPriority: {anime.preference}\nGenre: {anime.genre} {progress}",
-                inline=False
-            )
-        
-        # Add watermark
-        embed.set_footer(text=WATERMARK)
-        embed.timestamp = datetime.now()
+async def run_command(reply, action, handler, *args, heavy=False, exclusive=False):
+    """Run a shared command handler through the pipeline for either front-end.
 
-        await interaction.response.send_message(embed=embed)
-        await logger.log_action(bot, interaction.user, "List Anime", f"Listed {len(watch_list.anime_list)} anime")
+    Shed commands get the pipeline's "slow down" / "busy" reply, and failures
+    are reported and logged as "<action> Failed" here instead of in every handler;
+    they still count as errors in the command metrics.
+    """
+    try:
+        await pipeline.run(reply, handler, *args, heavy=heavy, exclusive=exclusive)
+    except CommandRejected as e:
+        metrics.inc('commands_shed_total', reason=e.reason)
+        await reply.send(str(e), ephemeral=True)
     except Exception as e:
-        await interaction.response.send_message(f"An error occurred: {str(e)}")
-        await logger.log_action(bot, interaction.user, "List Anime Failed", error=str(e))
+        reply.mark_failed()
+        await reply.send(f"An error occurred: {str(e)}")
+        await logger.log_action(bot, reply.user, f"{action} Failed", error=str(e))
 
-@bot.tree.command(name="update_progress", description="Update the watched episodes for an anime")
-async def update_progress(interaction: discord.Interaction, index: int, episodes: int):
+# Shared command handlers; the slash and prefix commands below only parse their arguments
+
+async def _add(reply, title, status, preference, total_episodes, genre="Unknown", source_link=None):
+    # Validate inputs
     try:
-        watch_list = get_user_watchlist(interaction.user.id)
-        if 0 <= index < len(watch_list.anime_list):
-            if episodes >= 0:
-                watch_list.update_progress(index, episodes)
-                await interaction.response.send_message("Progress updated successfully!")
-            else:
-                await interaction.response.send_message("Episodes cannot be negative!")
-        else:
-            await interaction.response.send_message("Invalid index!")
-    except Exception as e:
-        await interaction.response.send_message(f"An error occurred: {str(e)}")
+        title, status, preference, total_episodes = validate_anime_fields(title, status, preference, total_episodes)
+    except ValueError as e:
+        await reply.send(str(e))
+        await logger.log_action(bot, reply.user, "Add Anime Failed", str(e))
+        return
+
+    # Add anime to user's watchlist
+    watch_list = get_user_watchlist(reply.user.id)
+    anime = Anime(title, status, preference, genre, 0, total_episodes, source_link=source_link)
+    watch_list.add_anime(anime)
+
+    await reply.send(f"Added {title} to your list!")
+    await logger.log_action(bot, reply.user, "Add Anime", f"Title: {title}, Status: {status}, Episodes: {total_episodes}")
+
+async def _list(reply):
+    watch_list = get_user_watchlist(reply.user.id)
+    if not watch_list.anime_list:
+        await reply.send("Your watchlist is empty!")
+        await logger.log_action(bot, reply.user, "List Anime", "Empty watchlist")
+        return
+
+    pager = WatchlistPager(page_cache, reply.user.id, get_user_watchlist, WATERMARK)
+    await reply.send(embed=pager.embed(), view=pager)
+    await logger.log_action(bot, reply.user, "List Anime", f"Listed {len(watch_list.anime_list)} anime")
+
+async def _progress(reply, anime, episodes):
+    watch_list = get_user_watchlist(reply.user.id)
+    index = watch_list.find_index(anime)
+    if index is None:
+        await reply.send("Anime not found in your list!")
+    elif episodes < 0:
+        await reply.send("Episodes cannot be negative!")
+    else:
+        watch_list.update_progress(index, episodes)
+        await reply.send("Progress updated successfully!")
+
+async def _status(reply, anime, status):
+    try:
+        status = Status.parse(status).label
+    except ValueError:
+        await reply.send(f"Invalid status! Must be one of: {', '.join(Status.labels())}")
+        return
+
+    watch_list = get_user_watchlist(reply.user.id)
+    index = watch_list.find_index(anime)
+    if index is None:
+        await reply.send("Anime not found in your list!")
+        return
+    watch_list.update_status(index, status)
+    await reply.send(f"{watch_list.anime_list[index].title} is now {status}!")
+    await logger.log_action(bot, reply.user, "Update Status", f"Title: {watch_list.anime_list[index].title}, Status: {status}")
+
+def _bulk_summary(entries):
+    lines = [f"{anime.title}: {anime.episodes_watched}/{anime.total_episodes or '?'} ({anime.status})"
+             + (" ⭐" if anime.favorite else "") for anime in entries]
+    summary = f"Updated {len(entries)} anime!\n" + "\n".join(lines)
+    return summary if len(summary) <= 2000 else summary[:1997] + "..."
+
+async def _bulk_update(reply, spec):
+    watch_list = get_user_watchlist(reply.user.id)
+    try:
+        # Validates every change first, then applies them all with one save
+        entries = watch_list.apply_changes(parse_changes(spec))
+    except ValueError as e:
+        await reply.send(f"Nothing was updated: {e}")
+        return
+    await reply.send(_bulk_summary(entries))
+    await logger.log_action(bot, reply.user, "Bulk Update", f"Changes: {spec}")
+
+async def _favorite(reply, anime):
+    watch_list = get_user_watchlist(reply.user.id)
+    index = watch_list.find_index(anime)
+    if index is None:
+        await reply.send("Anime not found in your list!")
+        return
+    watch_list.mark_favorite(index)
+    entry = watch_list.anime_list[index]
+    state = "added to" if entry.favorite else "removed from"
+    await reply.send(f"{entry.title} {state} your favorites!")
+    await logger.log_action(bot, reply.user, "Toggle Favorite", f"Title: {entry.title}, Favorite: {entry.favorite}")
+
+async def _delete(reply, anime):
+    watch_list = get_user_watchlist(reply.user.id)
+    index = watch_list.find_index(anime)
+    if index is None:
+        await reply.send("Anime not found in your list!")
+        return
+    entry = watch_list.anime_list[index]
+    if entry.favorite:
+        await reply.send("Favorites can't be deleted, unmark it with /favorite first!")
+        return
+    watch_list.delete_anime(index)
+    await reply.send(f"Removed {entry.title} from your list!")
+    await logger.log_action(bot, reply.user, "Delete Anime", f"Title: {entry.title}")
+
+async def _random(reply, genre=None):
+    watch_list = get_user_watchlist(reply.user.id)
+    anime = watch_list.pick_random_anime(genre)
 
-@bot.tree.command(name="random_anime", description="Get a random anime suggestion from your watchlist")
-async def random_anime(interaction: discord.Interaction):
-    watch_list = get_user_watchlist(interaction.user.id)
-    anime = watch_list.pick_random_anime()
-    
     if anime:
         embed = discord.Embed(title="Random Anime Suggestion", color=discord.Color.green())
         embed.add_field(name="Why not watch:", value=str(anime), inline=False)
         embed.set_footer(text=WATERMARK)  # Add watermark
         embed.timestamp = datetime.now()
-        await interaction.response.send_message(embed=embed)
+        await reply.send(embed=embed)
     else:
-        await interaction.response.send_message("No unwatched anime in your list!")
+        await reply.send("No unwatched anime in your list!")
+
+async def _search(reply, keyword):
+    watch_list = get_user_watchlist(reply.user.id)
+    results = watch_list.search_anime(keyword, limit=SEARCH_LIMIT)
 
-@bot.tree.command(name="search_anime", description="Search for anime in your watchlist")
-async def search_anime(interaction: discord.Interaction, keyword: str):
-    watch_list = get_user_watchlist(interaction.user.id)
-    results = watch_list.search_anime(keyword)
-    
     if results:
         embed = discord.Embed(title=f"Search Results for '{keyword}'", color=discord.Color.blue())
         for i, anime in enumerate(results):
             embed.add_field(name=f"{i}.", value=str(anime), inline=False)
         embed.set_footer(text=WATERMARK)  # Add watermark
         embed.timestamp = datetime.now()
-        await interaction.response.send_message(embed=embed)
+        await reply.send(embed=embed)
     else:
-        await interaction.response.send_message("No matches found!")
+        await reply.send("No matches found!")
+
+# Largest attachment accepted by the import commands
+MAX_IMPORT_BYTES = 5 * 1024 * 1024
+
+async def _import(reply, attachment):
+    """Import a CSV or MAL XML attachment into the user's watchlist."""
+    fmt = format_for(attachment.filename)
+    if fmt is None:
+        await reply.send("Please attach a .csv file or a MyAnimeList .xml export!")
+        return
+    if attachment.size > MAX_IMPORT_BYTES:
+        await reply.send(f"File too large! The limit is {MAX_IMPORT_BYTES // (1024 * 1024)} MB.")
+        return
+
+    # Spool the upload and parse it row by row in a worker thread
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as fp:
+        await attachment.save(fp)
+        fp.seek(0)
+        loop = asyncio.get_running_loop()
+        animes, errors = await loop.run_in_executor(None, read_import, fp, fmt)
+
+    # One save for the whole import
+    get_user_watchlist(reply.user.id).add_many(animes)
+
+    report = f"Imported {len(animes)} anime."
+    if errors:
+        report += f" {len(errors)} rows skipped:\n"
+        report += "\n".join(f"• {label}: {error}" for label, error in errors[:10])
+        if len(errors) > 10:
+            report += f"\n… and {len(errors) - 10} more"
+    await reply.send(report[:2000])
+    await logger.log_action(bot, reply.user, "Import Anime", f"File: {attachment.filename}, {report.splitlines()[0]}")
+
+async def _export(reply, fmt):
+    # Snapshot on the loop, write the file in a worker thread
+    records = get_user_watchlist(reply.user.id).to_records()
+
+    def write():
+        fp = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        text = io.TextIOWrapper(fp, encoding='utf-8', newline='')
+        write_export(records, fmt, text)
+        text.flush()
+        text.detach()
+        fp.seek(0)
+        return fp
+
+    loop = asyncio.get_running_loop()
+    fp = await loop.run_in_executor(None, write)
+    await reply.send("Here is your watchlist!", file=discord.File(fp, filename=f"anime_list.{fmt}"))
+    await logger.log_action(bot, reply.user, "Export Anime", f"Format: {fmt}")
+
+def _stats_me_embed(user, summary):
+    embed = discord.Embed(title=f"📊 {user.display_name}'s Watch Stats", color=discord.Color.green())
+    embed.add_field(name="Entries", value=(f"{summary['entries']} total • {summary['watching']} watching • "
+                                           f"{summary['completed']} completed • {summary['to_watch']} to watch"), inline=False)
+    embed.add_field(name="Completion rate", value=f"{summary['completion_rate']:.0%}", inline=True)
+    embed.add_field(name="Episodes watched", value=f"{summary['episodes']} ({summary['episodes_per_day']:.2f}/day)", inline=True)
+    embed.add_field(name="Favorites", value=str(summary['favorites']), inline=True)
+    if summary['avg_days_to_complete'] is not None:
+        embed.add_field(name="Avg. days to complete", value=f"{summary['avg_days_to_complete']:.1f}", inline=True)
+    if summary['top_genres']:
+        embed.add_field(name="Top genres", value=", ".join(f"{genre.title()} ({count})" for genre, count in summary['top_genres']), inline=False)
+    embed.set_footer(text=WATERMARK)
+    embed.timestamp = datetime.now()
+    return embed
+
+async def _stats_me(reply):
+    summary = analytics.user_summary(reply.user.id)
+    if summary is None:
+        # Not counted yet, or forgotten as inactive: count the list again
+        watch_list = get_user_watchlist(reply.user.id)
+        analytics.replace_user(reply.user.id, watch_list.anime_list)
+        summary = analytics.user_summary(reply.user.id)
+    if not summary or not summary['entries']:
+        await reply.send("Your watchlist is empty!")
+        return
+    await reply.send(embed=_stats_me_embed(reply.user, summary))
+    await logger.log_action(bot, reply.user, "Stats Me")
+
+def _worker_scope():
+    # Server-wide replies only cover the users owned by the worker that answers
+    return f" on worker {WORKER_INDEX + 1} of {WORKER_COUNT}" if WORKER_COUNT > 1 else ""
+
+async def _stats_server(reply):
+    if reply.guild is None:
+        await reply.send("This command can only be used in a server!")
+        return
+    summary = analytics.guild_summary(reply.guild.id)
+    if not summary or not summary['entries']:
+        await reply.send("No statistics for this server yet!")
+        return
+    embed = discord.Embed(title=f"📊 {reply.guild.name} Watch Stats", color=discord.Color.green())
+    embed.add_field(name="Members tracked", value=str(summary['members']), inline=True)
+    embed.add_field(name="Entries", value=str(summary['entries']), inline=True)
+    embed.add_field(name="Completion rate", value=f"{summary['completion_rate']:.0%}", inline=True)
+    embed.add_field(name="Episodes watched", value=str(summary['episodes']), inline=True)
+    if summary['top_titles']:
+        embed.add_field(name="Top titles", value="\n".join(f"{i}. {title[:80]} ({count})"
+                                                          for i, (title, count) in enumerate(summary['top_titles'], 1)), inline=False)
+    if summary['top_genres']:
+        embed.add_field(name="Top genres", value=", ".join(f"{genre.title()} ({count})" for genre, count in summary['top_genres']), inline=False)
+    embed.set_footer(text=f"{WATERMARK} • Recently active members{_worker_scope()}")
+    embed.timestamp = datetime.now()
+    await reply.send(embed=embed)
+    await logger.log_action(bot, reply.user, "Stats Server", f"Guild: {reply.guild.id}")
+
+async def _search_server(reply, keyword):
+    if reply.guild is None:
+        await reply.send("This command can only be used in a server!")
+        return
+
+    # Only watchlists already in memory are searched, so this never touches the disk
+    members = {}
+    for user_id, watch_list in user_watchlists.items():
+        member = reply.guild.get_member(user_id)
+        if member:
+            members[user_id] = (member, watch_list)
+    results = search_watchlists(((uid, wl) for uid, (_, wl) in members.items()), keyword, limit=SEARCH_LIMIT)
+
+    if results:
+        embed = discord.Embed(title=f"Server Results for '{keyword}'", color=discord.Color.blue())
+        for user_id, anime in results:
+            embed.add_field(name=members[user_id][0].display_name, value=str(anime), inline=False)
+        embed.set_footer(text=f"{WATERMARK} • Searched {len(members)} members' lists in memory{_worker_scope()}")
+        embed.timestamp = datetime.now()
+        await reply.send(embed=embed)
+    else:
+        await reply.send("No matches found!")
+
+async def _recommend(reply, count=10):
+    watch_list = get_user_watchlist(reply.user.id)
+    if not watch_list.anime_list:
+        await reply.send("Add some anime to your list first!")
+        return
+    results = recommender.recommend(watch_list.anime_list, limit=max(1, min(count, 20)))
+    if not results:
+        message = "Still learning from everyone's lists, try again in a minute!" if not recommender.ready \
+            else "No recommendations yet, add a few more anime!"
+        await reply.send(message)
+        return
+    embed = discord.Embed(title="🎯 Recommended for You", color=discord.Color.green())
+    for i, (title, score, because) in enumerate(results, 1):
+        embed.add_field(name=f"{i}. {title}"[:256], value=f"Because you liked {because}"[:1024], inline=False)
+    embed.set_footer(text=WATERMARK)
+    embed.timestamp = datetime.now()
+    await reply.send(embed=embed)
+    await logger.log_action(bot, reply.user, "Recommend", f"{len(results)} results")
+
+async def _remind(reply, anime, day, time, utc_offset=0.0):
+    try:
+        weekday, minute = parse_day(day), parse_time(time)
+        if not -12 <= utc_offset <= 14:
+            raise ValueError("UTC offset must be between -12 and 14!")
+    except ValueError as e:
+        await reply.send(str(e))
+        return
+    watch_list = get_user_watchlist(reply.user.id)
+    index = watch_list.find_index(anime)
+    if index is None:
+        await reply.send("Anime not found in your list!")
+        return
+    entry = watch_list.anime_list[index]
+    try:
+        reminder = reminders.set(reply.user.id, entry.title, weekday, minute, round(utc_offset * 60))
+    except ValueError as e:
+        await reply.send(str(e))
+        return
+    await reply.send(f"I'll remind you about {entry.title} on {reminder.describe()}!")
+    await logger.log_action(bot, reply.user, "Set Reminder", f"Title: {entry.title}, {reminder.describe()}")
+
+async def _list_reminders(reply):
+    own = reminders.for_user(reply.user.id)
+    if not own:
+        await reply.send("You have no reminders! Set one with /remind")
+        return
+    embed = discord.Embed(title="⏰ Your Reminders", color=discord.Color.green(),
+                          description="\n".join(f"• **{reminder.title}**: {reminder.describe()} "
+                                                f"(next <t:{int(reminder.due)}:R>)" for reminder in own)[:4096])
+    embed.set_footer(text=WATERMARK)
+    await reply.send(embed=embed)
+    await logger.log_action(bot, reply.user, "List Reminders", f"{len(own)} reminders")
+
+async def _remind_off(reply, anime):
+    reminder = reminders.remove(reply.user.id, anime)
+    if reminder is None and len(anime) >= MAX_CHOICE_LENGTH:
+        # A longer title cut short by autocomplete
+        lower = anime.strip().lower()
+        matches = [own for own in reminders.for_user(reply.user.id) if own.title.lower().startswith(lower)]
+        if len(matches) == 1:
+            reminder = reminders.remove(reply.user.id, matches[0].title)
+    if reminder is None:
+        await reply.send("No reminder set for that anime!")
+        return
+    await reply.send(f"Reminder for {reminder.title} removed!")
+    await logger.log_action(bot, reply.user, "Remove Reminder", f"Title: {reminder.title}")
+
+async def _deliver_reminders(user_id, due):
+    """DM one user every show that is due, in a single message."""
+    watch_list = user_watchlists.peek(user_id)
+    if watch_list is None:
+        await _prefetch_watchlist(user_id)
+        watch_list = get_user_watchlist(user_id)
+    lines = []
+    for reminder in due:
+        index = watch_list.find_index(reminder.title)
+        entry = watch_list.anime_list[index] if index is not None else None
+        # Shows that were removed or finished don't need reminders anymore
+        if entry is None or entry.status_enum == Status.COMPLETED:
+            reminders.remove(user_id, reminder.title)
+            continue
+        lines.append(f"• **{entry.title}**: episode {entry.episodes_watched + 1}"
+                     + (f" of {entry.total_episodes}" if entry.total_episodes > 1 else ""))
+    if not lines:
+        return
+    user = bot.get_user(user_id) or await bot.fetch_user(user_id)
+    embed = discord.Embed(title="📺 New episodes to watch", description="\n".join(lines)[:4096],
+                          color=discord.Color.green())
+    embed.set_footer(text=f"{WATERMARK} • /remind_off to stop")
+    try:
+        await user.send(embed=embed)
+    except discord.Forbidden:
+        # DMs are closed; stop trying every week
+        for reminder in due:
+            reminders.remove(user_id, reminder.title)
+        await logger.log_action(bot, user, "Reminder Failed", error="DMs closed, reminders removed")
+        return
+    await logger.log_action(bot, user, "Reminder", f"{len(lines)} shows")
+
+# Slash commands
+
+@bot.tree.command(name="add_anime", description="Add a new anime to your watchlist")
+async def add_anime(interaction: discord.Interaction, 
+                   title: str, 
+                   status: str, 
+                   preference: str, 
+                   total_episodes: int, 
+                   genre: str = "Unknown", 
+                   source_link: str = None):
+    await run_command(SlashReply(interaction), "Add Anime", _add, title, status, preference, total_episodes,
+                      genre, source_link, exclusive=True)
+
+@bot.tree.command(name="list_anime", description="List all anime in your watchlist")
+async def list_anime(interaction: discord.Interaction):
+    await run_command(SlashReply(interaction), "List Anime", _list)
+
+@bot.tree.command(name="update_progress", description="Update the watched episodes for an anime")
+@app_commands.describe(anime="Title (or list index) of the anime")
+@app_commands.autocomplete(anime=anime_title_autocomplete)
+async def update_progress(interaction: discord.Interaction, anime: str, episodes: int):
+    await run_command(SlashReply(interaction), "Update Progress", _progress, anime, episodes, exclusive=True)
+
+@bot.tree.command(name="update_status", description="Change the status of an anime")
+@app_commands.describe(anime="Title (or list index) of the anime", status="Completed, To Watch or Watching")
+@app_commands.autocomplete(anime=anime_title_autocomplete)
+async def update_status(interaction: discord.Interaction, anime: str, status: str):
+    await run_command(SlashReply(interaction), "Update Status", _status, anime, status, exclusive=True)
+
+@bot.tree.command(name="bulk_update", description="Update progress/status of several anime at once")
+@app_commands.describe(updates='e.g. 0:12 3:5 7:24 or "Steins;Gate":24:completed 2::fav')
+async def bulk_update(interaction: discord.Interaction, updates: str):
+    await run_command(SlashReply(interaction), "Bulk Update", _bulk_update, updates, exclusive=True)
+
+@bot.tree.command(name="favorite", description="Mark or unmark an anime as favorite")
+@app_commands.describe(anime="Title (or list index) of the anime")
+@app_commands.autocomplete(anime=anime_title_autocomplete)
+async def favorite(interaction: discord.Interaction, anime: str):
+    await run_command(SlashReply(interaction), "Toggle Favorite", _favorite, anime, exclusive=True)
+
+@bot.tree.command(name="delete_anime", description="Remove an anime from your watchlist")
+@app_commands.describe(anime="Title (or list index) of the anime")
+@app_commands.autocomplete(anime=anime_title_autocomplete)
+async def delete_anime(interaction: discord.Interaction, anime: str):
+    await run_command(SlashReply(interaction), "Delete Anime", _delete, anime, exclusive=True)
+
+@bot.tree.command(name="random_anime", description="Get a random anime suggestion from your watchlist")
+@app_commands.describe(genre="Only suggest anime of this genre")
+async def random_anime(interaction: discord.Interaction, genre: str = None):
+    await run_command(SlashReply(interaction), "Random Anime", _random, genre)
+
+@bot.tree.command(name="stats_me", description="Show statistics about your watchlist")
+async def stats_me(interaction: discord.Interaction):
+    await run_command(SlashReply(interaction), "Stats Me", _stats_me)
+
+@bot.tree.command(name="stats_server", description="Show watch statistics for this server")
+async def stats_server(interaction: discord.Interaction):
+    await run_command(SlashReply(interaction), "Stats Server", _stats_server)
+
+@bot.tree.command(name="remind", description="Get a weekly DM reminder for an anime you're watching")
+@app_commands.describe(anime="Title (or list index) of the anime", day="Day of the week, e.g. Saturday",
+                       time="Time as HH:MM", utc_offset="Your UTC offset in hours, e.g. 2 or -5.5")
+@app_commands.autocomplete(anime=anime_title_autocomplete)
+async def remind(interaction: discord.Interaction, anime: str, day: str, time: str, utc_offset: float = 0.0):
+    await run_command(SlashReply(interaction), "Set Reminder", _remind, anime, day, time, utc_offset)
+
+@bot.tree.command(name="reminders", description="List your episode reminders")
+async def list_reminders(interaction: discord.Interaction):
+    await run_command(SlashReply(interaction), "List Reminders", _list_reminders)
+
+@bot.tree.command(name="remind_off", description="Stop the reminder for an anime")
+@app_commands.describe(anime="Title of the anime")
+async def remind_off(interaction: discord.Interaction, anime: str):
+    await run_command(SlashReply(interaction), "Remove Reminder", _remind_off, anime)
+
+@remind_off.autocomplete('anime')
+async def remind_off_autocomplete(interaction: discord.Interaction, current: str):
+    current = current.lower()
+    return [app_commands.Choice(name=reminder.title[:MAX_CHOICE_LENGTH], value=reminder.title[:MAX_CHOICE_LENGTH])
+            for reminder in reminders.for_user(interaction.user.id) if current in reminder.title.lower()][:25]
+
+@bot.tree.command(name="recommend", description="Get anime recommendations based on what similar watchers liked")
+@app_commands.describe(count="Number of recommendations (1-20)")
+async def recommend(interaction: discord.Interaction, count: int = 10):
+    await run_command(SlashReply(interaction), "Recommend", _recommend, count, heavy=True)
+
+@bot.tree.command(name="search_anime", description="Search for anime in your watchlist")
+async def search_anime(interaction: discord.Interaction, keyword: str):
+    await run_command(SlashReply(interaction), "Search Anime", _search, keyword)
+
+@bot.tree.command(name="search_server", description="Search the watchlists of active members in this server")
+async def search_server(interaction: discord.Interaction, keyword: str):
+    await run_command(SlashReply(interaction), "Search Server", _search_server, keyword, heavy=True)
+
+@bot.tree.command(name="import_anime", description="Import anime from a CSV file or MyAnimeList XML export")
+@app_commands.describe(file="A .csv file or a MyAnimeList .xml export")
+async def import_anime(interaction: discord.Interaction, file: discord.Attachment):
+    await run_command(SlashReply(interaction), "Import Anime", _import, file, heavy=True, exclusive=True)
+
+@bot.tree.command(name="export_anime", description="Export your watchlist as CSV or MyAnimeList XML")
+@app_commands.describe(file_format="File format")
+@app_commands.choices(file_format=[
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="MyAnimeList XML", value="xml"),
+])
+async def export_anime(interaction: discord.Interaction, file_format: str = "csv"):
+    await run_command(SlashReply(interaction), "Export Anime", _export, file_format, heavy=True)
+
+def _parse_log_time(value, day):
+    # "HH:MM" on the queried day, or a full "YYYY-MM-DD HH:MM"
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M")
+    except ValueError:
+        clock = datetime.strptime(value, "%H:%M")
+        return day.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
 
 @bot.tree.command(name="view_logs", description="View recent bot logs (Admin only)")
-async def view_logs(interaction: discord.Interaction, lines: int = 10):
+@app_commands.describe(
+    lines="Number of log entries to show",
+    user="Only entries for this user",
+    action="Only entries for this action, e.g. 'Add Anime'",
+    errors_only="Only error entries",
+    since="Start time, HH:MM or YYYY-MM-DD HH:MM",
+    until="End time, HH:MM or YYYY-MM-DD HH:MM",
+    day="Log day as YYYY-MM-DD (defaults to today)",
+)
+async def view_logs(interaction: discord.Interaction, lines: int = 10, user: discord.User = None,
+                    action: str = None, errors_only: bool = False, since: str = None,
+                    until: str = None, day: str = None):
     try:
         # Check if user has admin permissions
         if not interaction.user.guild_permissions.administrator:
             await interaction.response.send_message("You don't have permission to view logs!", ephemeral=True)
             return
 
-        # Read recent logs
-        log_file = f'logs/anime_bot_{datetime.now().strftime("%Y%m%d")}.log'
-        if os.path.exists(log_file):
-            with open(log_file, 'r') as f:
-                logs = f.readlines()
-                recent_logs = logs[-lines:] if lines < len(logs) else logs
-
-            embed = discord.Embed(title="Recent Bot Logs", color=discord.Color.blue())
-            log_content = ''.join(recent_logs)
-            
-            # Split long logs into multiple fields if needed
-            while log_content:
-                if len(log_content) <= 1024:
-                    embed.add_field(name="Logs", value=f"```{log_content}```", inline=False)
-                    break
-                split_point = log_content[:1024].rindex('\n')
-                embed.add_field(name="Logs", value=f"```{log_content[:split_point]}```", inline=False)
-                log_content = log_content[split_point+1:]
-            
-            embed.set_footer(text=WATERMARK)  # Add watermark
-            embed.timestamp = datetime.now()
-            await interaction.response.send_message(embed=embed)
-        else:
-            await interaction.response.send_message("No logs found for today.")
+        try:
+            log_day = datetime.strptime(day, "%Y-%m-%d") if day else datetime.now()
+            log_filter = LogFilter(
+                user_id=user.id if user else None,
+                action=action,
+                errors_only=errors_only,
+                since=_parse_log_time(since, log_day) if since else None,
+                until=_parse_log_time(until, log_day) if until else None,
+            )
+        except ValueError:
+            await interaction.response.send_message("Invalid date or time! Use YYYY-MM-DD and HH:MM.", ephemeral=True)
+            return
+
+        # Read the tail of the log file in a worker thread
+        log_file = log_file_for(log_day)
+        loop = asyncio.get_running_loop()
+        recent_logs = await loop.run_in_executor(None, query_log, log_file, max(lines, 1), log_filter)
+        if recent_logs is None:
+            await interaction.response.send_message("No logs found for that day.")
+            return
+        if not recent_logs:
+            await interaction.response.send_message("No matching log entries.")
+            return
+
+        embed = discord.Embed(title="Recent Bot Logs", color=discord.Color.blue())
+        # Fields hold 1024 characters including the code fence; the newest lines win
+        for chunk in chunk_lines(recent_logs, chunk_size=1018):
+            embed.add_field(name="Logs", value=f"```{chunk}```", inline=False)
+        
+        embed.set_footer(text=WATERMARK)  # Add watermark
+        embed.timestamp = datetime.now()
+        await interaction.response.send_message(embed=embed)
     except Exception as e:
         await interaction.response.send_message(f"Error retrieving logs: {str(e)}")
         await logger.log_action(bot, interaction.user, "View Logs Failed", error=str(e))
 
+def _ms(seconds):
+    return f"{seconds * 1000:.1f}"
+
+def _stats_embed():
+    embed = discord.Embed(title="📈 Bot Stats", color=discord.Color.purple())
+
+    commands_seen = sorted(metrics.histograms('command_seconds').items(), key=lambda item: -item[1].count)
+    lines = []
+    for labels, hist in commands_seen[:10]:
+        labels = dict(labels)
+        prefix = '/' if labels['kind'] == 'slash' else '!'
+        errors = metrics.counter('commands_total', command=labels['command'], kind=labels['kind'], outcome='error')
+        lines.append(f"{prefix}{labels['command']}: {hist.count} calls"
+                     + (f" ({errors} failed)" if errors else "")
+                     + f", {_ms(hist.quantile(0.5))} / {_ms(hist.quantile(0.95))} / {_ms(hist.quantile(0.99))} ms")
+    embed.add_field(name="Commands (p50 / p95 / p99)", value="\n".join(lines)[:1024] or "No commands yet", inline=False)
+
+    lines = []
+    for op in ('save', 'load'):
+        timing = metrics.histograms(f'storage_{op}_seconds').get(())
+        size = metrics.histograms(f'storage_{op}_bytes').get(())
+        if timing and timing.count:
+            lines.append(f"{op.title()}s: {timing.count}, {_ms(timing.quantile(0.5))} / {_ms(timing.quantile(0.95))} ms, "
+                         f"avg {size.sum / size.count / 1024:.1f} KiB, total {size.sum / 2**20:.1f} MiB")
+    if saver:
+        lines.append(f"Pending write-behind saves: {saver.pending}")
+    embed.add_field(name=f"Storage ({STORAGE_BACKEND})", value="\n".join(lines) or "No storage I/O yet", inline=False)
+
+    cache_stats = user_watchlists.stats()
+    embed.add_field(
+        name="Watchlist cache",
+        value=(f"Hit rate: {cache_stats['hit_rate']:.1%} ({cache_stats['hits']} hits, {cache_stats['misses']} misses)\n"
+               f"Size: {cache_stats['size']}/{cache_stats['maxsize'] or '∞'}, evictions: {cache_stats['evictions']}"),
+        inline=False
+    )
+
+    if cluster:
+        embed.add_field(name="Worker",
+                        value=f"{cluster.worker_index + 1}/{cluster.workers}, shards {SHARD_IDS}, "
+                              f"forwarded {cluster.forwarded} events",
+                        inline=False)
+
+    lag = metrics.histograms('event_loop_lag_seconds').get(())
+    if lag and lag.count:
+        embed.add_field(name="Event loop lag",
+                        value=f"p50 {_ms(lag.quantile(0.5))} ms, p99 {_ms(lag.quantile(0.99))} ms, max {_ms(lag.max)} ms",
+                        inline=False)
+
+    embed.set_footer(text=WATERMARK)
+    embed.timestamp = datetime.now()
+    return embed
+
+@bot.tree.command(name="stats", description="Show command latency, storage and cache statistics (Admin only)")
+@app_commands.default_permissions(administrator=True)
+async def stats(interaction: discord.Interaction):
+    try:
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("You don't have permission to view stats!", ephemeral=True)
+            return
+        if not metrics.enabled:
+            await interaction.response.send_message("Metrics are disabled (METRICS_ENABLED=0).", ephemeral=True)
+            return
+        await interaction.response.send_message(embed=_stats_embed(), ephemeral=True)
+        await logger.log_action(bot, interaction.user, "View Stats")
+    except Exception as e:
+        await interaction.response.send_message(f"Error retrieving stats: {str(e)}")
+        await logger.log_action(bot, interaction.user, "View Stats Failed", error=str(e))
+
 @bot.tree.command(name="help", description="Show all available commands")
 async def help_command(interaction: discord.Interaction):
     """Shows the help menu with all available commands"""
@@ -222,8 +1017,21 @@ async def help_command(interaction: discord.Interaction):
         "/add_anime": "Add new anime with title, status, preference, episodes",
         "/list_anime": "Show your anime list",
         "/update_progress": "Update episodes watched",
-        "/random_anime": "Get a random suggestion",
+        "/update_status": "Change the status of an anime",
+        "/bulk_update": 'Update several anime at once: 0:12 3:5 or "Some Title":28:completed 2::fav',
+        "/favorite": "Mark or unmark a favorite",
+        "/delete_anime": "Remove an anime from your list",
+        "/random_anime": "Get a random suggestion (optionally by genre)",
+        "/recommend": "Recommendations based on what similar watchers liked",
+        "/remind": "Weekly DM reminder for a show (day, HH:MM, UTC offset)",
+        "/reminders": "List your reminders",
+        "/remind_off": "Stop a reminder",
         "/search_anime": "Search in your list",
+        "/search_server": "Search the lists of active members in this server",
+        "/stats_me": "Your watch statistics",
+        "/stats_server": "Watch statistics and top titles of this server",
+        "/import_anime": "Import a CSV file or MyAnimeList XML export",
+        "/export_anime": "Download your list as CSV or MyAnimeList XML",
         "/help": "Show this help message"
     }
 
@@ -249,10 +1057,14 @@ async def help_command(interaction: discord.Interaction):
 @app_commands.default_permissions(administrator=True)
 async def sync_slash(interaction: discord.Interaction):
     try:
-        await bot.tree.sync()
-        await interaction.response.send_message("Commands synced!")
+        await interaction.response.defer()
+        await sync_tree(bot.tree, tree_sync_state, bot.application_id, force=True)
+        await interaction.followup.send("Commands synced!")
     except Exception as e:
-        await interaction.response.send_message(f"Error: {str(e)}")
+        if interaction.response.is_done():
+            await interaction.followup.send(f"Error: {str(e)}")
+        else:
+            await interaction.response.send_message(f"Error: {str(e)}")
 
 # Add prefix commands
 @bot.command(name="add")
@@ -260,133 +1072,62 @@ async def add(ctx, *, args=None):
     if not args:
         await ctx.send("Please provide anime details in the format: !add title | status | preference | episodes | genre | source_link")
         return
-    
-    try:
-        # Split arguments by |
-        parts = [part.strip() for part in args.split('|')]
-        if len(parts) < 4:
-            await ctx.send("Not enough information provided. Format: !add title | status | preference | episodes | genre | source_link")
-            return
-
-        title = parts[0]
-        status = parts[1]
-        preference = parts[2]
-        total_episodes = int(parts[3])
-        genre = parts[4] if len(parts) > 4 else "Unknown"
-        source_link = parts[5] if len(parts) > 5 else None
-
-        # Validate inputs
-        if not title:
-            await ctx.send("Title cannot be empty!")
-            return
-
-        valid_statuses = ['Completed', 'To Watch', 'Watching']
-        status = status.capitalize()
-        if status not in valid_statuses:
-            await ctx.send(f"Invalid status! Must be one of: {', '.join(valid_statuses)}")
-            return
-
-        valid_preferences = ['High', 'Medium', 'Low']
-        preference = preference.capitalize()
-        if preference not in valid_preferences:
-            await ctx.send(f"Invalid preference! Must be one of: {', '.join(valid_preferences)}")
-            return
-
-        if total_episodes <= 0:
-            await ctx.send("Total episodes must be positive!")
-            return
 
-        # Add anime to user's watchlist
-        watch_list = get_user_watchlist(ctx.author.id)
-        anime = Anime(title, status, preference, genre, 0, total_episodes, source_link=source_link)
-        watch_list.add_anime(anime)
-        
-        await ctx.send(f"Added {title} to your list!")
-        await logger.log_action(bot, ctx.author, "Add Anime", f"Title: {title}, Status: {status}, Episodes: {total_episodes}")
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        await logger.log_action(bot, ctx.author, "Add Anime Failed", error=str(e))
+    # Split arguments by |
+    parts = [part.strip() for part in args.split('|')]
+    if len(parts) < 4:
+        await ctx.send("Not enough information provided. Format: !add title | status | preference | episodes | genre | source_link")
+        return
+    genre = parts[4] if len(parts) > 4 else "Unknown"
+    source_link = parts[5] if len(parts) > 5 else None
+    await run_command(PrefixReply(ctx), "Add Anime", _add, *parts[:4], genre, source_link, exclusive=True)
 
 @bot.command(name="list")
 async def list_cmd(ctx):
-    try:
-        watch_list = get_user_watchlist(ctx.author.id)
-        if not watch_list.anime_list:
-            await ctx.send("Your watchlist is empty!")
-            await logger.log_action(bot, ctx.author, "List Anime", "Empty watchlist")
-            return
-
-        embed = discord.Embed(title="Your Anime Watchlist", color=discord.Color.blue())
-        
-        for i, anime in enumerate(watch_list.anime_list):
-            progress = f"[{anime.episodes_watched}/{anime.total_episodes}]" if anime.status == 'Watching' else ""
-            favorite = "⭐ " if anime.favorite else ""
-            embed.add_field(
-                name=f"{i}. {favorite}{anime.title}",
-                value=f"Status: {anime.status}\nPriority: {anime.preference}\nGenre: {anime.genre} {progress}",
-                inline=False
-            )
-        
-        embed.set_footer(text=WATERMARK)  # Add watermark
-        embed.timestamp = datetime.now()
-        await ctx.send(embed=embed)
-        await logger.log_action(bot, ctx.author, "List Anime", f"Listed {len(watch_list.anime_list)} anime")
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
-        await logger.log_action(bot, ctx.author, "List Anime Failed", error=str(e))
+    await run_command(PrefixReply(ctx), "List Anime", _list)
 
 @bot.command(name="progress")
-async def progress(ctx, index: int, episodes: int):
-    try:
-        watch_list = get_user_watchlist(ctx.author.id)
-        if 0 <= index < len(watch_list.anime_list):
-            if episodes >= 0:
-                watch_list.update_progress(index, episodes)
-                await ctx.send("Progress updated successfully!")
-            else:
-                await ctx.send("Episodes cannot be negative!")
-        else:
-            await ctx.send("Invalid index!")
-    except ValueError:
-        await ctx.send("Please provide valid numbers for index and episodes!")
-    except Exception as e:
-        await ctx.send(f"An error occurred: {str(e)}")
+async def progress(ctx, *, spec: str = ''):
+    # "!progress <index> <episodes>" or a batch such as "!progress 0:12 3:5 7:24"; the batch
+    # is parsed from the raw text so its own quoting reaches parse_changes intact
+    args = spec.split()
+    if len(args) == 2 and all(re.fullmatch(r'-?[0-9]+', arg) for arg in args):
+        await run_command(PrefixReply(ctx), "Update Progress", _progress, args[0], int(args[1]), exclusive=True)
+        return
+    if not args:
+        await ctx.send("Usage: !progress <index> <episodes> or !progress 0:12 3:5 7:24")
+        return
+    await run_command(PrefixReply(ctx), "Bulk Update", _bulk_update, spec, exclusive=True)
 
 @bot.command(name="random")
-async def random_cmd(ctx):
-    watch_list = get_user_watchlist(ctx.author.id)
-    anime = watch_list.pick_random_anime()
-    
-    if anime:
-        embed = discord.Embed(title="Random Anime Suggestion", color=discord.Color.green())
-        embed.add_field(name="Why not watch:", value=str(anime), inline=False)
-        embed.set_footer(text=WATERMARK)  # Add watermark
-        embed.timestamp = datetime.now()
-        await ctx.send(embed=embed)
-    else:
-        await ctx.send("No unwatched anime in your list!")
+async def random_cmd(ctx, *, genre: str = None):
+    await run_command(PrefixReply(ctx), "Random Anime", _random, genre)
 
 @bot.command(name="search")
 async def search_cmd(ctx, *, keyword: str):
-    watch_list = get_user_watchlist(ctx.author.id)
-    results = watch_list.search_anime(keyword)
-    
-    if results:
-        embed = discord.Embed(title=f"Search Results for '{keyword}'", color=discord.Color.blue())
-        for i, anime in enumerate(results):
-            embed.add_field(name=f"{i}.", value=str(anime), inline=False)
-        embed.set_footer(text=WATERMARK)  # Add watermark
-        embed.timestamp = datetime.now()
-        await ctx.send(embed=embed)
-    else:
-        await ctx.send("No matches found!")
+    await run_command(PrefixReply(ctx), "Search Anime", _search, keyword)
+
+@bot.command(name="import")
+async def import_cmd(ctx):
+    if not ctx.message.attachments:
+        await ctx.send("Please attach a .csv file or a MyAnimeList .xml export to !import")
+        return
+    await run_command(PrefixReply(ctx), "Import Anime", _import, ctx.message.attachments[0], heavy=True, exclusive=True)
+
+@bot.command(name="export")
+async def export_cmd(ctx, file_format: str = "csv"):
+    file_format = file_format.lower()
+    if file_format not in ('csv', 'xml'):
+        await ctx.send("Format must be csv or xml!")
+        return
+    await run_command(PrefixReply(ctx), "Export Anime", _export, file_format, heavy=True)
 
 @bot.command()
 @commands.has_permissions(administrator=True)
 async def sync_commands(ctx):
     """Sync slash commands (Admin only)"""
     try:
-        await bot.tree.sync()
+        await sync_tree(bot.tree, tree_sync_state, bot.application_id, force=True)
         await ctx.send("Successfully synced commands!")
     except Exception as e:
         await ctx.send(f"Failed to sync commands: {e}")
@@ -405,7 +1146,7 @@ async def forcesync(ctx):
     try:
         print("Force syncing commands...")
         bot.tree.copy_global_to(guild=ctx.guild)
-        await bot.tree.sync(guild=ctx.guild)
+        await sync_tree(bot.tree, tree_sync_state, bot.application_id, guild=ctx.guild, force=True)
         await ctx.send("Force synced commands to this server!")
     except Exception as e:
         await ctx.send(f"Error: {e}")
@@ -423,9 +1164,11 @@ async def help_text(ctx):
     text_commands = {
         "!add": "Add new anime: !add title | status | preference | episodes | genre | source_link",
         "!list": "Show your anime list",
-        "!progress": "Update progress: !progress <index> <episodes>",
-        "!random": "Get a random anime suggestion",
+        "!progress": "Update progress: !progress <index> <episodes>, or several: !progress 0:12 3:5 7:24",
+        "!random": "Get a random anime suggestion: !random [genre]",
         "!search": "Search anime: !search <keyword>",
+        "!import": "Import an attached CSV or MyAnimeList XML file",
+        "!export": "Download your list: !export [csv|xml]",
         "!help": "Show this help message"
     }
 
@@ -449,4 +1192,6 @@ async def help_text(ctx):
 
 # Add your bot token here
 TOKEN = os.getenv('DISCORD_TOKEN')
-bot.run(TOKEN) 
\ No newline at end of file
+
+if __name__ == '__main__':
+    bot.run(TOKEN) 
\ No newline at end of file
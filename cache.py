@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+
+
+class WatchlistCache:
+    """LRU cache of loaded watchlists with optional idle-time expiry.
+
+    Entries are kept in access order, so both the least recently used entry
+    and any entries idle for longer than ttl seconds sit at the front.
+    on_evict(key, value) is called for every entry that leaves the cache.
+    """
+
+    def __init__(self, maxsize=1000, ttl=None, on_evict=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (value, last access time)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.peek(key) is not None
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        now = self.clock()
+        if entry is None or self._expired(entry, now):
+            self.misses += 1
+            if entry is not None:
+                self._evict(key)
+            return default
+        self.hits += 1
+        self._entries[key] = (entry[0], now)
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def peek(self, key):
+        """Return a cached value without touching LRU order or counters."""
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry, self.clock()):
+            return None
+        return entry[0]
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        now = self.clock()
+        self._entries[key] = (value, now)
+        self._entries.move_to_end(key)
+        self._prune(now)
+
+    def values(self):
+        return [value for value, _ in self._entries.values()]
+
+    def items(self):
+        return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def keys_by_recency(self):
+        """Keys from most to least recently used."""
+        return list(reversed(self._entries))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry[1] > self.ttl
+
+    def _prune(self, now):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if self._expired(entry, now) or (self.maxsize and len(self._entries) > self.maxsize):
+                self._evict(key)
+            else:
+                break
+
+    def _evict(self, key):
+        value, _ = self._entries.pop(key)
+        self.evictions += 1
+        if self.on_evict:
+            self.on_evict(key, value)
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import struct
+
+log = logging.getLogger('AnimeBot')
+
+_LENGTH = struct.Struct('>I')
+
+
+def worker_for_user(user_id, workers):
+    """Index of the worker process owning a user's watchlist."""
+    # Snowflake low bits are mostly sequence counters, so hash instead of using a plain modulo
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % workers
+
+
+def shard_ranges(shard_count, workers):
+    """Split shard ids 0..shard_count-1 into `workers` contiguous ranges."""
+    base, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def _payload_user_id(event, data):
+    user = data.get('author') if event == 'MESSAGE_CREATE' else (data.get('member') or {}).get('user') or data.get('user')
+    return int(user['id']) if user and 'id' in user else None
+
+
+async def _read_frame(reader):
+    size = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))[0]
+    return json.loads(await reader.readexactly(size))
+
+
+def _frame(payload):
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    return _LENGTH.pack(len(body)) + body
+
+
+class ClusterLink:
+    """Routes gateway events to the worker process that owns the user.
+
+    Guild events reach whichever worker runs the guild's shard. Interactions
+    and prefix-command messages from users owned by another worker are handed
+    to that worker over a local TCP connection, where they go through the
+    normal discord.py parsers. Replies use the interaction token or channel id,
+    so any worker can send them, and each watchlist is only ever loaded and
+    written by its owner. Commands in local_commands need the receiving
+    worker's guild cache and always run where they arrive.
+    """
+
+    def __init__(self, worker_index, workers, secret, base_port=47000, host='127.0.0.1',
+                 prefix='!', local_commands=()):
+        if not secret:
+            # Peers inject events as any user, so the listener must never accept an empty secret
+            raise ValueError("CLUSTER_SECRET must be set when running more than one worker "
+                             "(launcher.py generates one)")
+        self.worker_index = worker_index
+        self.workers = workers
+        self.secret = secret
+        self.base_port = base_port
+        self.host = host
+        self.prefix = prefix
+        self.local_commands = set(local_commands)
+        self.forwarded = 0
+        self._parsers = {}  # event -> original discord.py parser
+        self._queues = {}  # worker -> queue of frames to send
+        self._senders = {}  # worker -> sender task
+        self._server = None
+        self._incoming = set()  # tasks serving connections from peers
+
+    def owns(self, user_id):
+        return worker_for_user(user_id, self.workers) == self.worker_index
+
+    async def start(self, bot):
+        parsers = bot._connection.parsers
+        for event in ('INTERACTION_CREATE', 'MESSAGE_CREATE'):
+            self._parsers[event] = parsers[event]
+            parsers[event] = self._router(event)
+        self._server = await asyncio.start_server(self._serve, self.host, self.base_port + self.worker_index)
+        log.info(f"Worker {self.worker_index}/{self.workers} listening on port {self.base_port + self.worker_index}")
+
+    async def stop(self):
+        for task in self._senders.values():
+            task.cancel()
+        self._senders.clear()
+        self._queues.clear()
+        if self._server:
+            self._server.close()
+            for task in self._incoming:
+                task.cancel()
+            await asyncio.gather(*self._incoming, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def _is_local(self, event, data):
+        if event == 'MESSAGE_CREATE':
+            content = data.get('content') or ''
+            if not content.startswith(self.prefix):
+                return True  # not a command; nothing user-specific to do
+            name = content[len(self.prefix):].split(maxsplit=1)
+            return not name or name[0] in self.local_commands
+        return (data.get('data') or {}).get('name') in self.local_commands
+
+    def _router(self, event):
+        parse = self._parsers[event]
+
+        def route(data):
+            user_id = _payload_user_id(event, data)
+            if user_id is None or self._is_local(event, data) or self.owns(user_id):
+                return parse(data)
+            self._send(worker_for_user(user_id, self.workers), {'event': event, 'data': data})
+        return route
+
+    def _send(self, worker, payload):
+        # One queue and sender per peer keeps a user's events in order
+        queue = self._queues.get(worker)
+        if queue is None:
+            queue = self._queues[worker] = asyncio.Queue()
+            self._senders[worker] = asyncio.create_task(self._sender(worker, queue))
+        queue.put_nowait(_frame(payload))
+        self.forwarded += 1
+
+    async def _sender(self, worker, queue, retries=5):
+        writer = None
+        while True:
+            frame = await queue.get()
+            for attempt in range(retries):
+                try:
+                    if writer is None or writer.is_closing():
+                        _, writer = await asyncio.open_connection(self.host, self.base_port + worker)
+                        writer.write(_frame({'secret': self.secret}))
+                    writer.write(frame)
+                    await writer.drain()
+                    break
+                except (OSError, ConnectionError):
+                    writer = None
+                    await asyncio.sleep(0.2 * (attempt + 1))
+            else:
+                log.error(f"Dropped an event for worker {worker}: not reachable")
+
+    async def _serve(self, reader, writer):
+        task = asyncio.current_task()
+        self._incoming.add(task)
+        try:
+            hello = await asyncio.wait_for(_read_frame(reader), timeout=5)
+            if not hmac.compare_digest(str(hello.get('secret', '')), self.secret):
+                log.error("Rejected a cluster connection with a wrong secret")
+                return
+            while True:
+                payload = await _read_frame(reader)
+                parse = self._parsers.get(payload.get('event'))
+                if parse:
+                    try:
+                        parse(payload['data'])
+                    except Exception as e:
+                        log.error(f"Forwarded {payload['event']} failed: {e}")
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.CancelledError,
+                ConnectionError, ValueError):
+            pass
+        finally:
+            self._incoming.discard(task)
+            writer.close()
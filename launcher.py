@@ -0,0 +1,122 @@
+"""Run the bot as several sharded worker processes and restart them when they exit.
+
+Each worker runs bot.py as an AutoShardedBot over its own range of shard ids
+and owns the watchlists of the users hashed to it (see cluster.py).
+
+    python launcher.py --workers 4 --shards 16
+"""
+import argparse
+import logging
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+
+from cluster import shard_ranges
+
+log = logging.getLogger('AnimeBot.launcher')
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bot.py')
+
+
+class Worker:
+    def __init__(self, index, env):
+        self.index = index
+        self.env = env
+        self.process = None
+        self.started = 0.0
+        self.restart_at = 0.0
+        self.backoff = 1.0
+
+    def start(self):
+        # Own session, so a terminal Ctrl+C reaches the launcher only and shutdown stays ordered
+        self.process = subprocess.Popen([sys.executable, BOT_SCRIPT], env=self.env, start_new_session=True)
+        self.started = time.monotonic()
+        log.info(f"Worker {self.index} started (pid {self.process.pid}, shards {self.env['SHARD_IDS']})")
+
+
+def worker_env(index, workers, shard_count, shard_ids, secret, port_base):
+    env = dict(os.environ)
+    env.update({
+        'SHARD_COUNT': str(shard_count),
+        'SHARD_IDS': ','.join(map(str, shard_ids)),
+        'WORKER_INDEX': str(index),
+        'WORKER_COUNT': str(workers),
+        'CLUSTER_SECRET': secret,
+        'CLUSTER_PORT_BASE': str(port_base),
+    })
+    metrics_port = int(os.getenv('METRICS_PORT', '0'))
+    if metrics_port > 0:
+        env['METRICS_PORT'] = str(metrics_port + index)
+    return env
+
+
+def supervise(workers, stable_after=60.0, max_backoff=60.0):
+    """Restart exited workers with exponential backoff until SIGINT/SIGTERM."""
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for worker in workers:
+        worker.start()
+
+    while not stopping:
+        now = time.monotonic()
+        for worker in workers:
+            if worker.process is None:
+                if now >= worker.restart_at:
+                    worker.start()
+                continue
+            code = worker.process.poll()
+            if code is None:
+                continue
+            # A worker that ran for a while gets a fresh backoff
+            if now - worker.started > stable_after:
+                worker.backoff = 1.0
+            log.error(f"Worker {worker.index} exited with code {code}, restarting in {worker.backoff:.0f}s")
+            worker.process = None
+            worker.restart_at = now + worker.backoff
+            worker.backoff = min(worker.backoff * 2, max_backoff)
+        time.sleep(0.5)
+
+    log.info("Stopping workers")
+    running = [worker.process for worker in workers if worker.process and worker.process.poll() is None]
+    for process in running:
+        # bot.py flushes pending saves and logs on SIGINT
+        process.send_signal(signal.SIGINT)
+    deadline = time.monotonic() + 30
+    for process in running:
+        try:
+            process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            log.error(f"Worker pid {process.pid} did not stop in time, killing it")
+            process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--shards', type=int, default=None, help='total shards (default: one per worker)')
+    parser.add_argument('--port-base', type=int, default=47000,
+                        help='workers listen for forwarded events on port-base + index')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    shard_count = args.shards or args.workers
+    if shard_count < args.workers:
+        parser.error("--shards must be at least --workers")
+    shards = shard_ranges(shard_count, args.workers)
+    secret = secrets.token_hex(16)
+    workers = [Worker(i, worker_env(i, args.workers, shard_count, shards[i], secret, args.port_base))
+               for i in range(args.workers)]
+    supervise(workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,194 @@
+import asyncio
+import atexit
+import glob
 import logging
-from datetime import datetime
+import logging.handlers
+import queue
+import re
+from collections import deque
+from datetime import datetime, timedelta
 import discord
 import os
 
+LOG_DIR = 'logs'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+def log_file_for(day, directory=LOG_DIR):
+    return os.path.join(directory, f'anime_bot_{day.strftime("%Y%m%d")}.log')
+
+class DailyFileHandler(logging.FileHandler):
+    """File handler writing to logs/anime_bot_YYYYMMDD.log for the day of each record.
+
+    Switches to a new file at local midnight and, like TimedRotatingFileHandler's
+    backupCount, keeps the current file plus the newest backup_count older ones.
+    """
+
+    _NAME = re.compile(r'anime_bot_\d{8}\.log$')
+
+    def __init__(self, directory=LOG_DIR, backup_count=14):
+        self.directory = directory
+        self.backup_count = backup_count
+        os.makedirs(directory, exist_ok=True)
+        now = datetime.now()
+        super().__init__(log_file_for(now, directory), delay=True)
+        self._set_rollover(now)
+        self._purge()
+
+    def _set_rollover(self, now):
+        midnight = datetime(now.year, now.month, now.day) + timedelta(days=1)
+        self._rollover_at = midnight.timestamp()
+
+    def emit(self, record):
+        if record.created >= self._rollover_at:
+            day = datetime.fromtimestamp(record.created)
+            self.close()
+            self.baseFilename = os.path.abspath(log_file_for(day, self.directory))
+            self._set_rollover(day)
+            self._purge()
+        super().emit(record)
+
+    def _purge(self):
+        if not self.backup_count:
+            return
+        files = sorted(path for path in glob.glob(os.path.join(self.directory, 'anime_bot_*.log'))
+                       if self._NAME.search(path) and os.path.abspath(path) != self.baseFilename)
+        for path in files[:-self.backup_count]:
+            # logquery keeps a <log>.idx sidecar next to each day's log
+            for expired in (path, path + '.idx'):
+                try:
+                    os.remove(expired)
+                except OSError:
+                    pass
+
+class DiscordLogSink:
+    """Ships log events to a Discord channel from a background task.
+
+    Events are queued and sent as one embed per batch, so commands never wait
+    on the Discord API and a burst of actions costs a handful of messages.
+    When the queue is full the oldest events are dropped and the next embed
+    reports how many were lost.
+    """
+
+    # Discord embed limits
+    MAX_FIELDS = 25
+    MAX_EMBED_CHARS = 6000
+    MAX_FIELD_NAME = 256
+    MAX_FIELD_VALUE = 1024
+
+    def __init__(self, channel_id, batch_size=10, interval=5.0, max_queue=500):
+        self.channel_id = channel_id
+        self.batch_size = min(batch_size, self.MAX_FIELDS)
+        self.interval = interval
+        self._queue = deque(maxlen=max_queue)
+        self.dropped = 0
+        self._bot = None
+        self._batch_ready = None
+        self._task = None
+
+    def enqueue(self, event):
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(event)
+        if self._batch_ready is not None and len(self._queue) >= self.batch_size:
+            self._batch_ready.set()
+
+    def start(self, bot):
+        if self._task is None:
+            self._bot = bot
+            self._batch_ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            await self.flush()
+
+    async def flush(self):
+        while self._queue or self.dropped:
+            embed = self._next_embed()
+            try:
+                # One send at a time, so discord.py's rate-limit handling paces the sink
+                await self._bot.get_partial_messageable(self.channel_id).send(embed=embed)
+            except Exception as e:
+                logging.getLogger('AnimeBot').error(f"Failed to send log to Discord channel: {str(e)}")
+                return
+
+    def _next_embed(self):
+        embed = discord.Embed(title="Bot Log", timestamp=datetime.now(), color=discord.Color.blue())
+        used = len(embed.title)
+        if self.dropped:
+            embed.description = f"⚠️ {self.dropped} log events dropped (queue full)"
+            used += len(embed.description)
+            self.dropped = 0
+        count = 0
+        while self._queue and count < self.batch_size:
+            name, value = self._format(self._queue[0])
+            if count and used + len(name) + len(value) > self.MAX_EMBED_CHARS:
+                break
+            self._queue.popleft()
+            embed.add_field(name=name, value=value, inline=False)
+            used += len(name) + len(value)
+            count += 1
+            if name.startswith("❌"):
+                embed.color = discord.Color.red()
+        return embed
+
+    def _format(self, event):
+        marker = "❌ " if event['error'] else ""
+        name = f"{marker}{event['action']} - {event['user']}"[:self.MAX_FIELD_NAME]
+        lines = [event['timestamp']]
+        if event['details']:
+            lines.append(f"Details: {event['details']}")
+        if event['error']:
+            lines.append(f"Error: {event['error']}")
+        return name, '\n'.join(lines)[:self.MAX_FIELD_VALUE]
+
 class AnimeLogger:
-    def __init__(self, log_channel_id=None):
+    def __init__(self, log_channel_id=None, retention_days=14):
         self.log_channel_id = log_channel_id
+        self.retention_days = retention_days
+        self.sink = DiscordLogSink(log_channel_id) if log_channel_id else None
         self.setup_file_logging()
+
+    def start(self, bot):
+        if self.sink:
+            self.sink.start(bot)
+
+    async def stop(self):
+        if self.sink:
+            await self.sink.stop()
         
     def setup_file_logging(self):
-        # Create logs directory if it doesn't exist
-        if not os.path.exists('logs'):
-            os.makedirs('logs')
-            
-        # Setup file logging
-        log_file = f'logs/anime_bot_{datetime.now().strftime("%Y%m%d")}.log'
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file),
-                logging.StreamHandler()
-            ]
-        )
+        # Records are only queued on the caller's thread; a listener thread
+        # formats them and does the file and console I/O
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = DailyFileHandler(LOG_DIR, backup_count=self.retention_days)
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+
+        log_queue = queue.SimpleQueue()
+        self.listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler)
+        self.listener.start()
+        atexit.register(self.listener.stop)
+
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
         self.logger = logging.getLogger('AnimeBot')
 
     async def log_action(self, bot, user, action, details=None, error=None):
@@ -38,23 +204,12 @@ class AnimeLogger:
                 log_message += f" - Details: {details}"
             self.logger.info(log_message)
 
-        # If log channel is set up, send log message to Discord
-        if self.log_channel_id:
-            try:
-                channel = bot.get_channel(self.log_channel_id)
-                if channel:
-                    embed = discord.Embed(
-                        title="Bot Log",
-                        timestamp=datetime.now(),
-                        color=discord.Color.red() if error else discord.Color.blue()
-                    )
-                    embed.add_field(name="User", value=user_str, inline=False)
-                    embed.add_field(name="Action", value=action, inline=False)
-                    if details:
-                        embed.add_field(name="Details", value=details, inline=False)
-                    if error:
-                        embed.add_field(name="Error", value=str(error), inline=False)
-                    
-                    await channel.send(embed=embed)
-            except Exception as e:
-                self.logger.error(f"Failed to send log to Discord channel: {str(e)}") 
\ No newline at end of file
+        # If log channel is set up, queue the event for the Discord log sink
+        if self.sink:
+            self.sink.enqueue({
+                'timestamp': timestamp,
+                'user': user_str,
+                'action': action,
+                'details': details,
+                'error': str(error) if error else None,
+            })
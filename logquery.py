@@ -0,0 +1,183 @@
+import json
+import os
+import re
+from bisect import bisect_left, bisect_right
+from collections import deque
+from datetime import datetime
+
+# "2024-05-01 12:34:56,789 - INFO - User: name#0 (ID: 1) - Action: Add Anime - ..."
+RECORD_START = re.compile(rb'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d+ - (\w+) - ')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class LogFilter:
+    """Criteria for log records; every criterion left as None matches everything."""
+
+    def __init__(self, user_id=None, action=None, errors_only=False, since=None, until=None):
+        self.user_id = user_id
+        self.action = action.lower() if action else None
+        self.errors_only = errors_only
+        self.since = since
+        self.until = until
+
+    def matches(self, record):
+        head = record[0]
+        if self.errors_only and ' - ERROR - ' not in head:
+            return False
+        if self.user_id is not None and f"(ID: {self.user_id})" not in head:
+            return False
+        if self.action and f"action: {self.action}" not in head.lower():
+            return False
+        if self.since or self.until:
+            try:
+                stamp = datetime.strptime(head[:19], TIME_FORMAT)
+            except ValueError:
+                return False
+            if (self.since and stamp < self.since) or (self.until and stamp > self.until):
+                return False
+        return True
+
+
+def _reverse_lines(f, start, end, block_size):
+    """Yield raw lines between byte offsets start and end, last line first."""
+    pos = end
+    tail = b''
+    while pos > start:
+        size = min(block_size, pos - start)
+        pos -= size
+        f.seek(pos)
+        block = f.read(size) + tail
+        lines = block.split(b'\n')
+        # The first piece may be the end of a line that starts in an earlier block
+        tail = lines.pop(0)
+        for line in reversed(lines):
+            if line:
+                yield line
+    if tail:
+        yield tail
+
+
+def _reverse_records(f, start, end, block_size):
+    continuation = []
+    for line in _reverse_lines(f, start, end, block_size):
+        if RECORD_START.match(line):
+            record = [line] + continuation[::-1]
+            continuation = []
+            yield [part.decode('utf-8', 'replace').rstrip('\r') for part in record]
+        else:
+            continuation.append(line)
+    # Lines left in `continuation` belong to a record that starts before `start`
+
+
+class MinuteIndex:
+    """Sidecar file (<log>.idx) mapping each minute to the offset of its first record.
+
+    The index remembers how far into the log it has read, so refreshing it
+    only scans bytes appended since the last query.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.path = log_path + '.idx'
+        self.indexed_size = 0
+        self.minutes = []  # sorted [minute 'YYYY-MM-DD HH:MM', offset] pairs
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self.indexed_size = data['size']
+            self.minutes = data['minutes']
+        except (OSError, ValueError, KeyError):
+            self.indexed_size, self.minutes = 0, []
+        return self
+
+    def refresh(self):
+        size = os.path.getsize(self.log_path)
+        if size < self.indexed_size:
+            # The log was replaced; start over
+            self.indexed_size, self.minutes = 0, []
+        if size == self.indexed_size:
+            return self
+        last_minute = self.minutes[-1][0] if self.minutes else None
+        with open(self.log_path, 'rb') as f:
+            f.seek(self.indexed_size)
+            offset = self.indexed_size
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # partially written line; index it next time
+                match = RECORD_START.match(line)
+                if match:
+                    minute = match.group(1)[:16].decode()
+                    if minute != last_minute:
+                        self.minutes.append([minute, offset])
+                        last_minute = minute
+                offset += len(line)
+        self.indexed_size = offset
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'size': self.indexed_size, 'minutes': self.minutes}, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+        return self
+
+    def offset_before(self, moment):
+        """Offset of the first record in or after the minute containing moment."""
+        i = bisect_left(self.minutes, moment.strftime('%Y-%m-%d %H:%M'), key=lambda entry: entry[0])
+        return self.minutes[i][1] if i < len(self.minutes) else self.indexed_size
+
+    def offset_after(self, moment):
+        """Offset of the first record in a later minute than moment (None if none)."""
+        i = bisect_right(self.minutes, moment.strftime('%Y-%m-%d %H:%M'), key=lambda entry: entry[0])
+        return self.minutes[i][1] if i < len(self.minutes) else None
+
+
+def query_log(path, limit=10, log_filter=None, block_size=65536):
+    """Return the last `limit` matching records of a log file as lines, oldest first.
+
+    Without a time range the file is read backwards in blocks and reading
+    stops once enough records matched. With one, the minute index narrows
+    the scan to the requested byte range.
+    """
+    log_filter = log_filter or LogFilter()
+    if not os.path.exists(path):
+        return None
+    end = os.path.getsize(path)
+    start = 0
+    if log_filter.since or log_filter.until:
+        index = MinuteIndex(path).load().refresh()
+        if log_filter.since:
+            start = index.offset_before(log_filter.since)
+        if log_filter.until:
+            after = index.offset_after(log_filter.until)
+            end = after if after is not None else end
+
+    found = deque()
+    with open(path, 'rb') as f:
+        for record in _reverse_records(f, start, end, block_size):
+            if log_filter.matches(record):
+                found.appendleft(record)
+                if len(found) >= limit:
+                    break
+    return [line for record in found for line in record]
+
+
+def chunk_lines(lines, chunk_size=1018, max_total=5000):
+    """Pack lines into text chunks of at most chunk_size characters.
+
+    Keeps the newest lines when everything doesn't fit in max_total characters.
+    """
+    chunks = []
+    current, size, total = [], 0, 0
+    for line in reversed(lines):
+        line = line[:chunk_size]
+        if total + len(line) + 1 > max_total:
+            break
+        if current and size + len(line) + 1 > chunk_size:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+        total += len(line) + 1
+    if current:
+        chunks.append(current)
+    return ['\n'.join(reversed(chunk)) for chunk in reversed(chunks)]
@@ -1,14 +1,96 @@
+import argparse
 import json
 import os
-import random
-from datetime import datetime
+import re
+import shlex
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import date
+from enum import IntEnum
+from picker import RandomPicker
+from persistence import atomic_write_json
+from search import TitleIndex
+from storage import FIELDS, JsonStorage
+
+class Status(IntEnum):
+    TO_WATCH = 0
+    WATCHING = 1
+    COMPLETED = 2
+
+    @property
+    def label(self):
+        return _STATUS_LABELS[self]
+
+    @classmethod
+    def labels(cls):
+        return [member.label for member in cls]
+
+    @classmethod
+    def parse(cls, value):
+        """Accept a Status, or its label in any case ('to watch', 'Completed', ...)."""
+        if isinstance(value, cls):
+            return value
+        try:
+            return _STATUS_BY_LABEL[str(value).strip().lower()]
+        except KeyError:
+            raise ValueError(f"Invalid status: {value}") from None
+
+class Preference(IntEnum):
+    LOW = 0
+    MEDIUM = 1
+    HIGH = 2
+
+    @property
+    def label(self):
+        return _PREFERENCE_LABELS[self]
+
+    @classmethod
+    def labels(cls):
+        # Listed from highest to lowest, as shown to users
+        return [member.label for member in reversed(cls)]
+
+    @classmethod
+    def parse(cls, value):
+        if isinstance(value, cls):
+            return value
+        try:
+            return _PREFERENCE_BY_LABEL[str(value).strip().lower()]
+        except KeyError:
+            raise ValueError(f"Invalid preference: {value}") from None
+
+# Discord autocomplete values are at most this long, so longer titles arrive cut short
+MAX_CHOICE_LENGTH = 100
+
+_STATUS_LABELS = {Status.TO_WATCH: 'To Watch', Status.WATCHING: 'Watching', Status.COMPLETED: 'Completed'}
+_STATUS_BY_LABEL = {label.lower(): status for status, label in _STATUS_LABELS.items()}
+_PREFERENCE_LABELS = {Preference.LOW: 'Low', Preference.MEDIUM: 'Medium', Preference.HIGH: 'High'}
+_PREFERENCE_BY_LABEL = {label.lower(): pref for pref, label in _PREFERENCE_LABELS.items()}
+
+def _to_ordinal(value):
+    # Dates are kept as proleptic ordinals (0 = unset) instead of per-entry strings
+    if value is None:
+        return 0
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(value).toordinal()
+
+def _from_ordinal(ordinal):
+    return date.fromordinal(ordinal).isoformat() if ordinal else None
 
 class Anime:
+    # Slots plus shared enum members keep each cached entry small; the public
+    # attributes still read and write the same strings as the JSON fields
+    __slots__ = ('title', '_status', '_preference', 'genre', 'episodes_watched', 'total_episodes',
+                 '_start_date', '_completed_date', 'source_link', 'favorite')
+
     def __init__(self, title, status, preference, genre='Unknown', episodes_watched=0, total_episodes=1, start_date=None, completed_date=None, source_link=None, favorite=False):
         self.title = title
         self.status = status  # 'Completed', 'To Watch', 'Watching'
         self.preference = preference  # 'High', 'Medium', 'Low'
-        self.genre = genre
+        self.genre = sys.intern(genre) if isinstance(genre, str) else genre
         self.episodes_watched = episodes_watched
         self.total_episodes = total_episodes
         self.start_date = start_date
@@ -16,89 +98,578 @@ class Anime:
         self.source_link = source_link
         self.favorite = favorite
 
+    @property
+    def status(self):
+        return self._status.label
+
+    @status.setter
+    def status(self, value):
+        self._status = Status.parse(value)
+
+    @property
+    def status_enum(self):
+        return self._status
+
+    @property
+    def preference(self):
+        return self._preference.label
+
+    @preference.setter
+    def preference(self, value):
+        self._preference = Preference.parse(value)
+
+    @property
+    def preference_enum(self):
+        return self._preference
+
+    @property
+    def start_date(self):
+        return _from_ordinal(self._start_date)
+
+    @start_date.setter
+    def start_date(self, value):
+        self._start_date = _to_ordinal(value)
+
+    @property
+    def completed_date(self):
+        return _from_ordinal(self._completed_date)
+
+    @completed_date.setter
+    def completed_date(self, value):
+        self._completed_date = _to_ordinal(value)
+
+    def to_dict(self):
+        return {'title': self.title, 'status': self.status, 'preference': self.preference,
+                'genre': self.genre, 'episodes_watched': self.episodes_watched,
+                'total_episodes': self.total_episodes, 'start_date': self.start_date,
+                'completed_date': self.completed_date, 'source_link': self.source_link,
+                'favorite': self.favorite}
+
+    @property
+    def start_ordinal(self):
+        """Start date as a date ordinal, 0 when unset."""
+        return self._start_date
+
+    @property
+    def completed_ordinal(self):
+        return self._completed_date
+
     def update_progress(self, episodes):
+        if not self.total_episodes:
+            # Length unknown (e.g. still airing): track progress, leave completing to the user
+            self.episodes_watched = episodes
+            return
         self.episodes_watched = min(episodes, self.total_episodes)
         if self.episodes_watched == self.total_episodes:
-            self.status = 'Completed'
-            self.completed_date = datetime.today().strftime('%Y-%m-%d')
+            self._status = Status.COMPLETED
+            self._completed_date = date.today().toordinal()
 
     def __repr__(self):
-        progress = f"[{self.episodes_watched}/{self.total_episodes}]" if self.status == 'Watching' else ""
+        progress = f"[{self.episodes_watched}/{self.total_episodes or '?'}]" if self._status == Status.WATCHING else ""
         return f"{self.title} ({self.status} - {self.preference} Priority - {self.genre}) {progress}"
 
+def validate_anime_fields(title, status, preference, total_episodes, unknown_total=False):
+    """Normalize the user-supplied fields of a new entry.
+
+    Returns (title, status, preference, total_episodes) with canonical labels,
+    or raises ValueError with a message suitable for showing to the user.
+    With unknown_total, 0 total episodes is accepted as "length unknown".
+    """
+    title = (title or '').strip()
+    if not title:
+        raise ValueError("Title cannot be empty!")
+    try:
+        status = Status.parse(status).label
+    except ValueError:
+        raise ValueError(f"Invalid status! Must be one of: {', '.join(Status.labels())}") from None
+    try:
+        preference = Preference.parse(preference).label
+    except ValueError:
+        raise ValueError(f"Invalid preference! Must be one of: {', '.join(Preference.labels())}") from None
+    try:
+        total_episodes = int(total_episodes)
+    except (TypeError, ValueError):
+        raise ValueError("Total episodes must be a number!") from None
+    if total_episodes < 0 or (total_episodes == 0 and not unknown_total):
+        raise ValueError("Total episodes must be positive!")
+    return title, status, preference, total_episodes
+
+# One entry of a batch update; None leaves that field unchanged.
+# target is a list index or a title; favorite sets (not toggles) the flag.
+Change = namedtuple('Change', 'target episodes status favorite', defaults=(None, None, None))
+
+_FAVORITE_WORDS = {'fav': True, 'favorite': True, 'unfav': False, 'unfavorite': False}
+
+def _split_items(text):
+    # Whitespace separates items; double quotes group one with spaces in it. Only '"'
+    # quotes, so titles with apostrophes, ';' or ',' need nothing special
+    lexer = shlex.shlex(text, posix=True)
+    lexer.whitespace_split = True
+    lexer.quotes = '"'
+    lexer.escape = ''
+    lexer.commenters = ''
+    try:
+        return list(lexer)
+    except ValueError:
+        raise ValueError("Unbalanced '\"' in the changes") from None
+
+def parse_changes(text):
+    """Parse a batch update spec such as '0:12 3:5 7:24' or '"Steins;Gate":28:completed 2::fav'.
+
+    Items are separated by whitespace; an item with spaces in its title or
+    status is wrapped in double quotes, whole or in part ("To Watch" or
+    "Spy x Family":"to watch"). Each item is target:episodes with optional
+    :status and :fav/:unfav parts; an empty episodes part leaves progress
+    unchanged. Titles may contain ':', ';' and ','.
+    """
+    changes = []
+    for item in _split_items(text):
+        parts = item.split(':')
+        status = favorite = episodes = None
+        while len(parts) > 1:
+            last = parts[-1].strip().lower()
+            if last in _FAVORITE_WORDS and favorite is None:
+                favorite = _FAVORITE_WORDS[last]
+            elif status is None and _is_status(last):
+                status = Status.parse(last).label
+            else:
+                break
+            parts.pop()
+        if len(parts) > 1 and re.fullmatch(r'(-?[0-9]+)?', parts[-1].strip()):
+            # Negative counts are parsed so apply_changes can say what's wrong with them
+            last = parts.pop().strip()
+            episodes = int(last) if last else None
+        target = ':'.join(parts).strip()
+        if not target:
+            raise ValueError(f"Missing anime in '{item}'")
+        if episodes is None and status is None and favorite is None:
+            raise ValueError(f"Nothing to change in '{item}'")
+        changes.append(Change(target, episodes, status, favorite))
+    if not changes:
+        raise ValueError("No changes given")
+    return changes
+
+def _is_status(value):
+    try:
+        Status.parse(value)
+        return True
+    except ValueError:
+        return False
+
+class ObserverGroup:
+    """Forwards AnimeWatchList notifications to several observers."""
+
+    def __init__(self, *observers):
+        self.observers = observers
+
+    def added(self, anime):
+        for observer in self.observers:
+            observer.added(anime)
+
+    def removed(self, anime):
+        for observer in self.observers:
+            observer.removed(anime)
+
+    def reloaded(self, anime_list):
+        for observer in self.observers:
+            observer.reloaded(anime_list)
+
 class AnimeWatchList:
-    def __init__(self, data_file='anime_list.json'):
-        self.data_file = data_file
+    def __init__(self, data_file='anime_list.json', writer=None, storage=None, random_history=3, observer=None,
+                 records=None):
+        self.data_file = data_file  # storage key; a file path for the JSON backend
+        self.storage = storage or JsonStorage()
+        self.writer = writer  # optional WriteBehindSaver; saves are deferred when set
+        # Optional listener with removed(anime)/added(anime) around every entry change
+        # and reloaded(anime_list) after a load, e.g. analytics.UserObserver
+        self.observer = observer
         self.anime_list = []
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(self.data_file) or '.', exist_ok=True)
-        self.load_data()
+        self.version = 0  # bumped by every mutation; render caches compare against it
+        self._batch_depth = 0
+        self._batch_dirty = False
+        self.title_index = TitleIndex()
+        # Suggestion candidates; the last random_history picks are not repeated
+        self.picker = RandomPicker(history=random_history)
+        # records, if given, are used instead of loading from storage (e.g. from a warm-start snapshot)
+        self.load_data(records)
 
     def add_anime(self, anime):
-        if anime.status == 'Watching' and anime.start_date is None:
-            anime.start_date = datetime.today().strftime('%Y-%m-%d')
+        if anime.status_enum == Status.WATCHING and anime.start_date is None:
+            anime.start_date = date.today()
         self.anime_list.append(anime)
-        self.save_data()
+        self.title_index.add(anime)
+        self.picker.track(anime)
+        if self.observer:
+            self.observer.added(anime)
+        self._changed()
+
+    def add_many(self, animes):
+        with self.batch():
+            for anime in animes:
+                self.add_anime(anime)
+
+    @contextmanager
+    def batch(self):
+        """Group mutations so they are persisted with a single save at the end."""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch_dirty:
+                self._batch_dirty = False
+                self.save_data()
 
     def delete_anime(self, index):
         if 0 <= index < len(self.anime_list) and not self.anime_list[index].favorite:
-            del self.anime_list[index]
-            self.save_data()
+            anime = self.anime_list.pop(index)
+            self.title_index.remove(anime)
+            self.picker.untrack(anime)
+            if self.observer:
+                self.observer.removed(anime)
+            self._changed()
 
     def update_status(self, index, new_status):
         if 0 <= index < len(self.anime_list):
             anime = self.anime_list[index]
+            if self.observer:
+                self.observer.removed(anime)
             anime.status = new_status
-            if new_status == 'Watching' and anime.start_date is None:
-                anime.start_date = datetime.today().strftime('%Y-%m-%d')
-            elif new_status == 'Completed':
-                anime.completed_date = datetime.today().strftime('%Y-%m-%d')
-            self.save_data()
+            if anime.status_enum == Status.WATCHING and anime.start_date is None:
+                anime.start_date = date.today()
+            elif anime.status_enum == Status.COMPLETED:
+                anime.completed_date = date.today()
+            self.picker.track(anime)
+            if self.observer:
+                self.observer.added(anime)
+            self._changed()
 
     def update_progress(self, index, episodes):
         if 0 <= index < len(self.anime_list):
-            self.anime_list[index].update_progress(episodes)
-            self.save_data()
+            anime = self.anime_list[index]
+            if self.observer:
+                self.observer.removed(anime)
+            anime.update_progress(episodes)
+            self.picker.track(anime)
+            if self.observer:
+                self.observer.added(anime)
+            self._changed()
 
     def mark_favorite(self, index):
         if 0 <= index < len(self.anime_list):
-            self.anime_list[index].favorite = not self.anime_list[index].favorite
-            self.save_data()
+            anime = self.anime_list[index]
+            if self.observer:
+                self.observer.removed(anime)
+            anime.favorite = not anime.favorite
+            if self.observer:
+                self.observer.added(anime)
+            self._changed()
+
+    def apply_changes(self, changes):
+        """Apply a batch of Change entries all-or-nothing, with a single save.
 
-    def search_anime(self, keyword):
-        return [anime for anime in self.anime_list if keyword.lower() in anime.title.lower()]
+        Every change is validated before any is applied; if one is invalid a
+        ValueError listing the problems is raised and the list is untouched.
+        Returns the affected entries in order.
+        """
+        resolved, problems = [], []
+        for change in changes:
+            target = str(change.target)
+            index = self.find_index(target)
+            if index is None:
+                problems.append(f"'{target}' is not in your list")
+                continue
+            if change.episodes is not None and change.episodes < 0:
+                problems.append(f"{target}: episodes cannot be negative")
+            status = None
+            if change.status is not None:
+                try:
+                    status = Status.parse(change.status).label
+                except ValueError:
+                    problems.append(f"{target}: invalid status '{change.status}'")
+            resolved.append((index, change.episodes, status, change.favorite))
+        if problems:
+            raise ValueError('; '.join(problems))
+
+        with self.batch():
+            for index, episodes, status, favorite in resolved:
+                if status is not None:
+                    self.update_status(index, status)
+                if episodes is not None:
+                    self.update_progress(index, episodes)
+                if favorite is not None and self.anime_list[index].favorite != favorite:
+                    self.mark_favorite(index)
+        return [self.anime_list[index] for index, *_ in resolved]
+
+    def search_anime(self, keyword, limit=None):
+        # Substring matches first, then typo-tolerant matches ranked by similarity
+        return self.title_index.search(keyword, limit)
+
+    def find_index(self, value):
+        """Resolve a title (case-insensitive) or a numeric list index to an index.
+
+        A value of MAX_CHOICE_LENGTH characters may be a longer title cut short
+        by Discord autocomplete; it resolves to the one title starting with it.
+        """
+        anime = self.title_index.find(value, prefix=len(value) >= MAX_CHOICE_LENGTH)
+        if anime is not None:
+            return self.anime_list.index(anime)
+        value = value.strip()
+        # isdecimal, not isdigit: int() rejects digits like '²'
+        if value.isdecimal() and int(value) < len(self.anime_list):
+            return int(value)
+        return None
 
     def show_favorites(self):
         return [anime for anime in self.anime_list if anime.favorite]
 
-    def pick_random_anime(self):
-        non_completed = [anime for anime in self.anime_list if anime.status != 'Completed']
-        return random.choice(non_completed) if non_completed else None
+    def pick_random_anime(self, genre=None, weighted=True):
+        # Preference-weighted over non-completed entries, skipping recent picks when possible
+        return self.picker.pick(genre=genre, weighted=weighted)
 
     def get_anime_details(self, index):
         if 0 <= index < len(self.anime_list):
             anime = self.anime_list[index]
-            return vars(anime)
+            return anime.to_dict()
         return None
 
     def list_anime(self):
         for i, anime in enumerate(self.anime_list):
             print(f"{i}. {anime}")
 
+    def to_records(self):
+        return [anime.to_dict() for anime in self.anime_list]
+
+    def _changed(self):
+        self.version += 1
+        if self._batch_depth:
+            self._batch_dirty = True
+        else:
+            self.save_data()
+
     def save_data(self):
-        data = [{'title': a.title, 'status': a.status, 'preference': a.preference, 
-                 'genre': a.genre, 'episodes_watched': a.episodes_watched, 
-                 'total_episodes': a.total_episodes, 'start_date': a.start_date, 
-                 'completed_date': a.completed_date, 'source_link': a.source_link, 
-                 'favorite': a.favorite} for a in self.anime_list]
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(self.data_file) or '.', exist_ok=True)
-        with open(self.data_file, 'w') as f:
-            json.dump(data, f, indent=4)
-
-    def load_data(self):
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                data = json.load(f)
-                self.anime_list = [Anime(**item) for item in data]
-    
\ No newline at end of file
+        if self.writer is not None:
+            self.writer.mark_dirty(self)
+            return
+        self.write_now()
+
+    def write_now(self):
+        self.storage.save(self.data_file, self.to_records())
+
+    def load_data(self, records=None):
+        if records is None:
+            records = self.storage.load(self.data_file)
+        self.anime_list = [Anime(**item) for item in records]
+        self.title_index.rebuild(self.anime_list)
+        self.picker.rebuild(self.anime_list)
+        if self.observer:
+            self.observer.reloaded(self.anime_list)
+        self.version += 1
+    
+# Offline maintenance of a JSON data directory: python main.py <command> --data-dir data [--dry-run]
+# Every user file is handled independently in a process pool; run it while the bot is stopped.
+
+STATS_COUNTS = ('entries', 'bytes', 'favorites', 'To Watch', 'Watching', 'Completed', 'invalid entries')
+
+def _title_key(title):
+    return ' '.join(title.split()).casefold()
+
+def _record_problem(record):
+    """Why a stored record can't be loaded as-is, or None."""
+    if not isinstance(record, dict):
+        return "not an object"
+    unknown = set(record) - set(FIELDS)
+    if unknown:
+        return f"unknown fields {', '.join(sorted(unknown))}"
+    if not isinstance(record.get('title'), str) or not record['title'].strip():
+        return "missing title"
+    try:
+        anime = Anime(**record)
+    except (TypeError, ValueError) as e:
+        return str(e)
+    if not isinstance(anime.episodes_watched, int) or anime.episodes_watched < 0:
+        return f"invalid episodes_watched {anime.episodes_watched!r}"
+    if not isinstance(anime.total_episodes, int) or anime.total_episodes < 0:
+        return f"invalid total_episodes {anime.total_episodes!r}"
+    return None
+
+def _migrate_record(record):
+    """Bring a record from any earlier format to the current one; None if it can't be saved."""
+    if not isinstance(record, dict) or not str(record.get('title') or '').strip():
+        return None
+    fields = {key: record[key] for key in FIELDS if key in record}
+    fields['title'] = str(fields['title']).strip()
+    try:
+        for key in ('episodes_watched', 'total_episodes'):
+            if key in fields:
+                fields[key] = max(0, int(fields[key]))
+        fields.setdefault('total_episodes', 1)
+        fields['favorite'] = bool(fields.get('favorite', False))
+        return Anime(**fields).to_dict()
+    except (TypeError, ValueError):
+        return None
+
+def _merge_duplicates(records):
+    """Keep the first entry per title, folding in the further progress of its duplicates."""
+    first, merged = {}, []
+    for record in records:
+        key = _title_key(record['title'])
+        if key not in first:
+            first[key] = dict(record)
+            merged.append(first[key])
+            continue
+        kept = first[key]
+        if Status.parse(record['status']) > Status.parse(kept['status']):
+            kept['status'] = record['status']
+        for field in ('episodes_watched', 'total_episodes'):
+            kept[field] = max(kept[field], record[field])
+        kept['favorite'] = kept['favorite'] or record['favorite']
+        starts = [day for day in (kept['start_date'], record['start_date']) if day]
+        kept['start_date'] = min(starts) if starts else None
+        completions = [day for day in (kept['completed_date'], record['completed_date']) if day]
+        kept['completed_date'] = max(completions) if completions else None
+        kept['source_link'] = kept['source_link'] or record['source_link']
+    return merged
+
+def _read_user_file(path, recover):
+    """(records, note) for a user file; falls back to the .bak copy when recover is set."""
+    try:
+        with open(path, 'rb') as f:
+            return json.loads(f.read()), None
+    except ValueError as e:
+        backup = path + '.bak'
+        if not recover or not os.path.exists(backup):
+            raise
+        with open(backup, 'rb') as f:
+            return json.loads(f.read()), f"unreadable ({e}), restored from .bak"
+
+def maintain_file(path, command, dry_run=False, indent=None, fix=False):
+    """Run one maintenance command on one user file in a worker process.
+
+    validate only reports unless fix is set. Returns (path, outcome, notes,
+    counts) where outcome is 'ok', 'invalid' (found by validate without fix),
+    'changed' (or 'would change' in a dry run) or 'error'.
+    """
+    notes, counts = [], {}
+    report_only = command == 'validate' and not fix
+    try:
+        records, note = _read_user_file(path, recover=command == 'migrate' or (command == 'validate' and fix))
+    except (OSError, ValueError) as e:
+        notes = [f"unreadable: {e}"]
+        if report_only and os.path.exists(path + '.bak'):
+            notes.append("validate --fix restores it from .bak")
+        return path, 'error', notes, counts
+    if note:
+        notes.append(note)
+    if not isinstance(records, list):
+        return path, 'error', ["not a list of entries"], counts
+    original = records
+
+    if command == 'validate':
+        problems = [(i, _record_problem(record)) for i, record in enumerate(records)]
+        problems = [(i, problem) for i, problem in problems if problem]
+        notes.extend(f"entry {i}: {problem}" for i, problem in problems)
+        if report_only:
+            return path, 'invalid' if problems else 'ok', notes, counts
+        if problems or note:
+            # Repair: migrate what can be saved, drop the rest
+            records = [fixed for fixed in map(_migrate_record, records) if fixed is not None]
+    elif command == 'migrate':
+        records = [fixed for fixed in map(_migrate_record, records) if fixed is not None]
+        if len(records) < len(original):
+            notes.append(f"dropped {len(original) - len(records)} unusable entries")
+    elif command == 'dedupe':
+        if any(_record_problem(record) for record in records):
+            return path, 'error', ["has invalid entries, run validate first"], counts
+        records = _merge_duplicates(records)
+        if len(records) < len(original):
+            notes.append(f"merged {len(original) - len(records)} duplicate entries")
+    elif command == 'stats':
+        counts = dict.fromkeys(STATS_COUNTS, 0)
+        counts['entries'] = len(records)
+        counts['bytes'] = os.path.getsize(path)
+        for record in records:
+            if _record_problem(record):
+                counts['invalid entries'] += 1
+                continue
+            counts[Status.parse(record['status']).label] += 1
+            counts['favorites'] += bool(record.get('favorite'))
+        return path, 'ok', notes, counts
+
+    # compact rewrites every file; the others only files whose entries changed
+    if command != 'compact' and records == original and not note:
+        return path, 'ok', notes, counts
+    if not dry_run:
+        try:
+            atomic_write_json(path, records, indent=indent, backup=True)
+        except OSError as e:
+            return path, 'error', notes + [f"write failed: {e}"], counts
+    return path, 'would change' if dry_run else 'changed', notes, counts
+
+def _maintain_chunk(paths, command, dry_run, indent, fix):
+    return [maintain_file(path, command, dry_run, indent, fix) for path in paths]
+
+def user_files(data_dir):
+    pattern = re.compile(r'anime_list_\d+\.json$')
+    with os.scandir(data_dir) as entries:
+        return sorted(entry.path for entry in entries if pattern.match(entry.name))
+
+def run_maintenance(data_dir, command, dry_run=False, indent=None, workers=None, chunk_size=200,
+                    progress=sys.stderr, out=sys.stdout, fix=False):
+    """Run command over every user file, printing notes as they arrive; returns the totals."""
+    paths = user_files(data_dir)
+    totals = {'files': len(paths), 'ok': 0, 'invalid': 0, 'changed': 0, 'would change': 0, 'error': 0}
+    stats = dict.fromkeys(STATS_COUNTS, 0) if command == 'stats' else {}
+    started = last_report = time.monotonic()
+    done = 0
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_maintain_chunk, chunk, command, dry_run, indent, fix) for chunk in chunks]
+        for future in as_completed(futures):
+            for path, outcome, notes, counts in future.result():
+                totals[outcome] += 1
+                for key, value in counts.items():
+                    stats[key] = stats.get(key, 0) + value
+                if notes or outcome == 'error':
+                    print(f"{os.path.basename(path)}: {outcome}" + ''.join(f"\n  {note}" for note in notes), file=out)
+            done += 1
+            now = time.monotonic()
+            if progress and (now - last_report > 0.5 or done == len(chunks)):
+                files = min(done * chunk_size, len(paths))
+                rate = files / max(now - started, 1e-9)
+                print(f"\r{files}/{len(paths)} files ({rate:.0f}/s), {totals['changed'] + totals['would change']} "
+                      f"changed, {totals['error']} errors", end='', file=progress, flush=True)
+                last_report = now
+    if progress and paths:
+        print(file=progress)
+    totals['seconds'] = time.monotonic() - started
+    totals.update(stats)
+    return totals
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance tools for the data/anime_list_*.json files "
+                                                 "(run while the bot is stopped)")
+    parser.add_argument('command', choices=('validate', 'compact', 'stats', 'dedupe', 'migrate'),
+                        help="validate: report unreadable files and invalid entries (with --fix: restore "
+                             "unreadable files from .bak, migrate or drop invalid entries); compact: rewrite "
+                             "every file with --indent; stats: totals over all files; dedupe: merge entries with the same title; "
+                             "migrate: rewrite entries in the current format")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--fix', action='store_true', help="validate: repair what it reports")
+    parser.add_argument('--dry-run', action='store_true', help="report what would change without writing")
+    parser.add_argument('--indent', type=int, default=None, help="JSON indent for rewritten files (default: compact)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    totals = run_maintenance(args.data_dir, args.command, args.dry_run, args.indent, args.workers, fix=args.fix)
+    changed = 'would change' if args.dry_run else 'changed'
+    print(f"{totals['files']} files in {totals['seconds']:.1f}s: {totals[changed]} {changed}, "
+          f"{totals['invalid']} invalid, {totals['error']} errors")
+    if args.command == 'stats' and totals['files']:
+        print(f"{totals['entries']} entries ({totals['Watching']} watching, {totals['Completed']} completed, "
+              f"{totals['To Watch']} to watch, {totals['favorites']} favorites, {totals['invalid entries']} invalid), "
+              f"{totals['bytes'] / 2**20:.1f} MiB, {totals['entries'] / totals['files']:.1f} entries per user")
+    return 1 if totals['error'] or totals['invalid'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+from bisect import bisect_left
+
+log = logging.getLogger('AnimeBot')
+
+# Upper bounds of histogram buckets: 100us doubling up to ~52s, and 64B doubling up to 64MiB
+TIME_BUCKETS = tuple(0.0001 * 2 ** i for i in range(20))
+SIZE_BUCKETS = tuple(64 * 2 ** i for i in range(21))
+
+
+class Histogram:
+    """Fixed-bucket histogram; quantiles are interpolated within a bucket."""
+
+    def __init__(self, bounds=TIME_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket in enumerate(self.counts):
+            if bucket and seen + bucket >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket, self.max)
+            seen += bucket
+        return self.max
+
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{str(value).replace(chr(34), "")}"' for key, value in pairs) + '}'
+
+
+class Metrics:
+    """In-process counters and histograms keyed by name and labels.
+
+    When disabled every recording method returns immediately, so
+    instrumented code pays a single attribute check.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._histograms = {}  # (name, sorted label pairs) -> Histogram
+        self._counters = {}  # (name, sorted label pairs) -> number
+        self._collectors = []  # callables returning {gauge name: value}
+
+    def observe(self, name, value, bounds=TIME_BUCKETS, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        hist = self._histograms.get(key)
+        if hist is None:
+            hist = self._histograms[key] = Histogram(bounds)
+        hist.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collect):
+        """Register a callable returning current gauge values, read at render time."""
+        self._collectors.append(collect)
+
+    def histograms(self, name):
+        """{label dict as tuple of pairs: Histogram} for one metric name."""
+        return {labels: hist for (metric, labels), hist in list(self._histograms.items()) if metric == name}
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def gauges(self):
+        values = {}
+        for collect in self._collectors:
+            try:
+                values.update(collect())
+            except Exception as e:
+                log.error(f"Metrics collector failed: {e}")
+        return values
+
+    def record_io(self, op, seconds, nbytes):
+        """Storage on_io callback; may be called from saver threads."""
+        self.observe(f'storage_{op}_seconds', seconds)
+        self.observe(f'storage_{op}_bytes', nbytes, bounds=SIZE_BUCKETS)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(self._counters.items()):
+            if name not in typed:
+                lines.append(f'# TYPE {name} counter')
+                typed.add(name)
+            lines.append(f'{name}{_label_text(labels)} {value}')
+        for (name, labels), hist in sorted(self._histograms.items()):
+            if name not in typed:
+                lines.append(f'# TYPE {name} histogram')
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(hist.bounds, hist.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{_label_text(labels, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{name}_bucket{_label_text(labels, [("le", "+Inf")])} {hist.count}')
+            lines.append(f'{name}_sum{_label_text(labels)} {hist.sum:g}')
+            lines.append(f'{name}_count{_label_text(labels)} {hist.count}')
+        for name, value in sorted(self.gauges().items()):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes a task that sleeps for `interval` seconds."""
+
+    def __init__(self, metrics, interval=0.5):
+        self.metrics = metrics
+        self.interval = interval
+        self.last_lag = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - expected)
+            self.metrics.observe('event_loop_lag_seconds', self.last_lag)
+
+
+class MetricsServer:
+    """Serves GET /metrics in Prometheus text format on a local port."""
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout=5)
+            path = request.split(b' ', 2)[1] if request.count(b' ') >= 2 else b''
+            if path.split(b'?')[0] == b'/metrics':
+                status, body = b'200 OK', self.metrics.render_prometheus().encode()
+            else:
+                status, body = b'404 Not Found', b'Not found\n'
+            writer.write(b'HTTP/1.1 ' + status + b'\r\n'
+                         b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                         b'Content-Length: ' + str(len(body)).encode() + b'\r\n'
+                         b'Connection: close\r\n\r\n' + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
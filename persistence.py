@@ -0,0 +1,220 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+log = logging.getLogger('AnimeBot')
+
+# Per-user state that is saved in parts (statistics, the recommender model) is split
+# over this many files, so a save only rewrites the parts whose users changed
+USER_SHARDS = 64
+
+
+def user_shard(user_id):
+    # Snowflakes carry their creation time above bit 22; the low bits are mostly counters
+    return (user_id >> 22) % USER_SHARDS
+
+
+def _fsync_dir(directory):
+    # Makes the rename itself durable; directories can't be opened on Windows
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _keep_backup(path):
+    """Keep the current version of path as path + '.bak' without a moment where neither exists."""
+    if not os.path.exists(path):
+        return
+    backup = path + '.bak'
+    tmp_backup = f'{backup}.{os.getpid()}.tmp'
+    try:
+        os.link(path, tmp_backup)  # cheap: the old file is about to be unlinked by the replace anyway
+    except OSError:
+        shutil.copyfile(path, tmp_backup)
+    os.replace(tmp_backup, backup)
+
+
+def atomic_write_json(path, data, indent=4, backup=False):
+    """Write data to path via a fsynced temp file in the same directory and an atomic rename.
+
+    With backup=True the previous version is kept as path + '.bak' for
+    load_json to fall back on. Returns the number of bytes written.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=indent)
+            size = f.tell()
+            f.flush()
+            os.fsync(f.fileno())
+        if backup:
+            _keep_backup(path)
+        os.replace(tmp_path, path)
+        _fsync_dir(directory)
+        return size
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_json(path, default=None):
+    """Read JSON written by atomic_write_json, recovering from the .bak copy if path is unreadable.
+
+    Returns (data, bytes read); (default, 0) when path doesn't exist.
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f), f.tell()
+    except FileNotFoundError:
+        return default, 0
+    except (OSError, ValueError) as e:
+        backup = path + '.bak'
+        if not os.path.exists(backup):
+            raise
+        log.error(f"{path} is unreadable ({e}), recovering from {backup}")
+    with open(backup, 'r') as f:
+        return json.load(f), f.tell()
+
+
+class KeyedLocks:
+    """asyncio locks created per key on first use and dropped once nobody holds or awaits them.
+
+        async with user_locks.hold(user_id):
+            ...
+    """
+
+    def __init__(self):
+        self._locks = {}  # key -> [lock, holders and waiters]
+
+    def __len__(self):
+        return len(self._locks)
+
+    def locked(self, key):
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+
+def _write_all(groups):
+    failed = []
+    for storage, jobs in groups:
+        failed.extend(storage.save_many(jobs))
+    return failed
+
+
+class WriteBehindSaver:
+    """Coalesces watchlist saves and writes them from a thread executor.
+
+    Watchlists register themselves as dirty on every mutation; a background
+    task flushes each dirty watchlist at most once per interval.
+    """
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._dirty = {}  # storage key -> AnimeWatchList
+        self._inflight = {}  # lists whose snapshot is being written right now
+        self._flush_lock = None
+        self._wakeup = None
+        self._task = None
+
+    def mark_dirty(self, watch_list):
+        self._dirty[watch_list.data_file] = watch_list
+
+    def is_dirty(self, watch_list):
+        return watch_list.data_file in self._dirty
+
+    def get_pending(self, key):
+        """Return the queued or in-flight watchlist for key, if it has unsaved changes.
+
+        A watchlist dropped from the in-memory cache stays queued here until it is
+        written, so reloading it from storage before then would lose changes.
+        """
+        return self._dirty.get(key) or self._inflight.get(key)
+
+    @property
+    def pending(self):
+        return len(self._dirty)
+
+    def flush_soon(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._flush_lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error(f"Write-behind flush failed: {e}")
+
+    async def flush(self):
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+            # Serialize on the loop so the writer thread never sees a list mid-mutation;
+            # grouping by backend lets SQLite commit the whole batch in one transaction
+            groups = {}
+            for key, watch_list in batch.items():
+                groups.setdefault(id(watch_list.storage), (watch_list.storage, []))[1].append(
+                    (key, watch_list.to_records()))
+            self._inflight = batch
+            loop = asyncio.get_running_loop()
+            try:
+                failed = await loop.run_in_executor(None, _write_all, list(groups.values()))
+            finally:
+                self._inflight = {}
+            # Retry failed writes next round unless the list was re-dirtied meanwhile
+            for key in failed:
+                self._dirty.setdefault(key, batch[key])
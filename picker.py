@@ -0,0 +1,202 @@
+import random
+import re
+from collections import deque
+
+# Relative chance of being picked, by Preference value (LOW, MEDIUM, HIGH)
+PREFERENCE_WEIGHTS = (1, 2, 3)
+
+
+def genre_keys(genre):
+    """Lowercased genres of an entry; 'Action, Comedy' belongs to both."""
+    return {part.strip().lower() for part in re.split(r'[,/]', genre or '') if part.strip()}
+
+
+class FenwickTree:
+    """Prefix sums over item weights with O(log n) updates and weighted lookup."""
+
+    def __init__(self, size=0):
+        self._tree = [0] * (size + 1)
+
+    def __len__(self):
+        return len(self._tree) - 1
+
+    def grow(self, weights):
+        """Rebuild with room for at least twice the current weights, in O(n)."""
+        size = max(8, 2 * len(weights))
+        tree = [0] * (size + 1)
+        tree[1:len(weights) + 1] = weights
+        # Every slot passes its partial sum up, including the empty ones past the weights
+        for i in range(1, size + 1):
+            parent = i + (i & -i)
+            if parent <= size:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def add(self, index, delta):
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        i = len(self._tree) - 1
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, target):
+        """Smallest index whose inclusive prefix sum exceeds target."""
+        pos = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+
+class WeightedPool:
+    """Dense set of items with weights; O(log n) set/remove and weighted sampling."""
+
+    def __init__(self):
+        self._items = []
+        self._weights = []
+        self._positions = {}  # id(item) -> index into _items
+        self._tree = FenwickTree()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, item):
+        return id(item) in self._positions
+
+    def set(self, item, weight):
+        pos = self._positions.get(id(item))
+        if pos is None:
+            pos = len(self._items)
+            self._items.append(item)
+            self._weights.append(0)
+            self._positions[id(item)] = pos
+            if pos >= len(self._tree):
+                self._tree.grow(self._weights)
+        self._tree.add(pos, weight - self._weights[pos])
+        self._weights[pos] = weight
+
+    def remove(self, item):
+        pos = self._positions.pop(id(item), None)
+        if pos is None:
+            return
+        last = len(self._items) - 1
+        # Swap the last item into the freed position to stay dense
+        self._tree.add(pos, self._weights[last] - self._weights[pos])
+        self._tree.add(last, -self._weights[last])
+        if pos != last:
+            moved = self._items[last]
+            self._items[pos] = moved
+            self._weights[pos] = self._weights[last]
+            self._positions[id(moved)] = pos
+        self._items.pop()
+        self._weights.pop()
+
+    def weight(self, item):
+        pos = self._positions.get(id(item))
+        return 0 if pos is None else self._weights[pos]
+
+    def sample(self, rng=random, weighted=True):
+        if not self._items:
+            return None
+        if not weighted:
+            return rng.choice(self._items)
+        total = self._tree.total()
+        if total <= 0:
+            return None
+        return self._items[self._tree.find(rng.random() * total)]
+
+
+class RandomPicker:
+    """Candidates for the random suggestion, kept up to date as the watchlist changes.
+
+    Every non-completed entry sits in an overall pool and in one pool per genre,
+    weighted by preference. Recently suggested entries are skipped when possible.
+    """
+
+    def __init__(self, history=0, rng=random):
+        self.rng = rng
+        self._all = WeightedPool()
+        self._by_genre = {}
+        self._genres = {}  # id(anime) -> genre keys it is pooled under
+        self._recent = deque(maxlen=history)
+
+    def __len__(self):
+        return len(self._all)
+
+    def rebuild(self, anime_list):
+        self._all = WeightedPool()
+        self._by_genre = {}
+        self._genres = {}
+        for anime in anime_list:
+            self.track(anime)
+
+    def track(self, anime):
+        """Add, re-weight or drop an entry after it was added or changed."""
+        if anime.status == 'Completed':
+            self.untrack(anime)
+            return
+        weight = PREFERENCE_WEIGHTS[anime.preference_enum]
+        self._all.set(anime, weight)
+        genres = genre_keys(anime.genre)
+        for genre in self._genres.get(id(anime), set()) - genres:
+            self._remove_from_genre(genre, anime)
+        for genre in genres:
+            self._by_genre.setdefault(genre, WeightedPool()).set(anime, weight)
+        self._genres[id(anime)] = genres
+
+    def untrack(self, anime):
+        self._all.remove(anime)
+        for genre in self._genres.pop(id(anime), ()):
+            self._remove_from_genre(genre, anime)
+
+    def _remove_from_genre(self, genre, anime):
+        pool = self._by_genre.get(genre)
+        if pool is not None:
+            pool.remove(anime)
+            if not pool:
+                del self._by_genre[genre]
+
+    def pick(self, genre=None, weighted=True, avoid_recent=None):
+        """Sample a candidate, optionally within one genre.
+
+        avoid_recent limits how many of the latest picks are excluded
+        (defaults to the whole history); they are only picked again when
+        nothing else is left.
+        """
+        pool = self._all if genre is None else self._by_genre.get(genre.strip().lower())
+        if not pool:
+            return None
+        recent = list(self._recent)
+        if avoid_recent is not None:
+            recent = recent[-avoid_recent:] if avoid_recent else []
+        # Zero the weights of recent picks for this draw only: O(N log n) for N recent picks
+        hidden = [(anime, pool.weight(anime)) for anime in recent if anime in pool]
+        choice = None
+        if len(hidden) < len(pool):
+            for anime, _ in hidden:
+                pool.set(anime, 0)
+            try:
+                if weighted:
+                    choice = pool.sample(self.rng)
+                else:
+                    while choice is None or any(choice is anime for anime, _ in hidden):
+                        choice = pool.sample(self.rng, weighted=False)
+            finally:
+                for anime, weight in hidden:
+                    pool.set(anime, weight)
+        if choice is None:
+            choice = pool.sample(self.rng, weighted)
+        if choice is not None and self._recent.maxlen:
+            self._recent.append(choice)
+        return choice
@@ -0,0 +1,173 @@
+"""One path for slash and prefix commands.
+
+Both front-ends wrap their request in a reply adapter and hand a shared
+handler to CommandPipeline.run, which applies, in order:
+
+1. a per-user token bucket, so a spamming user is told to slow down
+   instead of queueing work;
+2. the user's lock for handlers that change the watchlist;
+3. a global cap on commands running at once, with a bounded wait and a
+   "busy" reply once the queue is full or the wait runs out;
+4. deferring the interaction before heavy handlers, or before any of the
+   waits above, so Discord's three-second deadline is never missed.
+"""
+import asyncio
+import time
+
+from persistence import KeyedLocks
+
+
+class CommandRejected(Exception):
+    """Raised by CommandPipeline.run when a command is shed; str() is the user-facing reply."""
+
+    def __init__(self, message, reason):
+        super().__init__(message)
+        self.reason = reason  # 'rate_limited' or 'busy'
+
+
+class SlashReply:
+    """Reply adapter for an application command interaction."""
+
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.user = interaction.user
+        self.guild = interaction.guild
+
+    async def defer(self):
+        if not self.interaction.response.is_done():
+            await self.interaction.response.defer()
+
+    async def send(self, content=None, **kwargs):
+        if content is not None:
+            kwargs['content'] = content
+        if self.interaction.response.is_done():
+            return await self.interaction.followup.send(**kwargs)
+        return await self.interaction.response.send_message(**kwargs)
+
+    def mark_failed(self):
+        # Read by the completion hook, which otherwise counts the command as ok
+        self.interaction.extras['command_failed'] = True
+
+
+class PrefixReply:
+    """Reply adapter for a prefix command context."""
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.user = ctx.author
+        self.guild = ctx.guild
+
+    async def defer(self):
+        # Messages have no deadline; show the typing indicator while the command waits
+        try:
+            await self.ctx.typing()
+        except Exception:
+            pass
+
+    async def send(self, content=None, ephemeral=False, **kwargs):
+        return await self.ctx.send(content, **kwargs)
+
+    def mark_failed(self):
+        self.ctx.command_failed = True
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst, now):
+        self.tokens = float(burst)
+        self.updated = now
+
+
+class RateLimiter:
+    """Per-key token buckets refilling at rate tokens per second up to burst."""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._buckets = {}
+        self._next_prune = 0.0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def acquire(self, key):
+        """Take a token; returns 0 if allowed, else the seconds until one is available."""
+        now = self.clock()
+        if now >= self._next_prune:
+            self._prune(now)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+        else:
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            return 0.0
+        return (1 - bucket.tokens) / self.rate
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        full_after = self.burst / self.rate
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket.updated < full_after}
+        self._next_prune = now + max(full_after, 60.0)
+
+
+class CommandPipeline:
+    def __init__(self, rate=20 / 60, burst=5, max_concurrent=32, max_waiting=100, wait_timeout=10.0,
+                 clock=time.monotonic):
+        self.limiter = RateLimiter(rate, burst, clock) if rate > 0 else None
+        self.user_locks = KeyedLocks()
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self._slots = None  # created on first use, inside the running loop
+
+    async def run(self, reply, handler, *args, heavy=False, exclusive=False):
+        """Run handler(reply, *args) through the middleware; raises CommandRejected when shed.
+
+        exclusive holds the user's lock while the handler runs, for handlers
+        that change the user's watchlist.
+        """
+        user_id = reply.user.id
+        if self.limiter is not None:
+            retry_after = self.limiter.acquire(user_id)
+            if retry_after:
+                raise CommandRejected(f"Slow down! Try again in {max(1, round(retry_after))}s.", 'rate_limited')
+        if heavy:
+            await reply.defer()
+
+        if exclusive:
+            if self.user_locks.locked(user_id):
+                await reply.defer()
+            async with self.user_locks.hold(user_id):
+                await self._run_limited(reply, handler, args)
+        else:
+            await self._run_limited(reply, handler, args)
+
+    async def _run_limited(self, reply, handler, args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if self._slots.locked():
+            if self.waiting >= self.max_waiting:
+                raise CommandRejected("The bot is busy right now, please try again in a moment!", 'busy')
+            self.waiting += 1
+            try:
+                await reply.defer()
+                await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                raise CommandRejected("The bot is busy right now, please try again in a moment!", 'busy') from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        self.active += 1
+        try:
+            await handler(reply, *args)
+        finally:
+            self.active -= 1
+            self._slots.release()
@@ -0,0 +1,414 @@
+"""Item-item recommendations over every user's watchlist.
+
+Each user is a sparse vector over titles, weighted by status, preference and
+favorite. A background thread keeps the top-K most similar titles (cosine
+similarity) for every title, recomputing only titles whose vectors changed
+from the vectors of the users who have them; with NumPy/SciPy installed it
+does so in batched sparse products, otherwise in pure Python. Answering
+/recommend only combines the neighbour lists of the user's own titles, so no
+other watchlist is read.
+
+The user vectors are saved as a title list plus one file per shard of users,
+and only the shards whose users changed are rewritten.
+
+    python recommend.py rebuild --data-dir data [--db data/anime.db]
+"""
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from persistence import USER_SHARDS, atomic_write_json, user_shard
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
+log = logging.getLogger('AnimeBot')
+
+# Index by Status / Preference value
+STATUS_WEIGHTS = (0.4, 0.8, 1.0)  # To Watch, Watching, Completed
+PREFERENCE_WEIGHTS = (0.6, 1.0, 1.5)  # Low, Medium, High
+FAVORITE_BONUS = 1.0
+
+
+def title_key(title):
+    return ' '.join(title.lower().split())
+
+
+def rating(anime):
+    weight = STATUS_WEIGHTS[anime.status_enum] * PREFERENCE_WEIGHTS[anime.preference_enum]
+    return weight + (FAVORITE_BONUS if anime.favorite else 0.0)
+
+
+class RecommenderObserver:
+    """AnimeWatchList observer queueing one user's changes for the recommender thread."""
+
+    __slots__ = ('recommender', 'user_id')
+
+    def __init__(self, recommender, user_id):
+        self.recommender = recommender
+        self.user_id = user_id
+
+    def added(self, anime):
+        self.recommender.submit(('delta', self.user_id, anime.title, rating(anime)))
+
+    def removed(self, anime):
+        self.recommender.submit(('delta', self.user_id, anime.title, -rating(anime)))
+
+    def reloaded(self, anime_list):
+        self.recommender.submit(('reset', self.user_id, [(anime.title, rating(anime)) for anime in anime_list]))
+
+
+class Recommender:
+    """Title neighbour lists maintained by a single worker thread.
+
+    Only the worker touches the user vectors. The event loop hands it changes
+    through a queue and reads finished neighbour lists, which are replaced
+    whole, so no locking is needed on the query path.
+
+    At most max_users user vectors are kept; beyond that the least recently
+    changed user is dropped from the model until their watchlist is loaded
+    again. Changes to users the model doesn't know are ignored, since every
+    load sends the whole list.
+    """
+
+    def __init__(self, path=os.path.join('data', 'recommend'), storage=None, top_k=20,
+                 batch_size=256, interval=30.0, rescan_interval=None, max_users=None):
+        self.path = path  # directory of the saved model
+        self.storage = storage  # scanned when there is no saved model, and every rescan_interval seconds
+        self.top_k = top_k
+        self.batch_size = batch_size
+        self.interval = interval
+        self.rescan_interval = rescan_interval
+        self.max_users = max_users
+        self.ready = False
+        self._index = {}  # title key -> item id
+        self._names = []  # item id -> display title
+        self._neighbors = {}  # item id -> [(similarity, item id)], best first
+        # Worker thread state
+        self._user_items = {}  # user_id -> {item id: weight}, least recently changed first
+        self._item_users = defaultdict(dict)  # item id -> {user_id: weight}
+        self._norms = []  # item id -> vector length, kept current for items not in _stale_norms
+        self._stale_norms = set()
+        self._dirty = set()
+        self._shard_users = [set() for _ in range(USER_SHARDS)]  # shard -> user ids in the model
+        self._unsaved = set()  # user shards changed since the last save
+        self._saved_titles = 0
+        self._queue = deque()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    # Event loop side
+
+    def observer(self, user_id):
+        return RecommenderObserver(self, user_id)
+
+    def submit(self, change):
+        self._queue.append(change)
+
+    def recommend(self, anime_list, limit=10, seeds=200):
+        """Titles the owner of anime_list doesn't have yet, as (title, score, because) tuples.
+
+        Only the `seeds` highest rated own titles are expanded, bounding the cost
+        to seeds * top_k neighbour lookups.
+        """
+        own = {}
+        for anime in anime_list:
+            own[title_key(anime.title)] = max(own.get(title_key(anime.title), 0.0), rating(anime))
+        scores = defaultdict(float)
+        reasons = {}
+        for key, weight in heapq.nlargest(seeds, own.items(), key=lambda item: item[1]):
+            item = self._index.get(key)
+            for similarity, other in self._neighbors.get(item, ()):
+                name = self._names[other]
+                if title_key(name) in own:
+                    continue
+                contribution = weight * similarity
+                scores[other] += contribution
+                if contribution > reasons.get(other, (0.0, None))[0]:
+                    reasons[other] = (contribution, self._names[item])
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(self._names[item], score, reasons[item][1]) for item, score in best]
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='recommender', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10):
+        if self._thread is not None:
+            self._stopping = True
+            self._wakeup.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Worker thread side
+
+    def _run(self):
+        try:
+            if not self._load():
+                self._scan_storage()
+            last_scan = time.monotonic()
+            while True:
+                self._drain()
+                self._refresh()
+                self.ready = True
+                if self._stopping:
+                    break
+                if self.rescan_interval and time.monotonic() - last_scan > self.rescan_interval:
+                    self._scan_storage()
+                    last_scan = time.monotonic()
+                    continue
+                self._save()
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+            self._save()
+        except Exception as e:
+            log.error(f"Recommender worker stopped: {e}")
+
+    def _item(self, title):
+        key = title_key(title)
+        item = self._index.get(key)
+        if item is None:
+            item = len(self._names)
+            self._names.append(title.strip())
+            self._norms.append(0.0)
+            self._index[key] = item
+        return item
+
+    def _set_weight(self, user_id, item, weight):
+        items = self._user_items.setdefault(user_id, {})
+        if abs(weight) < 1e-9:
+            items.pop(item, None)
+            self._item_users[item].pop(user_id, None)
+        else:
+            items[item] = weight
+            self._item_users[item][user_id] = weight
+        self._dirty.add(item)
+        self._stale_norms.add(item)
+        self._unsaved.add(user_shard(user_id))
+
+    def _apply(self, change):
+        user_id = change[1]
+        # Re-inserting keeps _user_items ordered by last change
+        items = self._user_items.pop(user_id, None)
+        if change[0] == 'delta':
+            if items is None:
+                return  # dropped from the model; its next load sends the whole list
+            self._user_items[user_id] = items
+            _, _, title, delta = change
+            item = self._item(title)
+            self._set_weight(user_id, item, items.get(item, 0.0) + delta)
+        else:
+            _, _, entries = change
+            if items is None:
+                items = {}
+                self._shard_users[user_shard(user_id)].add(user_id)
+                self._unsaved.add(user_shard(user_id))
+            self._user_items[user_id] = items
+            fresh = defaultdict(float)
+            for title, weight in entries:
+                fresh[self._item(title)] += weight
+            for item in list(items):
+                if item not in fresh:
+                    self._set_weight(user_id, item, 0.0)
+            for item, weight in fresh.items():
+                if items.get(item) != weight:
+                    self._set_weight(user_id, item, weight)
+        while self.max_users and len(self._user_items) > self.max_users:
+            self._drop_user(next(iter(self._user_items)))
+
+    def _drop_user(self, user_id):
+        for item in list(self._user_items[user_id]):
+            self._set_weight(user_id, item, 0.0)
+        del self._user_items[user_id]
+        self._shard_users[user_shard(user_id)].discard(user_id)
+        self._unsaved.add(user_shard(user_id))
+
+    def _drain(self):
+        applied = 0
+        while self._queue:
+            self._apply(self._queue.popleft())
+            applied += 1
+        return applied
+
+    def _scan_storage(self):
+        if self.storage is None:
+            return
+        from main import Anime
+
+        started = time.perf_counter()
+        users = 0
+        for user_id in self.storage.user_ids():
+            records = self.storage.load(self.storage.key_for_user(user_id))
+            self._apply(('reset', user_id, [(anime.title, rating(anime))
+                                           for anime in (Anime(**record) for record in records)]))
+            users += 1
+            if self._stopping:
+                return
+        log.info(f"Recommender scanned {users} watchlists in {time.perf_counter() - started:.1f}s")
+
+    def _refresh(self):
+        while self._dirty and not self._stopping:
+            self._update_norms()
+            batch = [self._dirty.pop() for _ in range(min(self.batch_size, len(self._dirty)))]
+            if sparse is not None:
+                results = self._similar_sparse(batch)
+            else:
+                results = self._similar_python(batch)
+            for item, neighbors in results.items():
+                self._update_neighbors(item, neighbors)
+            # Let queued changes in between batches so a big rebuild doesn't delay them
+            self._drain()
+
+    def _update_norms(self):
+        # An item's length only changes with its weights, which also mark it stale
+        for item in self._stale_norms:
+            self._norms[item] = math.sqrt(sum(weight * weight for weight in self._item_users.get(item, {}).values()))
+        self._stale_norms.clear()
+
+    def _similar_python(self, batch):
+        results = {}
+        for item in batch:
+            users = self._item_users.get(item)
+            if not users:
+                results[item] = []
+                continue
+            dots = defaultdict(float)
+            for user_id, weight in users.items():
+                for other, other_weight in self._user_items[user_id].items():
+                    if other != item:
+                        dots[other] += weight * other_weight
+            norm = self._norms[item]
+            results[item] = heapq.nlargest(
+                self.top_k, ((dot / (norm * self._norms[other]), other) for other, dot in dots.items()))
+        return results
+
+    def _local_matrix(self, batch):
+        """Users x items CSR matrix of only the users who have a title in batch.
+
+        Users without any of the batch titles add nothing to their similarities,
+        so the cost follows the batch's neighbourhood, not the whole model.
+        """
+        users = set()
+        for item in batch:
+            users.update(self._item_users.get(item, ()))
+        rows, cols, values = [], [], []
+        for row, user_id in enumerate(users):
+            items = self._user_items[user_id]
+            rows.extend([row] * len(items))
+            cols.extend(items.keys())
+            values.extend(items.values())
+        return sparse.csr_matrix((values, (rows, cols)), shape=(len(users), len(self._names)))
+
+    def _similar_sparse(self, batch):
+        matrix = self._local_matrix(batch)
+        dots = (matrix[:, batch].T @ matrix).tocsr()  # len(batch) x items
+        results = {}
+        for i, item in enumerate(batch):
+            start, end = dots.indptr[i], dots.indptr[i + 1]
+            others, sims = dots.indices[start:end], dots.data[start:end]
+            keep = others != item
+            others, sims = others[keep], sims[keep]
+            sims = sims / np.fromiter((self._norms[other] for other in others), float, len(others))
+            if len(sims) > self.top_k:
+                top = np.argpartition(-sims, self.top_k)[:self.top_k]
+                others, sims = others[top], sims[top]
+            sims = sims / self._norms[item]
+            results[item] = sorted(zip(sims.tolist(), others.tolist()), reverse=True)
+        return results
+
+    def _update_neighbors(self, item, neighbors):
+        kept = {other for _, other in neighbors}
+        for _, other in self._neighbors.get(item, ()):
+            if other not in kept and other in self._neighbors:
+                self._neighbors[other] = [entry for entry in self._neighbors[other] if entry[1] != item]
+        self._neighbors[item] = neighbors
+        # Patch the reverse direction so titles that weren't recomputed see the new similarity
+        for similarity, other in neighbors:
+            current = [entry for entry in self._neighbors.get(other, ()) if entry[1] != item]
+            if len(current) < self.top_k or similarity > current[-1][0]:
+                current.append((similarity, item))
+                current.sort(reverse=True)
+                self._neighbors[other] = current[:self.top_k]
+
+    def _shard_path(self, shard):
+        return os.path.join(self.path, f'users-{shard:02d}.json')
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.path, 'titles.json'), 'r') as f:
+                titles = json.load(f)
+        except (OSError, ValueError):
+            return False
+        for title in titles:
+            self._item(title)
+        for shard in range(USER_SHARDS):
+            try:
+                with open(self._shard_path(shard), 'r') as f:
+                    users = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for user_id, items in users.items():
+                user_id = int(user_id)
+                self._user_items[user_id] = {}
+                self._shard_users[shard].add(user_id)
+                for item, weight in items:
+                    if item < len(self._names):
+                        self._set_weight(user_id, item, weight)
+        self._saved_titles = len(self._names)
+        self._unsaved.clear()
+        return True
+
+    def _save(self, everything=False):
+        """Write the titles if new ones appeared, then the user shards that changed."""
+        shards = range(USER_SHARDS) if everything else sorted(self._unsaved)
+        if not shards:
+            return
+        try:
+            # Titles first: a shard may only refer to titles already saved
+            if everything or len(self._names) > self._saved_titles:
+                atomic_write_json(os.path.join(self.path, 'titles.json'), self._names, indent=None)
+                self._saved_titles = len(self._names)
+            for shard in shards:
+                users = {str(user_id): [[item, round(weight, 4)] for item, weight in self._user_items[user_id].items()]
+                         for user_id in self._shard_users[shard]}
+                atomic_write_json(self._shard_path(shard), users, indent=None)
+                self._unsaved.discard(shard)
+        except OSError as e:
+            log.error(f"Saving recommender model failed: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recommendation model tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild = sub.add_parser('rebuild', help="Rebuild data/recommend/ from every stored watchlist")
+    rebuild.add_argument('--data-dir', default='data', help="JSON watchlist directory")
+    rebuild.add_argument('--db', help="read from this SQLite database instead of JSON files")
+    rebuild.add_argument('--out', default=os.path.join('data', 'recommend'), help="model directory")
+    args = parser.parse_args(argv)
+
+    from storage import JsonStorage, SqliteStorage
+
+    storage = SqliteStorage(args.db) if args.db else JsonStorage(args.data_dir)
+    try:
+        recommender = Recommender(args.out, storage)
+        recommender._scan_storage()
+        recommender._save(everything=True)
+    finally:
+        storage.close()
+    print(f"Saved {len(recommender._user_items)} users and {len(recommender._names)} titles to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""Weekly episode reminders driven by a single scheduler task.
+
+Every reminder sits in one min-heap ordered by its next due time, so the
+scheduler sleeps until the earliest one instead of keeping a sleeping task
+per reminder. Reminders that fall due together are handed to the delivery
+callback grouped per user, and the schedule is saved to a JSON file so a
+restart resumes it without reading any watchlist.
+"""
+import asyncio
+import heapq
+import logging
+import os
+import time
+
+from persistence import atomic_write_json, load_json
+
+log = logging.getLogger('AnimeBot')
+
+DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+WEEK = 7 * 86400
+_EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+
+def parse_day(text):
+    """Weekday index (Monday = 0) from a day name or its first three letters."""
+    value = text.strip().lower()
+    for index, day in enumerate(DAYS):
+        if value == day.lower() or value == day[:3].lower():
+            return index
+    raise ValueError(f"Invalid day! Must be one of: {', '.join(DAYS)}")
+
+
+def parse_time(text):
+    """Minutes after midnight from HH:MM."""
+    try:
+        hours, minutes = (int(part) for part in text.strip().split(':'))
+    except ValueError:
+        raise ValueError("Invalid time! Use HH:MM, e.g. 18:30") from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError("Invalid time! Use HH:MM, e.g. 18:30")
+    return hours * 60 + minutes
+
+
+def next_occurrence(weekday, minute, utc_offset, now):
+    """First epoch second after now that is weekday at minute in a fixed UTC offset (minutes)."""
+    local_now = now + utc_offset * 60
+    local_day = int(local_now // 86400)
+    day = local_day + (weekday - (local_day + _EPOCH_WEEKDAY)) % 7
+    due = day * 86400 + minute * 60
+    if due <= local_now:
+        due += WEEK
+    return due - utc_offset * 60
+
+
+class Reminder:
+    __slots__ = ('user_id', 'title', 'weekday', 'minute', 'utc_offset', 'due', 'seq')
+
+    def __init__(self, user_id, title, weekday, minute, utc_offset=0, due=0.0):
+        self.user_id = user_id
+        self.title = title
+        self.weekday = weekday
+        self.minute = minute
+        self.utc_offset = utc_offset
+        self.due = due
+        self.seq = 0  # matches the reminder's live heap entry; older entries are stale
+
+    @property
+    def key(self):
+        return (self.user_id, self.title.strip().lower())
+
+    def describe(self):
+        hours, minutes = divmod(abs(self.utc_offset), 60)
+        offset = f"UTC{'-' if self.utc_offset < 0 else '+'}{hours}" + (f":{minutes:02d}" if minutes else "")
+        return f"{DAYS[self.weekday]}s at {self.minute // 60:02d}:{self.minute % 60:02d} {offset}"
+
+    def to_list(self):
+        return [self.user_id, self.title, self.weekday, self.minute, self.utc_offset, self.due]
+
+
+class ReminderScheduler:
+    """Min-heap of (due, seq, key) entries with lazy deletion.
+
+    Changing or removing a reminder leaves its old heap entry behind; entries
+    whose seq no longer matches the reminder are skipped when popped, and the
+    heap is rebuilt once they outnumber the live ones. clock returns epoch
+    seconds and can be replaced in tests, which drive pop_due() directly.
+    """
+
+    def __init__(self, path=os.path.join('data', 'reminders.json'), clock=time.time, max_per_user=25,
+                 save_interval=30.0, max_sleep=60.0, concurrency=5):
+        self.path = path
+        self.clock = clock
+        self.max_per_user = max_per_user
+        self.save_interval = save_interval
+        self.max_sleep = max_sleep  # upper bound on one wait, so wall clock jumps are noticed
+        self.concurrency = concurrency
+        self.dirty = False
+        self.delivered = 0
+        self._reminders = {}  # (user_id, title key) -> Reminder
+        self._by_user = {}  # user_id -> {title key: Reminder}
+        self._heap = []
+        self._seq = 0
+        self._task = None
+        self._wakeup = None
+        self._deliveries = set()
+
+    def __len__(self):
+        return len(self._reminders)
+
+    def _push(self, reminder):
+        self._seq += 1
+        reminder.seq = self._seq
+        heapq.heappush(self._heap, (reminder.due, reminder.seq, reminder.key))
+        if len(self._heap) > 2 * len(self._reminders) + 64:
+            self._heap = [(r.due, r.seq, r.key) for r in self._reminders.values()]
+            heapq.heapify(self._heap)
+
+    def set(self, user_id, title, weekday, minute, utc_offset=0):
+        """Add or replace the reminder for a title; returns it."""
+        reminder = Reminder(user_id, title, weekday, minute, utc_offset)
+        own = self._by_user.setdefault(user_id, {})
+        if reminder.key not in own and len(own) >= self.max_per_user:
+            raise ValueError(f"You can have at most {self.max_per_user} reminders!")
+        reminder.due = next_occurrence(weekday, minute, utc_offset, self.clock())
+        self._reminders[reminder.key] = own[reminder.key] = reminder
+        self._push(reminder)
+        self.dirty = True
+        # The scheduler may be sleeping towards a later reminder
+        if self._wakeup is not None and self._heap[0][1] == reminder.seq:
+            self._wakeup.set()
+        return reminder
+
+    def remove(self, user_id, title):
+        key = (user_id, title.strip().lower())
+        reminder = self._reminders.pop(key, None)
+        if reminder is None:
+            return None
+        own = self._by_user[user_id]
+        del own[key]
+        if not own:
+            del self._by_user[user_id]
+        self.dirty = True
+        return reminder
+
+    def for_user(self, user_id):
+        return sorted(self._by_user.get(user_id, {}).values(), key=lambda reminder: reminder.due)
+
+    def next_due(self):
+        while self._heap:
+            due, seq, key = self._heap[0]
+            reminder = self._reminders.get(key)
+            if reminder is not None and reminder.seq == seq:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now=None):
+        """Reschedule every reminder due at or before now; returns {user_id: [Reminder]}.
+
+        A reminder missed several times (e.g. while the bot was offline) fires
+        once and moves to its next occurrence after now.
+        """
+        now = self.clock() if now is None else now
+        batches = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, key = heapq.heappop(self._heap)
+            reminder = self._reminders.get(key)
+            if reminder is None or reminder.seq != seq:
+                continue
+            batches.setdefault(reminder.user_id, []).append(reminder)
+            reminder.due = next_occurrence(reminder.weekday, reminder.minute, reminder.utc_offset, now)
+            self._push(reminder)
+            self.dirty = True
+        return batches
+
+    # Persistence
+
+    def to_dict(self):
+        return {'reminders': [reminder.to_list() for reminder in self._reminders.values()]}
+
+    def load(self):
+        try:
+            data, _ = load_json(self.path, default={})
+        except (OSError, ValueError) as e:
+            log.error(f"Could not load reminders from {self.path}: {e}")
+            return self
+        for user_id, title, weekday, minute, utc_offset, due in data.get('reminders', ()):
+            reminder = Reminder(user_id, title, weekday, minute, utc_offset, due)
+            self._seq += 1
+            reminder.seq = self._seq
+            self._reminders[reminder.key] = self._by_user.setdefault(user_id, {})[reminder.key] = reminder
+        self._heap = [(r.due, r.seq, r.key) for r in self._reminders.values()]
+        heapq.heapify(self._heap)
+        self.dirty = False
+        return self
+
+    def save(self, data=None):
+        """Write the schedule; data is a to_dict() snapshot taken by the caller, if given."""
+        if data is None:
+            data = self.to_dict()
+            self.dirty = False
+        atomic_write_json(self.path, data, indent=None, backup=True)
+
+    # Scheduler task
+
+    def start(self, deliver):
+        """Run the scheduler; deliver(user_id, reminders) is awaited for every due batch."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run(deliver))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+        if self.dirty:
+            self.save()
+
+    async def _run(self, deliver):
+        loop = asyncio.get_running_loop()
+        limit = asyncio.Semaphore(self.concurrency)
+        last_save = self.clock()
+        while True:
+            delay = self.max_sleep
+            due = self.next_due()
+            if due is not None:
+                delay = min(delay, max(0.0, due - self.clock()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            for user_id, reminders in self.pop_due().items():
+                task = loop.create_task(self._deliver(deliver, limit, user_id, reminders))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+            if self.dirty and self.clock() - last_save >= self.save_interval:
+                # Snapshot on the loop, write in a thread
+                data = self.to_dict()
+                self.dirty = False
+                last_save = self.clock()
+                try:
+                    await loop.run_in_executor(None, self.save, data)
+                except Exception as e:
+                    self.dirty = True
+                    log.error(f"Saving reminders failed: {e}")
+
+    async def _deliver(self, deliver, limit, user_id, reminders):
+        async with limit:
+            try:
+                await deliver(user_id, reminders)
+                self.delivered += len(reminders)
+            except Exception as e:
+                log.error(f"Delivering reminders to {user_id} failed: {e}")
@@ -0,0 +1,170 @@
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+
+_WORD = re.compile(r'\w+')
+
+
+def trigrams(text):
+    """Character trigrams of a lowercased title, padded so short words still match."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(grams, other):
+    return 2 * len(grams & other) / (len(grams) + len(other))
+
+
+class TitleIndex:
+    """Incrementally maintained title index for one watchlist.
+
+    Keeps each entry's lowercased title and a trigram -> entries inverted
+    index, so searches only touch entries sharing trigrams with the query.
+    A sorted (title, id) array answers prefix lookups by bisection.
+    Entries are the Anime objects themselves, tracked by identity.
+    """
+
+    def __init__(self, min_similarity=0.3):
+        self.min_similarity = min_similarity
+        self._lower = {}  # id(anime) -> lowercased title
+        self._grams = {}  # id(anime) -> trigram set
+        self._entries = {}  # id(anime) -> anime
+        self._postings = {}  # trigram -> set of id(anime)
+        self._sorted = []  # (lowercased title, id(anime)), kept sorted
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self, anime_list):
+        self.__init__(self.min_similarity)
+        for anime in anime_list:
+            self.add(anime)
+
+    def add(self, anime):
+        key = id(anime)
+        if key in self._entries:
+            self.remove(anime)
+        lower = anime.title.lower()
+        grams = trigrams(lower)
+        self._entries[key] = anime
+        self._lower[key] = lower
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+        insort(self._sorted, (lower, key))
+
+    def remove(self, anime):
+        key = id(anime)
+        if self._entries.pop(key, None) is None:
+            return
+        lower = self._lower.pop(key)
+        del self._sorted[bisect_left(self._sorted, (lower, key))]
+        for gram in self._grams.pop(key):
+            posting = self._postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self._postings[gram]
+
+    def update(self, anime):
+        """Re-index an entry whose title may have changed."""
+        if self._lower.get(id(anime)) != anime.title.lower():
+            self.add(anime)
+
+    def scored(self, keyword):
+        """Yield (score, anime) for entries matching keyword.
+
+        Substring matches score above every fuzzy match, so results for an
+        exact fragment are never outranked by typo-tolerant ones.
+        """
+        query = keyword.lower().strip()
+        if not query:
+            return
+        query_grams = trigrams(query)
+        overlap = Counter()
+        for gram in query_grams:
+            for key in self._postings.get(gram, ()):
+                overlap[key] += 1
+        # Fragments shorter than a trigram can match inside a word without sharing one
+        candidates = overlap.keys() if len(query) >= 3 else self._lower.keys()
+        query_words = len(_WORD.findall(query)) or 1
+        for key in candidates:
+            lower = self._lower[key]
+            shared = overlap.get(key, 0)
+            # Dice coefficient over trigram sets
+            similarity = 2 * shared / (len(query_grams) + len(self._grams[key]))
+            if query in lower:
+                yield 1 + similarity, self._entries[key]
+                continue
+            if similarity < self.min_similarity and shared:
+                similarity = self._window_similarity(lower, query_grams, query_words)
+            if similarity >= self.min_similarity:
+                yield similarity, self._entries[key]
+
+    @staticmethod
+    def _window_similarity(lower, query_grams, query_words):
+        # A typo in one word of a long title ("freiren" in "Frieren: Beyond Journey's End")
+        # is diluted by the other words, so also compare runs of as many words as the query
+        words = _WORD.findall(lower)
+        best = 0.0
+        for i in range(len(words) - query_words + 1):
+            best = max(best, _dice(query_grams, trigrams(' '.join(words[i:i + query_words]))))
+        return best
+
+    def find(self, title, prefix=False):
+        """Return an entry whose title equals title, ignoring case.
+
+        With prefix=True, title may also be the start of exactly one entry's title.
+        """
+        lower = title.lower()
+        i = bisect_left(self._sorted, (lower,))
+        if i < len(self._sorted) and self._sorted[i][0] == lower:
+            return self._entries[self._sorted[i][1]]
+        if prefix:
+            matches = [key for key, _ in self._sorted[i:i + 2] if key.startswith(lower)]
+            if len(matches) == 1:
+                return self._entries[self._sorted[i][1]]
+        return None
+
+    def complete(self, prefix, limit=25):
+        """Titles starting with prefix, then ranked search hits, up to limit.
+
+        The fuzzy fallback only runs once the prefix is a full trigram long, so
+        short prefixes never scan every title.
+        """
+        lower = prefix.lower()
+        results = []
+        seen = set()
+        i = bisect_left(self._sorted, (lower,))
+        while i < len(self._sorted) and len(results) < limit:
+            title, key = self._sorted[i]
+            if not title.startswith(lower):
+                break
+            results.append(self._entries[key])
+            seen.add(key)
+            i += 1
+        if len(results) < limit and len(lower.strip()) >= 3:
+            for anime in self.search(prefix, limit):
+                if id(anime) not in seen and len(results) < limit:
+                    results.append(anime)
+                    seen.add(id(anime))
+        return results
+
+    def search(self, keyword, limit=None):
+        results = sorted(self.scored(keyword), key=lambda item: -item[0])
+        if limit is not None:
+            results = results[:limit]
+        return [anime for _, anime in results]
+
+
+def search_watchlists(watchlists, keyword, limit=10):
+    """Rank matches across several watchlists.
+
+    watchlists is an iterable of (owner, AnimeWatchList); returns (owner, anime)
+    pairs ordered by similarity.
+    """
+    scored = []
+    for owner, watch_list in watchlists:
+        for score, anime in watch_list.title_index.scored(keyword):
+            scored.append((score, owner, anime))
+    scored.sort(key=lambda item: -item[0])
+    return [(owner, anime) for _, owner, anime in scored[:limit]]
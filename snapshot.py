@@ -0,0 +1,140 @@
+"""Warm-start snapshot of the most recently used watchlists.
+
+On shutdown the bot writes the watchlists in its cache to one file:
+
+    magic (8 bytes) | index offset (8) | index length (4)
+    records of user 1 (compact JSON) | records of user 2 | ...
+    index: JSON list of [user_id, offset, length, storage stamp], most recent first
+
+On startup the file is memory-mapped and only the small index is parsed.
+A user's records are decoded from their slice when first needed, and only
+if the storage stamp (inode, mtime and size of the JSON file, or the user's
+version in the SQLite database) still matches, so changes made while the bot was down are never
+masked by the snapshot.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+log = logging.getLogger('AnimeBot')
+
+MAGIC = b'AWLSNAP1'
+_HEADER = struct.Struct('>8sQI')
+
+
+def write_snapshot(path, entries, stamp):
+    """Write [(user_id, key, records)] in that order; stamp(key) is taken per entry.
+
+    Called after the watchlists were saved, so the stamps describe exactly the
+    stored data the records came from. Returns (users, bytes written).
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.bin')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, 0, 0))
+            index = []
+            for user_id, key, records in entries:
+                current = stamp(key)
+                if current is None:
+                    continue
+                payload = json.dumps(records, separators=(',', ':')).encode()
+                index.append([user_id, f.tell(), len(payload), current])
+                f.write(payload)
+            index_offset = f.tell()
+            encoded = json.dumps(index, separators=(',', ':')).encode()
+            f.write(encoded)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, index_offset, len(encoded)))
+            size = index_offset + len(encoded)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return len(index), size
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class Snapshot:
+    """A memory-mapped snapshot; each user's records can be taken once."""
+
+    def __init__(self, path, stamp):
+        self.path = path
+        self.stamp = stamp  # storage.stamp
+        self.hits = 0
+        self.stale = 0
+        self._file = None
+        self._map = None
+        self._index = {}  # user_id -> (offset, length, stamp), in snapshot order
+
+    @classmethod
+    def open(cls, path, stamp):
+        """The snapshot at path, or None if there is none or it can't be read."""
+        snapshot = cls(path, stamp)
+        try:
+            snapshot._open()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.error(f"Ignoring unreadable snapshot {path}: {e}")
+            snapshot.close()
+            return None
+        return snapshot
+
+    def _open(self):
+        started = time.perf_counter()
+        self._file = open(self.path, 'rb')
+        if os.fstat(self._file.fileno()).st_size < _HEADER.size:
+            raise ValueError("truncated")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_length = _HEADER.unpack_from(self._map)
+        if magic != MAGIC or index_offset + index_length > len(self._map):
+            raise ValueError("not a snapshot file")
+        for user_id, offset, length, stamp in json.loads(self._map[index_offset:index_offset + index_length]):
+            self._index[user_id] = (offset, length, stamp)
+        log.info(f"Opened snapshot of {len(self._index)} watchlists in {time.perf_counter() - started:.3f}s")
+
+    def __len__(self):
+        return len(self._index)
+
+    def user_ids(self):
+        """Users still in the snapshot, most recently active first."""
+        return list(self._index)
+
+    def take(self, user_id, key):
+        """The user's records if the snapshot is still current for them, else None.
+
+        Entries are removed once taken; a later load must come from storage.
+        """
+        entry = self._index.pop(user_id, None)
+        snapshot_map = self._map
+        if entry is None or snapshot_map is None:
+            return None
+        offset, length, stamp = entry
+        if self.stamp(key) != stamp:
+            self.stale += 1
+            return None
+        try:
+            payload = snapshot_map[offset:offset + length]
+        except ValueError:
+            return None  # closed meanwhile by another thread
+        self.hits += 1
+        return json.loads(payload)
+
+    def close(self):
+        self._index = {}
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,347 @@
+import argparse
+import glob
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+
+from persistence import atomic_write_json, load_json
+
+log = logging.getLogger('AnimeBot')
+
+FIELDS = ('title', 'status', 'preference', 'genre', 'episodes_watched', 'total_episodes',
+          'start_date', 'completed_date', 'source_link', 'favorite')
+
+
+class JsonStorage:
+    """One JSON file per watchlist; the storage key is the file path.
+
+    Saves are atomic and fsynced and keep the previous version as
+    <file>.bak, which load falls back on if the file is unreadable.
+
+    on_io, if given, is called as on_io(op, seconds, nbytes) after every
+    'load' and 'save' of a file.
+    """
+
+    def __init__(self, data_dir='data', indent=4, on_io=None):
+        self.data_dir = data_dir
+        self.indent = indent
+        self.on_io = on_io
+
+    def key_for_user(self, user_id):
+        return os.path.join(self.data_dir, f'anime_list_{user_id}.json')
+
+    def user_ids(self):
+        """IDs of every user with a stored watchlist."""
+        pattern = re.compile(r'anime_list_(\d+)\.json$')
+        for path in glob.glob(os.path.join(self.data_dir, 'anime_list_*.json')):
+            match = pattern.search(os.path.basename(path))
+            if match:
+                yield int(match.group(1))
+
+    def load(self, key):
+        start = time.perf_counter()
+        records, size = load_json(key, default=[])
+        if self.on_io and size:
+            self.on_io('load', time.perf_counter() - start, size)
+        return records
+
+    def stamp(self, key):
+        """Changes whenever the stored watchlist may have changed; None if there is none.
+
+        Every save replaces the file, so the inode changes even when mtime
+        and size happen to match.
+        """
+        try:
+            st = os.stat(key)
+        except FileNotFoundError:
+            return None
+        return [st.st_ino, st.st_mtime_ns, st.st_size]
+
+    def save(self, key, records):
+        start = time.perf_counter()
+        size = atomic_write_json(key, records, indent=self.indent, backup=True)
+        if self.on_io:
+            self.on_io('save', time.perf_counter() - start, size)
+
+    def save_many(self, jobs):
+        """Save (key, records) pairs; returns the keys that failed."""
+        failed = []
+        for key, records in jobs:
+            try:
+                self.save(key, records)
+            except Exception as e:
+                log.error(f"Saving watchlist {key} failed: {e}")
+                failed.append(key)
+        return failed
+
+    def close(self):
+        pass
+
+
+class SqliteStorage:
+    """All watchlists in a single SQLite database running in WAL mode.
+
+    Every entry is a row with a stable id; seq orders a user's rows. Saving
+    diffs the new records against the stored rows, so changing an entry
+    updates one row, removing one deletes one row and appending inserts one,
+    without renumbering the rest. save_many commits any number of watchlists
+    in one transaction. Loads use a read connection per thread and never wait
+    for a commit. on_io works as for JsonStorage, with one 'save' per
+    transaction and the size of the changed rows' values.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            status TEXT NOT NULL,
+            preference TEXT NOT NULL,
+            genre TEXT,
+            episodes_watched INTEGER NOT NULL DEFAULT 0,
+            total_episodes INTEGER NOT NULL DEFAULT 1,
+            start_date TEXT,
+            completed_date TEXT,
+            source_link TEXT,
+            favorite INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_user_seq ON entries (user_id, seq);
+        CREATE INDEX IF NOT EXISTS idx_entries_user_title ON entries (user_id, title);
+        CREATE TABLE IF NOT EXISTS versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """
+    # Databases written before rows had stable ids kept them in anime, keyed by (user_id, position)
+    LEGACY_MIGRATION = f"""
+        BEGIN;
+        INSERT INTO entries (user_id, seq, {', '.join(FIELDS)})
+            SELECT user_id, position, {', '.join(FIELDS)} FROM anime ORDER BY user_id, position;
+        DROP TABLE anime;
+        COMMIT;
+    """
+
+    # Constant SQL strings so sqlite3's statement cache reuses the prepared statements
+    SELECT_SQL = f"SELECT id, seq, {', '.join(FIELDS)} FROM entries WHERE user_id = ? ORDER BY seq"
+    INSERT_SQL = (f"INSERT INTO entries (user_id, seq, {', '.join(FIELDS)}) "
+                  f"VALUES (?, ?, {', '.join('?' * len(FIELDS))})")
+    UPDATE_SQL = f"UPDATE entries SET seq = ?, {', '.join(f'{field} = ?' for field in FIELDS)} WHERE id = ?"
+    MOVE_SQL = "UPDATE entries SET seq = ? WHERE id = ?"
+    DELETE_SQL = "DELETE FROM entries WHERE id = ?"
+    VERSION_SQL = "SELECT version FROM versions WHERE user_id = ?"
+    BUMP_SQL = ("INSERT INTO versions (user_id, version) VALUES (?, 1) "
+                "ON CONFLICT (user_id) DO UPDATE SET version = version + 1")
+
+    def __init__(self, path='data/anime.db', on_io=None):
+        self.path = path
+        self.on_io = on_io
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Saves run from executor threads one transaction at a time on the write connection
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(self.SCHEMA)
+        if self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'anime'").fetchone():
+            self._conn.executescript(self.LEGACY_MIGRATION)
+        self._local = threading.local()
+        self._readers = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=64)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        # In WAL mode readers see the last commit and never block on the writer
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._readers.append(conn)
+        return conn
+
+    def key_for_user(self, user_id):
+        return str(user_id)
+
+    def user_ids(self):
+        """IDs of every user with a stored watchlist."""
+        keys = [row[0] for row in self._reader().execute("SELECT DISTINCT user_id FROM entries")]
+        return [int(key) for key in keys if key.isdigit()]
+
+    def stamp(self, key):
+        """Like JsonStorage.stamp: the user's version, bumped by every save that writes rows."""
+        row = self._reader().execute(self.VERSION_SQL, (key,)).fetchone()
+        return [row[0] if row else 0]
+
+    def load(self, key):
+        start = time.perf_counter()
+        rows = self._reader().execute(self.SELECT_SQL, (key,)).fetchall()
+        if self.on_io:
+            self.on_io('load', time.perf_counter() - start, _payload_size(row[2:] for row in rows))
+        records = []
+        for row in rows:
+            record = dict(zip(FIELDS, row[2:]))
+            record['favorite'] = bool(record['favorite'])
+            records.append(record)
+        return records
+
+    def save(self, key, records):
+        if self.save_many([(key, records)]):
+            raise RuntimeError(f"Saving watchlist {key} failed")
+
+    def save_many(self, jobs):
+        """Save (key, records) pairs in a single transaction; returns the keys that failed."""
+        start = time.perf_counter()
+        written = 0
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                for key, records in jobs:
+                    written += self._save_rows(key, records)
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                log.error(f"SQLite group commit of {len(jobs)} watchlists failed: {e}")
+                return [key for key, _ in jobs]
+        if self.on_io:
+            self.on_io('save', time.perf_counter() - start, written)
+        return []
+
+    def _save_rows(self, key, records):
+        stored = self._conn.execute(self.SELECT_SQL, (key,)).fetchall()
+        old = [row[2:] for row in stored]
+        new = [tuple(int(record[f]) if f == 'favorite' else record.get(f) for f in FIELDS) for record in records]
+        # Only the stretch between the unchanged head and tail can differ; within it,
+        # SequenceMatcher keeps the rows that survived, so a removal doesn't shift the rest
+        head = 0
+        while head < min(len(old), len(new)) and old[head] == new[head]:
+            head += 1
+        tail = 0
+        while tail < min(len(old), len(new)) - head and old[-1 - tail] == new[-1 - tail]:
+            tail += 1
+        old_middle, new_middle = stored[head:len(old) - tail], new[head:len(new) - tail]
+        placed = []  # [id or None, seq or None, row if it must be written] for new_middle
+        deleted = []
+        matcher = SequenceMatcher(None, old[head:len(old) - tail], new_middle, autojunk=False)
+        for op, i1, i2, j1, j2 in matcher.get_opcodes():
+            paired = 0 if op in ('insert', 'delete') else min(i2 - i1, j2 - j1)
+            for offset in range(paired):
+                row_id, seq = old_middle[i1 + offset][:2]
+                placed.append([row_id, seq, None if op == 'equal' else new_middle[j1 + offset]])
+            deleted.extend(row[0] for row in old_middle[i1 + paired:i2])
+            placed.extend([None, None, row] for row in new_middle[j1 + paired:j2])
+
+        # New rows take the seqs after their predecessor; renumber everything if they don't fit
+        previous = stored[head - 1][1] if head else -1
+        following = stored[len(old) - tail][1] if tail else None
+        for entry in placed:
+            if entry[1] is None:
+                entry[1] = previous + 1
+            elif entry[1] <= previous:
+                break
+            previous = entry[1]
+        else:
+            if following is None or previous < following:
+                return self._write_rows(key, placed, deleted)
+        renumbered = [[row[0], row[1], None] for row in stored[:head]] + placed + \
+                     [[row[0], row[1], None] for row in stored[len(old) - tail:]]
+        for position, entry in enumerate(renumbered):
+            if entry[0] is not None and entry[2] is None and entry[1] != position:
+                entry[2] = 'move'
+            entry[1] = position
+        return self._write_rows(key, renumbered, deleted)
+
+    def _write_rows(self, key, placed, deleted):
+        inserts, updates, moves = [], [], []
+        for row_id, seq, row in placed:
+            if row_id is None:
+                inserts.append((key, seq) + row)
+            elif row == 'move':
+                moves.append((seq, row_id))
+            elif row is not None:
+                updates.append((seq,) + row + (row_id,))
+        if deleted:
+            self._conn.executemany(self.DELETE_SQL, ((row_id,) for row_id in deleted))
+        if updates:
+            self._conn.executemany(self.UPDATE_SQL, updates)
+        if moves:
+            self._conn.executemany(self.MOVE_SQL, moves)
+        if inserts:
+            self._conn.executemany(self.INSERT_SQL, inserts)
+        if deleted or updates or moves or inserts:
+            self._conn.execute(self.BUMP_SQL, (key,))
+        if not self.on_io:
+            return 0
+        return _payload_size(row[2:] for row in inserts) + _payload_size(row[1:-1] for row in updates)
+
+    def close(self):
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            self._conn.close()
+
+
+def _payload_size(rows):
+    # Approximate bytes of row values; SQLite's on-disk size isn't observable per statement
+    return sum(len(value) if isinstance(value, str) else 8 for row in rows for value in row if value is not None)
+
+
+def migrate_json_dir(data_dir, storage, batch_size=500):
+    """Import every data/anime_list_<user_id>.json file into storage.
+
+    Returns (users, entries) imported.
+    """
+    pattern = re.compile(r'anime_list_(\d+)\.json$')
+    users = entries = 0
+    batch = []
+    for path in sorted(glob.glob(os.path.join(data_dir, 'anime_list_*.json'))):
+        match = pattern.search(os.path.basename(path))
+        if not match:
+            continue
+        try:
+            records, _ = load_json(path, default=[])
+        except (OSError, ValueError) as e:
+            log.error(f"Skipping unreadable watchlist {path}: {e}")
+            continue
+        batch.append((storage.key_for_user(match.group(1)), records))
+        users += 1
+        entries += len(records)
+        if len(batch) >= batch_size:
+            _commit_batch(storage, batch)
+            batch = []
+    if batch:
+        _commit_batch(storage, batch)
+    return users, entries
+
+
+def _commit_batch(storage, batch):
+    failed = storage.save_many(batch)
+    if failed:
+        raise RuntimeError(f"Migration failed for {len(failed)} watchlists")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anime watchlist storage tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate = sub.add_parser('migrate', help="Import data/anime_list_*.json files into SQLite")
+    migrate.add_argument('--data-dir', default='data')
+    migrate.add_argument('--db', default='data/anime.db')
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        storage = SqliteStorage(args.db)
+        try:
+            users, entries = migrate_json_dir(args.data_dir, storage)
+        finally:
+            storage.close()
+        print(f"Imported {entries} entries for {users} users into {args.db}")
+
+
+if __name__ == '__main__':
+    main()
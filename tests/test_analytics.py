@@ -0,0 +1,77 @@
+import os
+
+from analytics import Analytics
+from main import Anime
+from persistence import USER_SHARDS
+
+
+def _list(*titles):
+    return [Anime(title, 'Completed', 'High', episodes_watched=12, total_episodes=12) for title in titles]
+
+
+def _user(shard, n=0):
+    # A snowflake-like id landing in the given shard
+    return ((n * USER_SHARDS + shard) << 22) | 7
+
+
+def test_least_recently_active_users_are_forgotten(tmp_path):
+    analytics = Analytics(str(tmp_path / 'analytics'), max_users=2)
+    for user_id in (1, 2):
+        analytics.join(10, user_id)
+        analytics.replace_user(user_id, _list(f'T{user_id}', 'Shared'))
+    analytics.join(10, 1)  # user 1 is active again
+    analytics.replace_user(3, _list('T3'))
+    assert set(analytics.users) == {1, 3}
+    summary = analytics.guild_summary(10)
+    assert summary['members'] == 1
+    assert summary['entries'] == 2
+    # Changes to a forgotten user are ignored until the list is counted again
+    analytics.apply(2, _list('T9')[0], 1)
+    assert 2 not in analytics.users
+
+
+def test_recency_survives_save_and_load(tmp_path):
+    path = str(tmp_path / 'analytics')
+    analytics = Analytics(path, max_users=3)
+    for user_id in (_user(0), _user(1), _user(0, 1)):
+        analytics.replace_user(user_id, _list(f'T{user_id}'))
+    analytics.join(10, _user(0))
+    analytics.save()
+    loaded = Analytics(path, max_users=2).load()
+    assert set(loaded.users) == {_user(0, 1), _user(0)}
+    assert loaded.guild_summary(10)['entries'] == 1
+
+
+def test_only_changed_shards_are_written(tmp_path):
+    path = str(tmp_path / 'analytics')
+    analytics = Analytics(path)
+    for shard in range(4):
+        analytics.join(10, _user(shard))
+        analytics.replace_user(_user(shard), _list('Frieren'))
+    analytics.save()
+    assert sorted(os.listdir(path)) == ['00.json', '01.json', '02.json', '03.json']
+    assert not analytics.dirty
+
+    written = []
+    analytics.write_shard = lambda shard, data: written.append(shard)
+    analytics.join(10, _user(2))  # already counted: nothing to save
+    assert not analytics.dirty
+    analytics.apply(_user(2), _list('Mushishi')[0], 1)
+    analytics.leave(10, _user(3))
+    analytics.save()
+    assert written == [2, 3]
+
+
+def test_shards_load_back_into_guild_totals(tmp_path):
+    path = str(tmp_path / 'analytics')
+    analytics = Analytics(path)
+    for shard in (5, 6):
+        analytics.join(10, _user(shard))
+        analytics.replace_user(_user(shard), _list('Frieren'))
+    analytics.join(11, _user(7))  # a member without a loaded watchlist
+    analytics.save()
+    loaded = Analytics(path).load()
+    assert loaded.guild_summary(10)['entries'] == 2
+    assert loaded.guild_summary(10)['top_titles'] == [('Frieren', 2)]
+    assert loaded.guild_summary(11)['members'] == 1
+    assert loaded.user_summary(_user(7)) is None
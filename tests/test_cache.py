@@ -0,0 +1,51 @@
+from cache import WatchlistCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    evicted = []
+    cache = WatchlistCache(maxsize=2, on_evict=lambda key, value: evicted.append(key))
+    cache[1] = 'a'
+    cache[2] = 'b'
+    assert cache.get(1) == 'a'  # 2 is now the least recently used
+    cache[3] = 'c'
+    assert evicted == [2]
+    assert cache.keys_by_recency() == [3, 1]
+    assert cache.stats()['evictions'] == 1
+
+
+def test_peek_leaves_order_and_counters_alone():
+    cache = WatchlistCache(maxsize=2)
+    cache[1] = 'a'
+    cache[2] = 'b'
+    assert cache.peek(1) == 'a' and 1 in cache
+    cache[3] = 'c'
+    assert cache.peek(1) is None
+    assert cache.stats()['hits'] == 0 and cache.stats()['misses'] == 0
+
+
+def test_idle_entries_expire():
+    clock = FakeClock()
+    evicted = []
+    cache = WatchlistCache(maxsize=0, ttl=10, clock=clock, on_evict=lambda key, value: evicted.append(key))
+    cache[1] = 'a'
+    cache[2] = 'b'
+    clock.now = 8
+    assert cache.get(1) == 'a'  # refreshes its idle time
+    clock.now = 15
+    assert cache.peek(2) is None
+    assert cache.get(2, 'missing') == 'missing'
+    assert evicted == [2]
+    cache[3] = 'c'  # inserting prunes expired entries from the front
+    clock.now = 30
+    cache[4] = 'd'
+    assert evicted == [2, 1, 3] and len(cache) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from cluster import ClusterLink, _frame, shard_ranges, worker_for_user
+
+
+def test_empty_secret_is_refused():
+    with pytest.raises(ValueError):
+        ClusterLink(0, 2, '')
+    with pytest.raises(ValueError):
+        ClusterLink(0, 2, None)
+
+
+def test_users_and_shards_are_partitioned():
+    assert shard_ranges(5, 2) == [[0, 1, 2], [3, 4]]
+    owners = {worker_for_user(user_id, 4) for user_id in range(1000)}
+    assert owners == {0, 1, 2, 3}
+    assert worker_for_user(1234, 4) == worker_for_user(1234, 4)
+
+
+def test_wrong_secret_is_rejected():
+    received = []
+
+    async def send(port, secret):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(_frame({'secret': secret}))
+        writer.write(_frame({'event': 'MESSAGE_CREATE', 'data': {'secret': secret}}))
+        await writer.drain()
+        return reader, writer
+
+    async def scenario():
+        link = ClusterLink(0, 2, 'right')
+        link._parsers['MESSAGE_CREATE'] = received.append
+        server = await asyncio.start_server(link._serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        for secret in ('wrong', ''):
+            reader, writer = await send(port, secret)
+            assert await reader.read() == b''  # closed without parsing anything
+            writer.close()
+        _, writer = await send(port, 'right')
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        writer.close()
+        server.close()
+        await link.stop()
+
+    asyncio.run(scenario())
+    assert received == [{'secret': 'right'}]
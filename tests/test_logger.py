@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('discord')
+
+from logger import DiscordLogSink  # noqa: E402
+
+
+def _event(n, error=None):
+    return {'timestamp': '2024-05-01 12:00:00', 'user': f'user#{n}', 'action': f'Action {n}',
+            'details': 'x' * 10, 'error': error}
+
+
+class FakeChannel:
+    def __init__(self, fail_after=None):
+        self.sent = []
+        self.fail_after = fail_after
+
+    async def send(self, embed):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise RuntimeError("Discord is down")
+        self.sent.append(embed)
+
+
+class FakeBot:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def get_partial_messageable(self, channel_id):
+        return self.channel
+
+
+def _sink(channel, **options):
+    sink = DiscordLogSink(123, **options)
+    sink._bot = FakeBot(channel)
+    return sink
+
+
+def test_full_queue_drops_oldest_and_reports_it():
+    channel = FakeChannel()
+    sink = _sink(channel, batch_size=10, max_queue=3)
+    for n in range(5):
+        sink.enqueue(_event(n))
+    assert sink.dropped == 2
+    asyncio.run(sink.flush())
+    assert len(channel.sent) == 1
+    embed = channel.sent[0]
+    assert '2 log events dropped' in embed.description
+    assert [field.name for field in embed.fields] == ['Action 2 - user#2', 'Action 3 - user#3', 'Action 4 - user#4']
+    assert sink.dropped == 0
+
+
+def test_flush_sends_batches_and_marks_errors():
+    channel = FakeChannel()
+    sink = _sink(channel, batch_size=2)
+    for n in range(4):
+        sink.enqueue(_event(n, error='boom' if n == 3 else None))
+    asyncio.run(sink.flush())
+    assert [len(embed.fields) for embed in channel.sent] == [2, 2]
+    assert channel.sent[1].fields[1].name.startswith('❌')
+
+
+def test_failed_send_keeps_the_rest_queued():
+    channel = FakeChannel(fail_after=1)
+    sink = _sink(channel, batch_size=1)
+    for n in range(3):
+        sink.enqueue(_event(n))
+    asyncio.run(sink.flush())
+    assert len(channel.sent) == 1
+    assert len(sink._queue) == 1  # the batch being sent is lost, later events wait
+    channel.fail_after = None
+    asyncio.run(sink.flush())
+    assert len(channel.sent) == 2
+
+
+def test_embeds_stay_within_discord_limits():
+    channel = FakeChannel()
+    sink = _sink(channel, batch_size=25)
+    for n in range(25):
+        sink.enqueue(dict(_event(n), details='y' * 2000))
+    asyncio.run(sink.flush())
+    for embed in channel.sent:
+        assert len(embed) <= DiscordLogSink.MAX_EMBED_CHARS
+        assert all(len(field.value) <= DiscordLogSink.MAX_FIELD_VALUE for field in embed.fields)
+    assert sum(len(embed.fields) for embed in channel.sent) == 25
@@ -0,0 +1,93 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from logquery import LogFilter, MinuteIndex, chunk_lines, query_log
+
+
+def _line(minute, second, action, user_id=1, error=None):
+    stamp = f"2024-05-01 12:{minute:02d}:{second:02d},000"
+    user = f"User: name#0 (ID: {user_id})"
+    if error:
+        return f"{stamp} - ERROR - {user} - Action: {action} - Error: {error}\n"
+    return f"{stamp} - INFO - {user} - Action: {action}\n"
+
+
+def _write_log(path, lines):
+    with open(path, 'w') as f:
+        f.writelines(lines)
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = str(tmp_path / 'anime_bot_20240501.log')
+    _write_log(path, [
+        _line(0, 1, 'Add Anime'),
+        _line(0, 30, 'Add Anime', user_id=2),
+        _line(1, 5, 'Update Status', error='boom'),
+        'Traceback line one\n',
+        _line(2, 0, 'Add Anime'),
+        _line(3, 59, 'Remove Anime', user_id=2),
+    ])
+    return path
+
+
+def test_newest_matching_records_oldest_first(log_path):
+    lines = query_log(log_path, limit=2, block_size=16)
+    assert [line[20:] for line in lines] == [
+        '000 - INFO - User: name#0 (ID: 1) - Action: Add Anime',
+        '000 - INFO - User: name#0 (ID: 2) - Action: Remove Anime',
+    ]
+    assert query_log(log_path + '.missing') is None
+
+
+def test_filters_keep_multiline_records_whole(log_path):
+    lines = query_log(log_path, log_filter=LogFilter(errors_only=True))
+    assert len(lines) == 2 and lines[1] == 'Traceback line one'
+    assert len(query_log(log_path, log_filter=LogFilter(user_id=2))) == 2
+    assert len(query_log(log_path, log_filter=LogFilter(action='add anime', user_id=1))) == 2
+
+
+def test_time_range_uses_the_minute_index(log_path):
+    since, until = datetime(2024, 5, 1, 12, 1), datetime(2024, 5, 1, 12, 2, 30)
+    lines = query_log(log_path, log_filter=LogFilter(since=since, until=until))
+    assert [line[:19] for line in lines if line[0].isdigit()] == ['2024-05-01 12:01:05', '2024-05-01 12:02:00']
+    index = MinuteIndex(log_path).load()
+    assert [minute for minute, _ in index.minutes] == [
+        '2024-05-01 12:00', '2024-05-01 12:01', '2024-05-01 12:02', '2024-05-01 12:03']
+
+
+def test_index_only_reads_appended_bytes(log_path):
+    index = MinuteIndex(log_path).load().refresh()
+    size = index.indexed_size
+    with open(log_path, 'a') as f:
+        f.write(_line(4, 0, 'Add Anime'))
+        f.write('2024-05-01 12:05:00,000 - INFO - partial')  # still being written
+    index = MinuteIndex(log_path).load().refresh()
+    assert index.minutes[-1][0] == '2024-05-01 12:04'
+    assert index.indexed_size == size + len(_line(4, 0, 'Add Anime'))
+    _write_log(log_path, [_line(9, 0, 'Add Anime')])  # replaced by a shorter file
+    assert [minute for minute, _ in MinuteIndex(log_path).load().refresh().minutes] == ['2024-05-01 12:09']
+
+
+def test_chunk_lines_keeps_the_newest():
+    lines = [f"line {n}" * 10 for n in range(10)]
+    chunks = chunk_lines(lines, chunk_size=150, max_total=400)
+    assert all(len(chunk) <= 150 for chunk in chunks)
+    joined = '\n'.join(chunks).split('\n')
+    assert joined == lines[-len(joined):]
+
+
+def test_retention_removes_the_index_with_its_log(tmp_path):
+    pytest.importorskip('discord')
+    from logger import DailyFileHandler
+
+    for day in ('20240501', '20240502', '20240503'):
+        for suffix in ('', '.idx'):
+            open(os.path.join(tmp_path, f'anime_bot_{day}.log{suffix}'), 'w').close()
+    handler = DailyFileHandler(str(tmp_path), backup_count=2)
+    handler.close()
+    assert sorted(os.listdir(tmp_path)) == [
+        'anime_bot_20240502.log', 'anime_bot_20240502.log.idx',
+        'anime_bot_20240503.log', 'anime_bot_20240503.log.idx']
@@ -0,0 +1,68 @@
+import json
+import os
+
+from main import main, maintain_file
+
+VALID = {'title': 'Frieren', 'status': 'Watching', 'preference': 'High', 'genre': 'Fantasy',
+         'episodes_watched': 3, 'total_episodes': 28, 'start_date': None, 'completed_date': None,
+         'source_link': None, 'favorite': False}
+
+
+def _write(directory, user_id, content):
+    path = os.path.join(directory, f'anime_list_{user_id}.json')
+    with open(path, 'w') as f:
+        f.write(content if isinstance(content, str) else json.dumps(content))
+    return path
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_validate_only_reports_without_fix(tmp_path):
+    broken = dict(VALID, total_episodes=-1)
+    path = _write(str(tmp_path), 1, [VALID, broken])
+    before = os.stat(path).st_mtime_ns
+    _, outcome, notes, _ = maintain_file(path, 'validate')
+    assert outcome == 'invalid'
+    assert notes and notes[0].startswith('entry 1:')
+    assert os.stat(path).st_mtime_ns == before
+    assert len(_read(path)) == 2
+
+
+def test_validate_fix_repairs(tmp_path):
+    path = _write(str(tmp_path), 1, [VALID, dict(VALID, title='Mushishi', total_episodes=-1), 'junk'])
+    _, outcome, _, _ = maintain_file(path, 'validate', fix=True)
+    assert outcome == 'changed'
+    records = _read(path)
+    assert [record['title'] for record in records] == ['Frieren', 'Mushishi']
+    assert records[1]['total_episodes'] == 0  # length unknown
+    assert os.path.exists(path + '.bak')
+
+
+def test_dedupe_merges_progress(tmp_path):
+    duplicate = dict(VALID, title=' frieren ', episodes_watched=10, favorite=True)
+    path = _write(str(tmp_path), 1, [VALID, duplicate])
+    _, outcome, _, _ = maintain_file(path, 'dedupe', dry_run=True)
+    assert outcome == 'would change'
+    assert len(_read(path)) == 2
+    maintain_file(path, 'dedupe')
+    (record,) = _read(path)
+    assert record['episodes_watched'] == 10 and record['favorite']
+
+
+def test_stats_with_only_unreadable_files(tmp_path, capsys):
+    _write(str(tmp_path), 1, '{not json')
+    assert main(['stats', '--data-dir', str(tmp_path), '--workers', '1']) == 1
+    out = capsys.readouterr().out
+    assert '0 entries' in out and '1 errors' in out
+
+
+def test_cli_validate_exit_code(tmp_path):
+    _write(str(tmp_path), 1, [VALID])
+    assert main(['validate', '--data-dir', str(tmp_path), '--workers', '1']) == 0
+    _write(str(tmp_path), 2, [dict(VALID, status='Dropped')])
+    assert main(['validate', '--data-dir', str(tmp_path), '--workers', '1']) == 1
+    assert main(['validate', '--fix', '--data-dir', str(tmp_path), '--workers', '1']) == 0
+    assert main(['validate', '--data-dir', str(tmp_path), '--workers', '1']) == 0
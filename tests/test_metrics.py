@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from metrics import SIZE_BUCKETS, Histogram, Metrics, MetricsServer
+
+
+def test_histogram_quantiles_fall_in_the_right_bucket():
+    hist = Histogram()
+    for value in [0.001] * 90 + [0.5] * 10:
+        hist.observe(value)
+    assert hist.count == 100 and hist.sum == pytest.approx(5.09)
+    assert 0.0008 <= hist.quantile(0.5) <= 0.0016  # interpolated within the 0.001 bucket
+    assert 0.4 <= hist.quantile(0.99) <= 0.5
+    assert hist.quantile(1.0) == 0.5
+    assert Histogram().quantile(0.5) == 0.0
+
+
+def test_metrics_are_keyed_by_labels():
+    metrics = Metrics()
+    metrics.inc('commands_total', command='add', outcome='ok')
+    metrics.inc('commands_total', outcome='ok', command='add')
+    metrics.inc('commands_total', command='add', outcome='error')
+    assert metrics.counter('commands_total', command='add', outcome='ok') == 2
+    assert metrics.counter('commands_total', command='add', outcome='error') == 1
+    metrics.record_io('save', 0.01, 2048)
+    assert metrics.histograms('storage_save_bytes')[()].bounds == SIZE_BUCKETS
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    metrics.inc('commands_total')
+    metrics.observe('command_seconds', 1.0)
+    assert metrics.counter('commands_total') == 0 and metrics.histograms('command_seconds') == {}
+
+
+def test_prometheus_text_and_endpoint():
+    metrics = Metrics()
+    metrics.inc('commands_total', command='add "x"', outcome='ok')
+    metrics.observe('command_seconds', 0.0002, command='add')
+    metrics.add_collector(lambda: {'watchlists_cached': 3})
+    metrics.add_collector(lambda: 1 / 0)  # a failing collector doesn't break the others
+    text = metrics.render_prometheus()
+    assert 'commands_total{command="add x",outcome="ok"} 1' in text
+    assert 'command_seconds_bucket{command="add",le="+Inf"} 1' in text
+    assert 'command_seconds_count{command="add"} 1' in text
+    assert 'watchlists_cached 3' in text
+
+    async def fetch(path):
+        server = MetricsServer(metrics, 0)
+        server._server = await asyncio.start_server(server._handle, '127.0.0.1', 0)
+        port = server._server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        response = await reader.read()
+        writer.close()
+        await server.stop()
+        return response.decode()
+
+    assert asyncio.run(fetch('/metrics')).startswith('HTTP/1.1 200 OK')
+    assert asyncio.run(fetch('/other')).startswith('HTTP/1.1 404')
@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from main import Anime, AnimeWatchList
+from persistence import WriteBehindSaver, atomic_write_json, load_json
+from storage import JsonStorage
+
+
+def test_flush_writes_dirty_watchlist(tmp_path):
+    storage = JsonStorage(str(tmp_path))
+    key = storage.key_for_user(1)
+
+    async def scenario():
+        saver = WriteBehindSaver(interval=60)
+        watch_list = AnimeWatchList(key, writer=saver, storage=storage)
+        watch_list.add_anime(Anime('Frieren', 'To Watch', 'High', total_episodes=28))
+        assert saver.pending == 1
+        await saver.flush()
+        assert saver.pending == 0
+
+    asyncio.run(scenario())
+    with open(key) as f:
+        assert [record['title'] for record in json.load(f)] == ['Frieren']
+
+
+def test_stop_flushes_pending_changes(tmp_path):
+    storage = JsonStorage(str(tmp_path))
+    key = storage.key_for_user(2)
+
+    async def scenario():
+        saver = WriteBehindSaver(interval=60)
+        saver.start()
+        watch_list = AnimeWatchList(key, writer=saver, storage=storage)
+        watch_list.add_anime(Anime('Mushishi', 'Completed', 'Medium', episodes_watched=26, total_episodes=26))
+        await saver.stop()
+
+    asyncio.run(scenario())
+    assert storage.load(key)[0]['title'] == 'Mushishi'
+
+
+def test_load_json_recovers_from_backup(tmp_path):
+    path = str(tmp_path / 'list.json')
+    atomic_write_json(path, [1], backup=True)
+    atomic_write_json(path, [2], backup=True)
+    with open(path, 'w') as f:
+        f.write('{truncated')
+    assert load_json(path)[0] == [1]
+    assert load_json(str(tmp_path / 'missing.json'), default=[]) == ([], 0)
@@ -0,0 +1,54 @@
+import random
+
+from main import Anime
+from picker import FenwickTree, RandomPicker, WeightedPool
+
+
+def _prefix(tree, index):
+    i, total = index + 1, 0
+    while i > 0:
+        total += tree._tree[i]
+        i -= i & -i
+    return total
+
+
+def test_grow_keeps_prefix_sums():
+    rng = random.Random(7)
+    for n in range(1, 70):
+        weights = [rng.randint(0, 5) for _ in range(n)]
+        tree = FenwickTree()
+        tree.grow(weights)
+        assert tree.total() == sum(weights)
+        for i in range(n):
+            assert _prefix(tree, i) == sum(weights[:i + 1])
+
+
+def test_pool_matches_weights_after_growth_and_removal():
+    pool = WeightedPool()
+    items = [object() for _ in range(20)]
+    for i, item in enumerate(items):
+        pool.set(item, i % 3 + 1)
+    pool.remove(items[3])
+    assert pool._tree.total() == sum(pool._weights)
+    # Every remaining item can be drawn, including the last few slots
+    drawn = {id(pool.sample(random.Random(seed))) for seed in range(2000)}
+    assert drawn == {id(item) for item in items if item is not items[3]}
+
+
+def test_pick_skips_recent_and_completed():
+    picker = RandomPicker(history=3, rng=random.Random(1))
+    animes = [Anime(f'T{i}', 'To Watch', 'Low') for i in range(4)]
+    animes.append(Anime('Done', 'Completed', 'High'))
+    picker.rebuild(animes)
+    assert len(picker) == 4
+    picks = [picker.pick() for _ in range(4)]
+    assert len({id(anime) for anime in picks}) == 4
+
+
+def test_avoid_recent_larger_than_history_excludes_all():
+    picker = RandomPicker(history=5, rng=random.Random(3))
+    animes = [Anime(f'T{i}', 'Watching', 'High') for i in range(5)]
+    picker.rebuild(animes)
+    picked = {id(picker.pick()) for _ in range(4)}
+    last = picker.pick(avoid_recent=6)
+    assert id(last) not in picked
@@ -0,0 +1,116 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from pipeline import CommandPipeline, CommandRejected, PrefixReply, RateLimiter, SlashReply
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeReply:
+    def __init__(self, user_id):
+        self.user = SimpleNamespace(id=user_id)
+        self.deferred = 0
+
+    async def defer(self):
+        self.deferred += 1
+
+
+def test_rate_limiter_refills():
+    clock = FakeClock()
+    limiter = RateLimiter(rate=1.0, burst=2, clock=clock)
+    assert limiter.acquire('a') == 0 and limiter.acquire('a') == 0
+    assert limiter.acquire('a') == pytest.approx(1.0)
+    assert limiter.acquire('b') == 0  # buckets are per key
+    clock.now = 1.0
+    assert limiter.acquire('a') == 0
+    clock.now = 100.0
+    limiter.acquire('c')
+    assert len(limiter) == 1  # full buckets are pruned
+
+
+def test_pipeline_rate_limits_per_user():
+    clock = FakeClock()
+    pipeline = CommandPipeline(rate=1.0, burst=1, clock=clock)
+    ran = []
+
+    async def handler(reply):
+        ran.append(reply.user.id)
+
+    async def scenario():
+        await pipeline.run(FakeReply(1), handler)
+        with pytest.raises(CommandRejected) as rejected:
+            await pipeline.run(FakeReply(1), handler)
+        assert rejected.value.reason == 'rate_limited'
+        await pipeline.run(FakeReply(2), handler)
+
+    asyncio.run(scenario())
+    assert ran == [1, 2]
+
+
+def test_exclusive_commands_of_one_user_run_in_order():
+    pipeline = CommandPipeline(rate=0)
+    events = []
+
+    async def handler(reply, name):
+        events.append(f'{name} start')
+        await asyncio.sleep(0.01)
+        events.append(f'{name} end')
+
+    async def scenario():
+        second = FakeReply(1)
+        await asyncio.gather(
+            pipeline.run(FakeReply(1), handler, 'first', exclusive=True),
+            pipeline.run(second, handler, 'second', exclusive=True),
+            pipeline.run(FakeReply(2), handler, 'other', exclusive=True),
+        )
+        assert second.deferred == 1  # told Discord to wait while the lock was held
+        assert len(pipeline.user_locks) == 0
+
+    asyncio.run(scenario())
+    assert events.index('first end') < events.index('second start')
+    assert events.index('other start') < events.index('first end')
+
+
+def test_busy_commands_are_shed():
+    pipeline = CommandPipeline(rate=0, max_concurrent=1, max_waiting=1, wait_timeout=0.05)
+    release = asyncio.Event()
+
+    async def blocking(reply):
+        await release.wait()
+
+    async def quick(reply):
+        pass
+
+    async def scenario():
+        running = asyncio.create_task(pipeline.run(FakeReply(1), blocking))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(pipeline.run(FakeReply(2), quick))
+        await asyncio.sleep(0)
+        with pytest.raises(CommandRejected) as full:
+            await pipeline.run(FakeReply(3), quick)
+        assert full.value.reason == 'busy'
+        with pytest.raises(CommandRejected):
+            await waiting  # timed out waiting for a slot
+        release.set()
+        await running
+        assert pipeline.active == 0 and pipeline.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_replies_mark_failures_for_the_metrics_hooks():
+    interaction = SimpleNamespace(user=None, guild=None, extras={})
+    SlashReply(interaction).mark_failed()
+    assert interaction.extras['command_failed'] is True
+
+    ctx = SimpleNamespace(author=None, guild=None, command_failed=False)
+    PrefixReply(ctx).mark_failed()
+    assert ctx.command_failed is True
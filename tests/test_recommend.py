@@ -0,0 +1,78 @@
+import os
+
+import pytest
+
+from main import Anime
+from persistence import USER_SHARDS
+from recommend import Recommender
+
+
+def _entries(*titles):
+    return [(title, 1.0) for title in titles]
+
+
+def test_model_keeps_the_most_recently_changed_users(tmp_path):
+    recommender = Recommender(str(tmp_path / 'recommend'), max_users=2)
+    recommender._apply(('reset', 1, _entries('A', 'B')))
+    recommender._apply(('reset', 2, _entries('A', 'C')))
+    recommender._apply(('delta', 1, 'D', 1.0))
+    recommender._apply(('reset', 3, []))
+    assert list(recommender._user_items) == [1, 3]
+    # User 2 left the model entirely, and its changes are ignored until it is reset again
+    recommender._apply(('delta', 2, 'C', -1.0))
+    assert 2 not in recommender._user_items
+    assert 2 not in recommender._item_users[recommender._index['c']]
+
+
+def test_recommends_neighbours_of_own_titles(tmp_path):
+    recommender = Recommender(str(tmp_path / 'recommend'))
+    for user_id in range(5):
+        recommender._apply(('reset', user_id, _entries('Frieren', 'Mushishi')))
+    recommender._apply(('reset', 9, _entries('Monster')))
+    recommender._refresh()
+    own = [Anime('Frieren', 'Completed', 'High')]
+    assert [title for title, _, _ in recommender.recommend(own)] == ['Mushishi']
+
+
+def _user(shard, n=0):
+    return ((n * USER_SHARDS + shard) << 22) | 3
+
+
+def test_similarities_match_a_full_recount(tmp_path):
+    recommender = Recommender(str(tmp_path / 'recommend'), top_k=3)
+    lists = {1: ['A', 'B', 'C'], 2: ['A', 'B'], 3: ['B', 'C', 'D'], 4: ['D', 'E'], 5: ['A', 'E']}
+    for user_id, titles in lists.items():
+        recommender._apply(('reset', user_id, _entries(*titles)))
+    recommender._refresh()
+    recommender._apply(('delta', 2, 'C', 2.0))  # only C's vector changes
+    recommender._refresh()
+
+    fresh = Recommender(str(tmp_path / 'other'), top_k=3)
+    lists[2].append('C')
+    for user_id, titles in lists.items():
+        fresh._apply(('reset', user_id, [(title, 2.0 if (user_id, title) == (2, 'C') else 1.0)
+                                          for title in titles]))
+    fresh._refresh()
+    assert recommender._names == fresh._names
+    for item in range(len(fresh._names)):
+        assert recommender._neighbors[item] == pytest.approx(fresh._neighbors[item])
+
+
+def test_only_changed_user_shards_are_saved(tmp_path):
+    path = str(tmp_path / 'recommend')
+    recommender = Recommender(path)
+    recommender._apply(('reset', _user(1), _entries('Frieren', 'Mushishi')))
+    recommender._apply(('reset', _user(2), _entries('Frieren')))
+    recommender._save()
+    assert sorted(os.listdir(path)) == ['titles.json', 'users-01.json', 'users-02.json']
+
+    mtimes = {name: os.stat(os.path.join(path, name)).st_mtime_ns for name in os.listdir(path)}
+    recommender._apply(('delta', _user(2), 'Mushishi', 1.0))
+    recommender._save()
+    changed = {name for name in os.listdir(path) if os.stat(os.path.join(path, name)).st_mtime_ns != mtimes[name]}
+    assert changed == {'users-02.json'}
+
+    loaded = Recommender(path)
+    assert loaded._load()
+    assert loaded._user_items == recommender._user_items
+    assert not loaded._unsaved
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from reminders import WEEK, ReminderScheduler, next_occurrence, parse_day, parse_time
+
+# Monday 2024-01-01 12:00 UTC
+MONDAY_NOON = datetime(2024, 1, 1, 12, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_parse_day_and_time():
+    assert parse_day('wed') == 2
+    assert parse_day(' Sunday ') == 6
+    assert parse_time('18:30') == 18 * 60 + 30
+    with pytest.raises(ValueError):
+        parse_day('someday')
+    with pytest.raises(ValueError):
+        parse_time('24:00')
+
+
+def test_next_occurrence():
+    # Later the same day, next week when already past, and shifted by the UTC offset
+    assert next_occurrence(0, 13 * 60, 0, MONDAY_NOON) == MONDAY_NOON + 3600
+    assert next_occurrence(0, 11 * 60, 0, MONDAY_NOON) == MONDAY_NOON - 3600 + WEEK
+    assert next_occurrence(0, 13 * 60, 120, MONDAY_NOON) == MONDAY_NOON - 3600 + WEEK
+    assert next_occurrence(1, 0, -300, MONDAY_NOON) == MONDAY_NOON + 17 * 3600
+
+
+def test_pop_due_in_order_and_grouped_per_user(tmp_path):
+    clock = FakeClock(MONDAY_NOON)
+    scheduler = ReminderScheduler(str(tmp_path / 'reminders.json'), clock=clock)
+    scheduler.set(1, 'Frieren', 0, 13 * 60)
+    scheduler.set(1, 'Mushishi', 0, 13 * 60)
+    scheduler.set(2, 'Monster', 0, 14 * 60)
+    assert scheduler.next_due() == MONDAY_NOON + 3600
+    assert scheduler.pop_due() == {}
+
+    batches = scheduler.pop_due(MONDAY_NOON + 3600)
+    assert sorted(reminder.title for reminder in batches[1]) == ['Frieren', 'Mushishi']
+    assert 2 not in batches
+    assert scheduler.next_due() == MONDAY_NOON + 7200
+    # Fired reminders move to next week
+    assert {reminder.due for reminder in scheduler.for_user(1)} == {MONDAY_NOON + 3600 + WEEK}
+
+
+def test_replaced_and_removed_reminders_leave_no_live_entries(tmp_path):
+    scheduler = ReminderScheduler(str(tmp_path / 'reminders.json'), clock=FakeClock(MONDAY_NOON))
+    scheduler.set(1, 'Frieren', 0, 13 * 60)
+    scheduler.set(1, 'frieren ', 2, 13 * 60)  # same title, new day
+    scheduler.set(1, 'Monster', 0, 14 * 60)
+    scheduler.remove(1, 'MONSTER')
+    assert len(scheduler) == 1
+    assert scheduler.pop_due(MONDAY_NOON + 2 * 86400) == {}
+    (reminder,) = scheduler.pop_due(MONDAY_NOON + 2 * 86400 + 3600)[1]
+    assert reminder.weekday == 2
+    assert len(scheduler._heap) <= 2 * len(scheduler) + 64
+
+
+def test_missed_reminders_fire_once(tmp_path):
+    scheduler = ReminderScheduler(str(tmp_path / 'reminders.json'), clock=FakeClock(MONDAY_NOON))
+    scheduler.set(1, 'Frieren', 0, 13 * 60)
+    later = MONDAY_NOON + 3 * WEEK
+    assert len(scheduler.pop_due(later)[1]) == 1
+    assert scheduler.next_due() > later
+
+
+def test_per_user_limit(tmp_path):
+    scheduler = ReminderScheduler(str(tmp_path / 'reminders.json'), clock=FakeClock(MONDAY_NOON), max_per_user=2)
+    scheduler.set(1, 'A', 0, 0)
+    scheduler.set(1, 'B', 0, 0)
+    scheduler.set(1, 'b', 1, 0)  # replacing doesn't count against the limit
+    with pytest.raises(ValueError):
+        scheduler.set(1, 'C', 0, 0)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'reminders.json')
+    scheduler = ReminderScheduler(path, clock=FakeClock(MONDAY_NOON))
+    scheduler.set(1, 'Frieren', 4, 20 * 60, utc_offset=-330)
+    scheduler.save()
+    loaded = ReminderScheduler(path, clock=FakeClock(MONDAY_NOON)).load()
+    (reminder,) = loaded.for_user(1)
+    assert reminder.describe() == 'Fridays at 20:00 UTC-5:30'
+    assert loaded.next_due() == scheduler.next_due()
+
+
+def test_scheduler_task_delivers_due_batches(tmp_path):
+    delivered = []
+
+    async def deliver(user_id, due):
+        delivered.append((user_id, [reminder.title for reminder in due]))
+
+    async def scenario():
+        clock = FakeClock(MONDAY_NOON)
+        scheduler = ReminderScheduler(str(tmp_path / 'reminders.json'), clock=clock, max_sleep=0.01)
+        scheduler.start(deliver)
+        scheduler.set(7, 'Frieren', 0, 13 * 60)
+        clock.now += 3600
+        for _ in range(100):
+            if delivered:
+                break
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert delivered == [(7, ['Frieren'])]
@@ -0,0 +1,61 @@
+from main import Anime
+from search import TitleIndex, search_watchlists
+
+TITLES = ["Frieren: Beyond Journey's End", 'Attack on Titan', 'Attack on Titan Season 2', 'Mushishi',
+          'One Piece', 'Spy x Family']
+
+
+def _index(*titles):
+    index = TitleIndex()
+    animes = [Anime(title, 'Watching', 'High') for title in titles]
+    index.rebuild(animes)
+    return index, animes
+
+
+def _titles(animes):
+    return [anime.title for anime in animes]
+
+
+def test_substring_matches_rank_above_typos():
+    index, _ = _index(*TITLES, 'Attack on Titun')
+    results = _titles(index.search('attack on titan'))
+    assert results[:2] == ['Attack on Titan', 'Attack on Titan Season 2']
+    assert results[2] == 'Attack on Titun'
+
+
+def test_typos_match_one_word_of_a_long_title():
+    index, _ = _index(*TITLES)
+    assert _titles(index.search('freiren')) == ["Frieren: Beyond Journey's End"]
+    assert _titles(index.search('atack on titan'))[0] == 'Attack on Titan'
+    assert _titles(index.search('mushisi')) == ['Mushishi']
+    assert index.search('naruto') == []
+
+
+def test_index_follows_adds_removes_and_renames():
+    index, animes = _index(*TITLES)
+    index.remove(animes[3])
+    assert index.search('mushishi') == [] and len(index) == len(TITLES) - 1
+    animes[4].title = 'One Punch Man'
+    index.update(animes[4])
+    assert _titles(index.search('punch')) == ['One Punch Man']
+    assert index.find('one piece') is None
+    assert index.find('ONE PUNCH MAN') is animes[4]
+
+
+def test_complete_prefix_first_then_fuzzy():
+    index, _ = _index(*TITLES)
+    assert _titles(index.complete('att')) == ['Attack on Titan', 'Attack on Titan Season 2']
+    assert _titles(index.complete('fam')) == ['Spy x Family']
+    assert _titles(index.complete('frei')) == ["Frieren: Beyond Journey's End"]  # typo, via search
+    assert _titles(index.complete('xy')) == []
+    assert _titles(index.complete('att', limit=1)) == ['Attack on Titan']
+
+
+def test_search_across_watchlists_ranks_by_score():
+    class WatchList:
+        def __init__(self, *titles):
+            self.title_index, _ = _index(*titles)
+
+    results = search_watchlists([('a', WatchList('Frieren')), ('b', WatchList("Frieren: Beyond Journey's End"))],
+                                'frieren')
+    assert [owner for owner, _ in results] == ['a', 'b']
@@ -0,0 +1,47 @@
+import pytest
+
+from snapshot import Snapshot, write_snapshot
+from storage import JsonStorage, SqliteStorage
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'json':
+        yield JsonStorage(str(tmp_path / 'data'))
+    else:
+        backend = SqliteStorage(str(tmp_path / 'anime.db'))
+        yield backend
+        backend.close()
+
+
+def _records(title):
+    return [{'title': title, 'status': 'To Watch', 'preference': 'Low', 'genre': 'Unknown',
+             'episodes_watched': 0, 'total_episodes': 12, 'start_date': None, 'completed_date': None,
+             'source_link': None, 'favorite': False}]
+
+
+def test_snapshot_serves_only_unchanged_watchlists(storage, tmp_path):
+    path = str(tmp_path / 'snapshot.bin')
+    entries = []
+    for user_id in (1, 2, 3):
+        key = storage.key_for_user(user_id)
+        storage.save(key, _records(f'T{user_id}'))
+        entries.append((user_id, key, _records(f'T{user_id}')))
+    assert write_snapshot(path, entries, storage.stamp)[0] == 3
+
+    storage.save(storage.key_for_user(2), _records('Changed'))
+    snapshot = Snapshot.open(path, storage.stamp)
+    assert snapshot.user_ids() == [1, 2, 3]
+    assert snapshot.take(1, storage.key_for_user(1)) == _records('T1')
+    assert snapshot.take(2, storage.key_for_user(2)) is None
+    assert snapshot.take(1, storage.key_for_user(1)) is None  # taken once
+    snapshot.close()
+    assert snapshot.take(3, storage.key_for_user(3)) is None
+    assert (snapshot.hits, snapshot.stale) == (1, 1)
+
+
+def test_missing_or_corrupt_snapshot(tmp_path):
+    path = tmp_path / 'snapshot.bin'
+    assert Snapshot.open(str(path), lambda key: None) is None
+    path.write_bytes(b'garbage' * 10)
+    assert Snapshot.open(str(path), lambda key: None) is None
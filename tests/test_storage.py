@@ -0,0 +1,85 @@
+import random
+import sqlite3
+
+from storage import FIELDS, SqliteStorage
+
+
+def _record(title, watched=0):
+    return {'title': title, 'status': 'Watching', 'preference': 'Medium', 'genre': 'Drama',
+            'episodes_watched': watched, 'total_episodes': 24, 'start_date': None, 'completed_date': None,
+            'source_link': None, 'favorite': False}
+
+
+def _changes(storage, key, records):
+    before = storage._conn.total_changes
+    storage.save(key, records)
+    changes = storage._conn.total_changes - before
+    return changes - 1 if changes else 0  # not counting the user's version bump
+
+
+def test_edits_touch_only_the_changed_rows(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'anime.db'))
+    records = [_record(f'T{i}') for i in range(50)]
+    assert _changes(storage, '1', records) == 50
+    assert _changes(storage, '1', records) == 0
+    del records[0]
+    assert _changes(storage, '1', records) == 1
+    records[10] = _record('T11', watched=3)
+    assert _changes(storage, '1', records) == 1
+    records.append(_record('New'))
+    assert _changes(storage, '1', records) == 1
+    # A removal and an edit coalesced into one save
+    del records[5]
+    records[30]['favorite'] = True
+    assert _changes(storage, '1', records) == 2
+    assert storage.load('1') == records
+    storage.close()
+
+
+def test_random_edits_round_trip(tmp_path):
+    rng = random.Random(5)
+    storage = SqliteStorage(str(tmp_path / 'anime.db'))
+    records = []
+    for _ in range(300):
+        action = rng.random()
+        if action < 0.4 or not records:
+            records.insert(rng.randint(0, len(records)), _record(f'T{rng.randint(0, 30)}'))
+        elif action < 0.7:
+            del records[rng.randrange(len(records))]
+        else:
+            records[rng.randrange(len(records))] = _record(f'T{rng.randint(0, 30)}', rng.randint(0, 24))
+        storage.save('7', records)
+        assert storage.load('7') == records
+    storage.save('7', [])
+    assert storage.load('7') == []
+    storage.close()
+
+
+def test_legacy_position_table_is_migrated(tmp_path):
+    path = str(tmp_path / 'anime.db')
+    conn = sqlite3.connect(path)
+    conn.execute(f"CREATE TABLE anime (user_id TEXT NOT NULL, position INTEGER NOT NULL, {', '.join(FIELDS)}, "
+                 "PRIMARY KEY (user_id, position)) WITHOUT ROWID")
+    for position, title in ((1, 'Second'), (0, 'First')):
+        record = _record(title)
+        conn.execute(f"INSERT INTO anime VALUES (?, ?, {', '.join('?' * len(FIELDS))})",
+                     ('3', position) + tuple(int(record[f]) if f == 'favorite' else record[f] for f in FIELDS))
+    conn.commit()
+    conn.close()
+    storage = SqliteStorage(path)
+    assert [record['title'] for record in storage.load('3')] == ['First', 'Second']
+    assert storage.user_ids() == [3]
+    storage.close()
+
+
+def test_stamp_changes_only_for_the_saved_user(tmp_path):
+    storage = SqliteStorage(str(tmp_path / 'anime.db'))
+    storage.save('1', [_record('A')])
+    storage.save('2', [_record('B')])
+    first, second = storage.stamp('1'), storage.stamp('2')
+    storage.save('2', [_record('B', watched=1)])
+    assert storage.stamp('1') == first
+    assert storage.stamp('2') != second
+    storage.save('1', [_record('A')])  # nothing written, nothing changed
+    assert storage.stamp('1') == first
+    storage.close()
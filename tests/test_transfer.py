@@ -0,0 +1,90 @@
+import io
+
+from main import Anime, AnimeWatchList
+from storage import JsonStorage
+from transfer import read_import, write_export
+
+MAL_AIRING = b"""<?xml version="1.0" encoding="UTF-8" ?>
+<myanimelist>
+\t<anime>
+\t\t<series_title>One Piece</series_title>
+\t\t<series_episodes>0</series_episodes>
+\t\t<my_watched_episodes>5</my_watched_episodes>
+\t\t<my_score>8</my_score>
+\t\t<my_status>Watching</my_status>
+\t</anime>
+\t<anime>
+\t\t<series_title>Dandadan</series_title>
+\t\t<series_episodes>0</series_episodes>
+\t\t<my_watched_episodes>0</my_watched_episodes>
+\t\t<my_status>Plan to Watch</my_status>
+\t</anime>
+</myanimelist>
+"""
+
+
+def _watch_list(tmp_path, animes):
+    watch_list = AnimeWatchList(str(tmp_path / 'list.json'), storage=JsonStorage(str(tmp_path)))
+    for anime in animes:
+        watch_list.add_anime(anime)
+    return watch_list
+
+
+def _round_trip(animes, fmt):
+    out = io.StringIO()
+    write_export([anime.to_dict() for anime in animes], fmt, out)
+    imported, errors = read_import(io.BytesIO(out.getvalue().encode()), fmt)
+    assert errors == []
+    return [anime.to_dict() for anime in imported]
+
+
+def test_airing_mal_entry_keeps_an_open_length(tmp_path):
+    animes, errors = read_import(io.BytesIO(MAL_AIRING), 'xml')
+    assert errors == []
+    assert [(anime.episodes_watched, anime.total_episodes) for anime in animes] == [(5, 0), (0, 0)]
+
+    watch_list = _watch_list(tmp_path, animes)
+    watch_list.update_progress(0, 6)
+    watch_list.update_progress(1, 1)
+    assert [(anime.episodes_watched, anime.status) for anime in watch_list.anime_list] == [
+        (6, 'Watching'), (1, 'To Watch')]
+    assert '[6/?]' in repr(watch_list.anime_list[0])
+
+
+def test_round_trip_keeps_fields():
+    animes = [
+        Anime('Frieren', 'Watching', 'High', 'Fantasy', 3, 28, start_date='2024-01-05', favorite=True),
+        Anime('Mushishi', 'Completed', 'Medium', 'Drama', 26, 26, completed_date='2023-07-01'),
+        Anime('Steins;Gate, 0', 'To Watch', 'Low', 'Sci-Fi', 0, 23),
+        Anime('One Piece', 'Watching', 'Low', 'Adventure', 1100, 0),
+    ]
+    csv_records = _round_trip(animes, 'csv')
+    assert csv_records == [anime.to_dict() for anime in animes]
+
+    xml_records = _round_trip(animes, 'xml')
+    # The MyAnimeList format has no genre, favorite or link
+    keep = ('title', 'status', 'preference', 'episodes_watched', 'total_episodes', 'start_date', 'completed_date')
+    assert [{key: record[key] for key in keep} for record in xml_records] == [
+        {key: anime.to_dict()[key] for key in keep} for anime in animes]
+
+
+def test_csv_without_optional_columns():
+    data = b"title,status,preference,total_episodes\nFrieren,Watching,High,28\nDandadan,To Watch,Low,\n"
+    animes, errors = read_import(io.BytesIO(data), 'csv')
+    assert errors == []
+    assert [(anime.title, anime.episodes_watched, anime.total_episodes) for anime in animes] == [
+        ('Frieren', 0, 28), ('Dandadan', 0, 0)]
+
+
+def test_invalid_rows_are_reported():
+    data = b"title,status,preference,total_episodes,episodes_watched\n,Watching,High,3,1\nA,Watching,High,-2,1\nB,Watching,High,3,x\n"
+    animes, errors = read_import(io.BytesIO(data), 'csv')
+    assert animes == []
+    assert [line for line, _ in errors] == [2, 3, 4]
+
+
+def test_odd_mal_scores_count_as_unscored():
+    data = MAL_AIRING.replace(b'<my_score>8</my_score>', b'<my_score>\xc2\xb2</my_score>')
+    animes, errors = read_import(io.BytesIO(data), 'xml')
+    assert errors == []
+    assert animes[0].preference == 'Medium'
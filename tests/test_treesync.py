@@ -0,0 +1,71 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from treesync import TreeSyncState, sync_tree, tree_hash
+
+
+class FakeCommand:
+    def __init__(self, name, description='', options=()):
+        self.payload = {'name': name, 'type': 1, 'description': description, 'options': list(options)}
+
+    def to_dict(self, tree):
+        return dict(self.payload)
+
+
+class FakeTree:
+    def __init__(self, *commands):
+        self.commands = list(commands)
+        self.syncs = 0
+
+    def get_commands(self, guild=None):
+        return self.commands
+
+    async def sync(self, guild=None):
+        self.syncs += 1
+        return self.commands
+
+
+def test_hash_ignores_order_but_not_content():
+    add, remove = FakeCommand('add', 'Add an anime'), FakeCommand('remove', 'Remove an anime')
+    assert tree_hash(FakeTree(add, remove)) == tree_hash(FakeTree(remove, add))
+    assert tree_hash(FakeTree(add, remove)) != tree_hash(FakeTree(add, FakeCommand('remove', 'Delete an anime')))
+    assert tree_hash(FakeTree(add)) != tree_hash(FakeTree(add, remove))
+
+
+def test_sync_only_when_the_tree_changed(tmp_path):
+    path = str(tmp_path / 'command_tree.json')
+    tree = FakeTree(FakeCommand('add'))
+
+    async def scenario():
+        assert (await sync_tree(tree, TreeSyncState(path), 1))[0] is True
+        # A restart with the same commands skips the sync
+        assert (await sync_tree(tree, TreeSyncState(path), 1))[0] is False
+        # Another application or a guild scope has its own entry
+        assert (await sync_tree(tree, TreeSyncState(path), 2))[0] is True
+        assert (await sync_tree(tree, TreeSyncState(path), 1, guild=SimpleNamespace(id=5)))[0] is True
+        tree.commands.append(FakeCommand('remove'))
+        assert (await sync_tree(tree, TreeSyncState(path), 1))[0] is True
+        assert (await sync_tree(tree, TreeSyncState(path), 1, force=True))[0] is True
+
+    asyncio.run(scenario())
+    assert tree.syncs == 5
+    with open(path) as f:
+        assert sorted(json.load(f)) == ['1:5', '1:global', '2:global']
+
+
+def test_failed_sync_is_retried(tmp_path):
+    path = str(tmp_path / 'command_tree.json')
+
+    class FailingTree(FakeTree):
+        async def sync(self, guild=None):
+            raise RuntimeError("rate limited")
+
+    async def scenario():
+        try:
+            await sync_tree(FailingTree(FakeCommand('add')), TreeSyncState(path), 1)
+        except RuntimeError:
+            pass
+        return await sync_tree(FakeTree(FakeCommand('add')), TreeSyncState(path), 1)
+
+    assert asyncio.run(scenario())[0] is True
@@ -0,0 +1,38 @@
+import gc
+
+import pytest
+
+pytest.importorskip('discord')
+
+from main import Anime  # noqa: E402
+from views import PageCache  # noqa: E402
+
+
+class FakeWatchList:
+    def __init__(self, count):
+        self.anime_list = [Anime(f'Title {n}', 'Watching', 'High', total_episodes=12) for n in range(count)]
+        self.version = 0
+
+
+def test_pages_are_rendered_once_per_version():
+    cache = PageCache(page_size=10)
+    watch_list = FakeWatchList(25)
+    assert cache.page_count(watch_list) == 3
+    first = cache.fields(watch_list, 0)
+    assert cache.fields(watch_list, 0) is first and cache.renders == 1
+    assert cache.fields(watch_list, 2)[0][0] == '20. Title 20'
+
+    watch_list.anime_list[0].favorite = True
+    watch_list.version += 1
+    assert cache.fields(watch_list, 0)[0][0] == '0. ⭐ Title 0'
+    assert cache.renders == 3
+
+
+def test_pages_go_with_their_watchlist():
+    cache = PageCache()
+    watch_list = FakeWatchList(1)
+    cache.fields(watch_list, 0)
+    del watch_list
+    gc.collect()
+    assert len(cache._pages) == 0
+    assert cache.page_count(FakeWatchList(0)) == 1
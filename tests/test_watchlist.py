@@ -0,0 +1,59 @@
+import pytest
+
+from main import MAX_CHOICE_LENGTH, Anime, AnimeWatchList, Change, parse_changes
+from storage import JsonStorage
+
+
+def _watch_list(tmp_path, *titles):
+    watch_list = AnimeWatchList(str(tmp_path / 'list.json'), storage=JsonStorage(str(tmp_path)))
+    for title in titles:
+        watch_list.add_anime(Anime(title, 'Watching', 'High', total_episodes=12))
+    return watch_list
+
+
+def test_find_index_by_title_or_position(tmp_path):
+    watch_list = _watch_list(tmp_path, 'Frieren', 'Mushishi', '86')
+    assert watch_list.find_index('mushishi') == 1
+    assert watch_list.find_index(' 1 ') == 1
+    assert watch_list.find_index('86') == 2  # a title wins over a position
+    assert watch_list.find_index('3') is None
+    assert watch_list.find_index('²') is None
+    assert watch_list.find_index('-1') is None
+
+
+def test_find_index_resolves_titles_cut_by_autocomplete(tmp_path):
+    long_title = 'A' * MAX_CHOICE_LENGTH + ' Season 2'
+    watch_list = _watch_list(tmp_path, 'Frieren', long_title)
+    assert watch_list.find_index(long_title[:MAX_CHOICE_LENGTH]) == 1
+    watch_list.add_anime(Anime('A' * MAX_CHOICE_LENGTH + ' Season 3', 'Watching', 'High'))
+    assert watch_list.find_index(long_title[:MAX_CHOICE_LENGTH]) is None  # ambiguous
+
+
+def test_parse_changes_keeps_separators_inside_titles():
+    assert parse_changes('0:12 3:5') == [Change('0', 12), Change('3', 5)]
+    assert parse_changes('"Steins;Gate":24:completed "Spy x Family, Code: White":"to watch" 2::fav') == [
+        Change('Steins;Gate', 24, 'Completed'),
+        Change('Spy x Family, Code: White', None, 'To Watch'),
+        Change('2', None, None, True),
+    ]
+    assert parse_changes("Re:Zero:12 Frieren's:3") == [Change('Re:Zero', 12), Change("Frieren's", 3)]
+
+
+def test_parse_changes_errors():
+    for text, message in [('', 'No changes'), ('Frieren', 'Nothing to change'), (':12', 'Missing anime'),
+                          ('"Frieren:12', 'Unbalanced')]:
+        with pytest.raises(ValueError, match=message):
+            parse_changes(text)
+
+
+def test_apply_changes_is_all_or_nothing(tmp_path):
+    watch_list = _watch_list(tmp_path, 'Frieren', 'Steins;Gate')
+    with pytest.raises(ValueError, match='episodes cannot be negative'):
+        watch_list.apply_changes(parse_changes('1:3 0:-1'))
+    assert [anime.episodes_watched for anime in watch_list.anime_list] == [0, 0]
+    with pytest.raises(ValueError, match="'Mushishi' is not in your list"):
+        watch_list.apply_changes(parse_changes('Mushishi:3'))
+
+    entries = watch_list.apply_changes(parse_changes('"Steins;Gate":12 0::fav'))
+    assert [(anime.title, anime.episodes_watched, anime.status, anime.favorite) for anime in entries] == [
+        ('Steins;Gate', 12, 'Completed', False), ('Frieren', 0, 'Watching', True)]
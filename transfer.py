@@ -0,0 +1,161 @@
+import csv
+import io
+import xml.etree.ElementTree as ET
+from datetime import date
+from xml.sax.saxutils import escape
+
+from main import Anime, validate_anime_fields
+
+CSV_FIELDS = ['title', 'status', 'preference', 'genre', 'episodes_watched', 'total_episodes',
+              'start_date', 'completed_date', 'source_link', 'favorite']
+
+# MyAnimeList export statuses (names, or the numeric codes some exports use)
+MAL_STATUSES = {
+    'watching': 'Watching', '1': 'Watching',
+    'completed': 'Completed', '2': 'Completed',
+    'on-hold': 'Watching', '3': 'Watching',
+    'plan to watch': 'To Watch', '6': 'To Watch',
+}
+MAL_DROPPED = {'dropped', '4'}
+MAL_EXPORT_STATUSES = {'Watching': 'Watching', 'Completed': 'Completed', 'To Watch': 'Plan to Watch'}
+PREFERENCE_SCORES = {'High': 9, 'Medium': 7, 'Low': 5}
+
+
+def format_for(filename):
+    """Import/export format from a file name, or None if unsupported."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.xml'):
+        return 'xml'
+    return None
+
+
+def _optional_date(value):
+    value = (value or '').strip()
+    if not value or value.startswith('0000'):
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD") from None
+
+
+def _int(value, name):
+    try:
+        return int(str(value if value is not None else '').strip() or 0)
+    except ValueError:
+        raise ValueError(f"{name} must be a number!") from None
+
+
+def build_anime(row):
+    """Validate one import row (a dict of CSV field names) into an Anime."""
+    title, status, preference, total = validate_anime_fields(
+        row.get('title'), row.get('status'), row.get('preference'), row.get('total_episodes') or 0,
+        unknown_total=True)
+    watched = _int(row.get('episodes_watched'), "Episodes watched")
+    if watched < 0:
+        raise ValueError("Episodes cannot be negative!")
+    return Anime(
+        title, status, preference,
+        genre=(row.get('genre') or '').strip() or 'Unknown',
+        episodes_watched=min(watched, total) if total else watched,
+        total_episodes=total,
+        start_date=_optional_date(row.get('start_date')),
+        completed_date=_optional_date(row.get('completed_date')),
+        source_link=(row.get('source_link') or '').strip() or None,
+        favorite=str(row.get('favorite') or '').strip().lower() in ('1', 'true', 'yes', 'y'),
+    )
+
+
+def _csv_rows(binary):
+    reader = csv.DictReader(io.TextIOWrapper(binary, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        # Header is line 1
+        yield reader.line_num, {key.strip().lower(): value for key, value in row.items() if key}
+
+
+def _mal_rows(binary):
+    # iterparse keeps memory flat: each <anime> element is discarded once read
+    for _, elem in ET.iterparse(binary, events=('end',)):
+        if elem.tag != 'anime':
+            continue
+        get = lambda tag: (elem.findtext(tag) or '').strip()
+        status = get('my_status').lower()
+        score = int(get('my_score')) if get('my_score').isdecimal() else 0
+        row = {
+            'title': get('series_title'),
+            'status': 'Dropped' if status in MAL_DROPPED else MAL_STATUSES.get(status, status),
+            'preference': 'High' if score >= 8 else 'Low' if 0 < score <= 5 else 'Medium',
+            'episodes_watched': get('my_watched_episodes'),
+            # MAL uses 0 for airing series, which is also our "length unknown"
+            'total_episodes': get('series_episodes') or '0',
+            'start_date': get('my_start_date'),
+            'completed_date': get('my_finish_date'),
+        }
+        elem.clear()
+        yield row['title'] or '?', row
+
+
+def parse_import(binary, fmt, max_rows=10000):
+    """Stream entries from an import file.
+
+    Yields (row label, Anime or None, error message or None) for every row;
+    rows after max_rows are reported as errors without being parsed.
+    """
+    rows = _csv_rows(binary) if fmt == 'csv' else _mal_rows(binary)
+    count = 0
+    try:
+        for label, row in rows:
+            count += 1
+            if count > max_rows:
+                yield label, None, f"Import limit of {max_rows} rows reached"
+                return
+            if row.get('status') == 'Dropped':
+                yield label, None, "Dropped entries are not imported"
+                continue
+            try:
+                yield label, build_anime(row), None
+            except ValueError as e:
+                yield label, None, str(e)
+    except (csv.Error, ET.ParseError, UnicodeDecodeError) as e:
+        yield 'file', None, f"Could not read file: {e}"
+
+
+def read_import(binary, fmt, max_rows=10000):
+    """Collect valid entries and per-row errors from an import file."""
+    animes, errors = [], []
+    for label, anime, error in parse_import(binary, fmt, max_rows):
+        if error:
+            errors.append((label, error))
+        else:
+            animes.append(anime)
+    return animes, errors
+
+
+def write_export(records, fmt, out):
+    """Stream watchlist records (dicts from AnimeWatchList.to_records) to a text file."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow({**record, 'favorite': 'true' if record['favorite'] else 'false'})
+        return
+    out.write('<?xml version="1.0" encoding="UTF-8" ?>\n<myanimelist>\n')
+    out.write('\t<myinfo>\n\t\t<user_export_type>1</user_export_type>\n'
+              f'\t\t<user_total_anime>{len(records)}</user_total_anime>\n\t</myinfo>\n')
+    for record in records:
+        fields = {
+            'series_title': record['title'],
+            'series_episodes': record['total_episodes'],
+            'my_watched_episodes': record['episodes_watched'],
+            'my_start_date': record['start_date'] or '0000-00-00',
+            'my_finish_date': record['completed_date'] or '0000-00-00',
+            'my_score': PREFERENCE_SCORES.get(record['preference'], 0),
+            'my_status': MAL_EXPORT_STATUSES.get(record['status'], record['status']),
+        }
+        out.write('\t<anime>\n')
+        for tag, value in fields.items():
+            out.write(f'\t\t<{tag}>{escape(str(value))}</{tag}>\n')
+        out.write('\t</anime>\n')
+    out.write('</myanimelist>\n')
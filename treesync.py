@@ -0,0 +1,76 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+from persistence import atomic_write_json
+
+log = logging.getLogger('AnimeBot')
+
+
+def _command_payload(command, tree):
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        # discord.py < 2.4 takes no tree argument
+        return command.to_dict()
+
+
+def tree_hash(tree, guild=None):
+    """Stable hash of the commands that a sync would upload for guild (None = global)."""
+    payload = sorted((_command_payload(command, tree) for command in tree.get_commands(guild=guild)),
+                     key=lambda command: (command.get('type', 1), command['name']))
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class TreeSyncState:
+    """Hashes of the last successfully synced command trees, persisted in a JSON file.
+
+    Entries are keyed by application and scope so a different bot token or a
+    guild sync never masks the global one.
+    """
+
+    def __init__(self, path=os.path.join('data', 'command_tree.json')):
+        self.path = path
+        self._hashes = None
+
+    def _load(self):
+        if self._hashes is None:
+            try:
+                with open(self.path, 'r') as f:
+                    self._hashes = json.load(f)
+            except (OSError, ValueError):
+                self._hashes = {}
+        return self._hashes
+
+    @staticmethod
+    def key(application_id, guild=None):
+        return f"{application_id}:{guild.id if guild else 'global'}"
+
+    def get(self, key):
+        return self._load().get(key)
+
+    def set(self, key, digest):
+        hashes = self._load()
+        if hashes.get(key) != digest:
+            hashes[key] = digest
+            atomic_write_json(self.path, hashes)
+
+
+async def sync_tree(tree, state, application_id, guild=None, force=False):
+    """Sync the command tree unless it matches what was last synced.
+
+    Returns (synced, number of commands, seconds spent in the API call).
+    """
+    key = state.key(application_id, guild)
+    digest = tree_hash(tree, guild)
+    if not force and state.get(key) == digest:
+        return False, len(tree.get_commands(guild=guild)), 0.0
+    start = time.perf_counter()
+    synced = await tree.sync(guild=guild)
+    elapsed = time.perf_counter() - start
+    state.set(key, digest)
+    log.info(f"Synced {len(synced)} commands ({'global' if guild is None else f'guild {guild.id}'}) in {elapsed:.2f}s")
+    return True, len(synced), elapsed
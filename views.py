@@ -0,0 +1,94 @@
+import weakref
+from datetime import datetime
+
+import discord
+
+PAGE_SIZE = 10  # entries per page; Discord allows 25 fields per embed
+
+
+class PageCache:
+    """Rendered watchlist pages, kept until the watchlist's version changes.
+
+    Keyed weakly by watchlist, so pages are dropped together with a list
+    evicted from the watchlist cache. Pages are rendered on first request.
+    """
+
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self._pages = weakref.WeakKeyDictionary()  # watchlist -> (version, {page: fields})
+        self.renders = 0
+
+    def page_count(self, watch_list):
+        return max(1, -(-len(watch_list.anime_list) // self.page_size))
+
+    def fields(self, watch_list, page):
+        version, pages = self._pages.get(watch_list, (None, None))
+        if version != watch_list.version:
+            pages = {}
+            self._pages[watch_list] = (watch_list.version, pages)
+        if page not in pages:
+            pages[page] = self._render(watch_list, page)
+        return pages[page]
+
+    def _render(self, watch_list, page):
+        self.renders += 1
+        start = page * self.page_size
+        fields = []
+        for i, anime in enumerate(watch_list.anime_list[start:start + self.page_size], start):
+            progress = f"[{anime.episodes_watched}/{anime.total_episodes or '?'}]" if anime.status == 'Watching' else ""
+            favorite = "⭐ " if anime.favorite else ""
+            fields.append((
+                f"{i}. {favorite}{anime.title}"[:256],
+                f"Status: {anime.status}\nPriority: {anime.preference}\nGenre: {anime.genre} {progress}"[:1024],
+            ))
+        return fields
+
+
+def watchlist_embed(cache, watch_list, page, footer):
+    embed = discord.Embed(title="Your Anime Watchlist", color=discord.Color.blue())
+    for name, value in cache.fields(watch_list, page):
+        embed.add_field(name=name, value=value, inline=False)
+    count = cache.page_count(watch_list)
+    embed.set_footer(text=f"Page {page + 1}/{count} • {footer}" if count > 1 else footer)
+    embed.timestamp = datetime.now()
+    return embed
+
+
+class WatchlistPager(discord.ui.View):
+    """Previous/next buttons for a watchlist embed; only its owner can turn pages."""
+
+    def __init__(self, cache, owner_id, get_watch_list, footer, page=0, timeout=300):
+        super().__init__(timeout=timeout)
+        self.cache = cache
+        self.owner_id = owner_id
+        self.get_watch_list = get_watch_list  # re-resolved per click, the cached list may be replaced
+        self.footer = footer
+        self.page = page
+        self._sync_buttons(cache.page_count(get_watch_list(owner_id)))
+
+    def embed(self):
+        watch_list = self.get_watch_list(self.owner_id)
+        count = self.cache.page_count(watch_list)
+        self.page = min(self.page, count - 1)
+        self._sync_buttons(count)
+        return watchlist_embed(self.cache, watch_list, self.page, self.footer)
+
+    def _sync_buttons(self, count):
+        self.previous_page.disabled = self.page <= 0
+        self.next_page.disabled = self.page >= count - 1
+
+    async def interaction_check(self, interaction):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("This isn't your watchlist!", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀ Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction, button):
+        self.page = max(0, self.page - 1)
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction, button):
+        self.page += 1
+        await interaction.response.edit_message(embed=self.embed(), view=self)